@@ -2,15 +2,30 @@ from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QComboBox,
     QDateEdit, QPushButton, QTableWidget, QTableWidgetItem,
     QLabel, QMessageBox, QLineEdit, QHeaderView, QGroupBox,
-    QSpinBox, QInputDialog, QFileDialog
+    QSpinBox, QInputDialog, QFileDialog, QProgressDialog
 )
 from PyQt6.QtCore import QDate, Qt
-import pandas as pd
+from day_numbers import month_range, parse_month
+from background_jobs import BackgroundJob, start_job
+from export_engine import count_rows, export_table
+
+EXPORT_COLUMNS = ['name', 'date', 'type', 'duration', 'notes']
+
+# تصدير شهر سجل الغياب بترتيب جدول السجل: الأحدث أولاً
+LOG_EXPORT_ORDER = "a.day DESC, e.name ASC"
+
+
+def export_absences(job, db, filters, file_path, order=None):
+    """يُنفَّذ في الخلفية؛ يرجع عدد السجلات المصدَّرة (0 إذا لم توجد بيانات)"""
+    return export_table(db, 'absences', file_path, EXPORT_COLUMNS, filters, job.report, order)
+
 
 class AbsencesTab(QWidget):
     def __init__(self, db_manager):
         super().__init__()
         self.db = db_manager
+        # عملية التصدير الجارية في الخلفية (background_jobs)
+        self.export_job = None
         self.setup_ui()
         self.load_employees()
         self.load_absences()
@@ -106,43 +121,65 @@ class AbsencesTab(QWidget):
 
     def export_absences_month(self, year, month, emp_id=None):
         month_str = f"{year}-{month:02d}"
-        if emp_id:
-            query = """
-                SELECT e.name, a.date, a.type, a.duration, a.notes
-                FROM absences a JOIN employees e ON a.employee_id = e.id
-                WHERE strftime('%Y-%m', a.date) = ? AND a.employee_id = ?
-                ORDER BY a.date ASC
-            """
-            params = (month_str, emp_id)
-        else:
-            query = """
-                SELECT e.name, a.date, a.type, a.duration, a.notes
-                FROM absences a JOIN employees e ON a.employee_id = e.id
-                WHERE strftime('%Y-%m', a.date) = ?
-                ORDER BY a.date ASC
-            """
-            params = (month_str,)
-        self.db.execute_query(query, params, commit=False)
-        absences = self.db.cursor.fetchall()
-        if not absences:
-            QMessageBox.information(self, "لا يوجد بيانات", "لا يوجد غياب لهذا الشهر.")
+        first_day, end_day = month_range(year, month)
+        filters = {'start_day': first_day, 'end_day': end_day, 'employee_id': emp_id}
+        if not self.has_absences(filters):
             return
         file_path, _ = QFileDialog.getSaveFileName(
             self, "حفظ تقرير الغياب", f"absences_{month_str}.xlsx", "Excel Files (*.xlsx)"
         )
         if not file_path:
             return
-        df = pd.DataFrame(absences, columns=['الموظف', 'التاريخ', 'النوع', 'المدة', 'ملاحظات'])
-        df.to_excel(file_path, index=False)
-        QMessageBox.information(self, "تم", "تم حفظ التقرير بنجاح.")
+        self.run_export(filters, file_path)
+
+    def has_absences(self, filters):
+        """التحقق من وجود بيانات قبل سؤال المستخدم عن مكان الحفظ"""
+        try:
+            count = count_rows(self.db, 'absences', filters)
+        except Exception as e:
+            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء التصدير: {str(e)}")
+            return False
+        if not count:
+            QMessageBox.information(self, "لا يوجد بيانات", "لا يوجد غياب لهذا الشهر.")
+        return bool(count)
+
+    def run_export(self, filters, file_path, order=None):
+        """تصدير الغياب في الخلفية مع نافذة تقدم قابلة للإلغاء"""
+        progress = QProgressDialog("جاري تصدير سجل الغياب...", "إلغاء", 0, 0, self)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        job = BackgroundJob(export_absences, self.db, filters, file_path, order)
+        # الاحتفاظ بالعملية حتى تصل إشاراتها
+        self.export_job = job
+        progress.canceled.connect(job.cancel)
+
+        def update(done, total):
+            progress.setMaximum(total)
+            progress.setValue(done)
+
+        def finished(count):
+            progress.close()
+            if count:
+                QMessageBox.information(self, "تم", "تم حفظ التقرير بنجاح.")
+            else:
+                QMessageBox.information(self, "لا يوجد بيانات", "لا يوجد غياب لهذا الشهر.")
+
+        def failed(message):
+            progress.close()
+            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء التصدير: {message}")
+
+        job.signals.progress.connect(update)
+        job.signals.finished.connect(finished)
+        job.signals.failed.connect(failed)
+        job.signals.cancelled.connect(progress.close)
+        progress.show()
+        start_job(job)
 
 
     def load_employees(self):
         try:
-            self.db.execute_query(
+            employees = self.db.fetch_all(
                 "SELECT id, name FROM employees ORDER BY name"
             )
-            employees = self.db.cursor.fetchall()
             self.employee_combo.clear()
             for emp_id, name in employees:
                 self.employee_combo.addItem(name, emp_id)
@@ -177,33 +214,32 @@ class AbsencesTab(QWidget):
             abs_type = self.absence_type.currentText()
             duration = self.duration_spin.value()
             notes = self.notes_input.text()
-            self.db.execute_query(
+            if self.db.fetch_one(
                 "SELECT 1 FROM absences WHERE employee_id=? AND date=?",
-                (emp_id, date),
-                commit=False
-            )
-            if self.db.cursor.fetchone():
+                (emp_id, date)
+            ):
                 QMessageBox.warning(
                     self,
                     "تحذير",
                     "تم تسجيل غياب لهذا الموظف في هذا التاريخ مسبقاً"
                 )
                 return
-            self.db.execute_query(
-                "INSERT INTO absences (employee_id, date, type, duration, notes) "
-                "VALUES (?, ?, ?, ?, ?)",
-                (emp_id, date, abs_type, duration, notes)
-            )
-            self.db.execute_query(
-                "INSERT INTO audit_log (action, table_name, record_id, changes) "
-                "VALUES (?, ?, ?, ?)",
-                (
-                    'INSERT',
-                    'absences',
-                    emp_id,
-                    f"تم تسجيل {abs_type} للموظف في تاريخ {date}"
+            with self.db.transaction():
+                self.db.execute_query(
+                    "INSERT INTO absences (employee_id, date, type, duration, notes) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (emp_id, date, abs_type, duration, notes)
+                )
+                self.db.execute_query(
+                    "INSERT INTO audit_log (action, table_name, record_id, changes) "
+                    "VALUES (?, ?, ?, ?)",
+                    (
+                        'INSERT',
+                        'absences',
+                        emp_id,
+                        f"تم تسجيل {abs_type} للموظف في تاريخ {date}"
+                    )
                 )
-            )
             QMessageBox.information(
                 self,
                 "تم",
@@ -223,22 +259,19 @@ class AbsencesTab(QWidget):
         try:
             filter_month = self.month_filter.currentData()
             if filter_month:
-                self.db.execute_query(
+                absences = self.db.fetch_all(
                     "SELECT e.name, a.date, a.type, a.duration, a.notes "
                     "FROM absences a JOIN employees e ON a.employee_id = e.id "
-                    "WHERE strftime('%Y-%m', a.date) = ? "
-                    "ORDER BY a.date DESC, e.name ASC",
-                    (filter_month,),
-                    commit=False
+                    "WHERE a.day >= ? AND a.day < ? "
+                    "ORDER BY a.day DESC, e.name ASC",
+                    parse_month(filter_month)
                 )
             else:
-                self.db.execute_query(
+                absences = self.db.fetch_all(
                     "SELECT e.name, a.date, a.type, a.duration, a.notes "
                     "FROM absences a JOIN employees e ON a.employee_id = e.id "
-                    "ORDER BY a.date DESC, e.name ASC",
-                    commit=False
+                    "ORDER BY a.date DESC, e.name ASC"
                 )
-            absences = self.db.cursor.fetchall()
             self.absences_table.setRowCount(len(absences) if absences else 1)
             if not absences:
                 empty_item = QTableWidgetItem("لا يوجد سجل غياب")
@@ -261,31 +294,17 @@ class AbsencesTab(QWidget):
 
     def export_month_absences(self):
         """تصدير سجل الغياب لشهر محدد إلى Excel"""
-        import pandas as pd
         filter_month = self.month_filter.currentData()
         if not filter_month:
             QMessageBox.warning(self, "تنبيه", "يرجى اختيار شهر أولا")
             return
-        try:
-            self.db.execute_query(
-                "SELECT e.name, a.date, a.type, a.duration, a.notes "
-                "FROM absences a JOIN employees e ON a.employee_id = e.id "
-                "WHERE strftime('%Y-%m', a.date) = ? "
-                "ORDER BY a.date DESC, e.name ASC",
-                (filter_month,),
-                commit=False
-            )
-            absences = self.db.cursor.fetchall()
-            if not absences:
-                QMessageBox.information(self, "لا يوجد بيانات", "لا يوجد غياب لهذا الشهر")
-                return
-            file_path, _ = QFileDialog.getSaveFileName(
-                self, "تصدير سجل الغياب", f"absences_{filter_month}.xlsx", "Excel Files (*.xlsx)"
-            )
-            if not file_path:
-                return
-            df = pd.DataFrame(absences, columns=["الموظف", "التاريخ", "النوع", "المدة", "ملاحظات"])
-            df.to_excel(file_path, index=False)
-            QMessageBox.information(self, "تم", "تم التصدير بنجاح")
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء التصدير: {str(e)}")
\ No newline at end of file
+        first_day, end_day = parse_month(filter_month)
+        filters = {'start_day': first_day, 'end_day': end_day}
+        if not self.has_absences(filters):
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "تصدير سجل الغياب", f"absences_{filter_month}.xlsx", "Excel Files (*.xlsx)"
+        )
+        if not file_path:
+            return
+        self.run_export(filters, file_path, LOG_EXPORT_ORDER)
@@ -1,6 +1,87 @@
-from datetime import datetime
+"""التجديد السنوي لأرصدة الإجازات
 
-def reset_emergency_vacation_balances(db):
-    today = datetime.today()
-    if today.month == 1 and today.day == 1:  # أول يوم في السنة
-        db.execute_query("UPDATE employees SET emergency_vacation_balance=12", commit=True)
\ No newline at end of file
+في أول يوم من كل سنة:
+    الرصيد السنوي = min(الرصيد المتبقي، حد الترحيل) + استحقاق السنة
+    الاستحقاق 30 يوماً، و45 يوماً لمن أتم 20 سنة خدمة من hiring_date
+    الرصيد الطارئ يعود إلى 12
+
+السنوات المعالجة محفوظة في balance_rollovers (الترحيل 9)، فالتشغيل يعالج
+كل سنة فائتة مرة واحدة فقط مهما تكرر أو تأخر عن أول يناير. أول تشغيل
+يسجّل السنة الحالية دون تعديل الأرصدة لأنها محسوبة لهذه السنة أصلاً.
+كل السنوات الفائتة تُسجَّل قيوداً في سجل الأرصدة (balance_ledger.py) داخل
+معاملة واحدة. فروق الترحيل والاستحقاق تُحسب داخل استعلامات القيود نفسها
+من الرصيد وتاريخ التعيين الحاليين، فلا يُكتب رصيد قُرئ قبل الوحدة
+(مع خدمة الكتابة الجماعية) ولا يضيع تعديل ثُبّت بين القراءة والكتابة.
+"""
+from datetime import date
+
+from balance_ledger import (
+    BalanceLedger, REASON_ANNUAL_RESET, REASON_CARRY_OVER_EXPIRY, REASON_ENTITLEMENT
+)
+
+ANNUAL_ENTITLEMENT = 30
+SENIOR_ENTITLEMENT = 45
+SENIOR_SERVICE_YEARS = 20
+CARRY_OVER_CAP = 60
+EMERGENCY_BALANCE = 12
+
+
+# فرق قيد تجاوز حد الترحيل (سالب أو صفر)
+CARRY_OVER_DELTA = (
+    f"MIN(COALESCE(vacation_balance, 0), {CARRY_OVER_CAP}) - COALESCE(vacation_balance, 0)"
+)
+
+# سنوات الخدمة المكتملة في أول يناير من السنة (المعامل)؛ NULL لتاريخ تعيين غير معروف
+SERVICE_YEARS = (
+    "SELECT *, ? - CAST(strftime('%Y', hiring_date) AS INTEGER)"
+    " - (strftime('%m-%d', hiring_date) != '01-01') AS service_years FROM employees"
+)
+
+# استحقاق السنة: 0 لمن لم يُعيَّن بعد، ومن لا تاريخ تعيين له يستحق الأساسي
+ENTITLEMENT_DELTA = f"""
+    CASE WHEN service_years IS NULL THEN {ANNUAL_ENTITLEMENT}
+         WHEN service_years < 0 THEN 0
+         WHEN service_years >= {SENIOR_SERVICE_YEARS} THEN {SENIOR_ENTITLEMENT}
+         ELSE {ANNUAL_ENTITLEMENT} END
+"""
+
+
+def pending_years(db, today=None):
+    """السنوات التي لم يُطبَّق تجديدها بعد حتى السنة الحالية"""
+    current = (today or date.today()).year
+    last = db.fetch_scalar("SELECT MAX(year) FROM balance_rollovers")
+    if last is None:
+        return []
+    return list(range(last + 1, current + 1))
+
+
+def run_rollover(db, today=None):
+    """تطبيق التجديد للسنوات الفائتة؛ يرجع قائمة السنوات التي عولجت"""
+    current = (today or date.today()).year
+    ledger = BalanceLedger(db)
+    with db.transaction():
+        last = db.fetch_scalar("SELECT MAX(year) FROM balance_rollovers")
+        if last is None:
+            # أول تشغيل: الأرصدة الحالية هي أرصدة هذه السنة
+            db.execute_query(
+                "INSERT INTO balance_rollovers (year, employees) "
+                "SELECT ?, COUNT(*) FROM employees", (current,)
+            )
+            return []
+        years = list(range(last + 1, current + 1))
+        if not years:
+            return []
+        for year in years:
+            entry_date = f"{year}-01-01"
+            ledger.post_computed("سنوية", CARRY_OVER_DELTA, REASON_CARRY_OVER_EXPIRY, entry_date)
+            ledger.post_computed(
+                "سنوية", ENTITLEMENT_DELTA, REASON_ENTITLEMENT, entry_date,
+                source=SERVICE_YEARS, params=(year,)
+            )
+            ledger.set_all("طارئة", EMERGENCY_BALANCE, REASON_ANNUAL_RESET, entry_date=entry_date)
+            # المفتاح الأساسي يمنع تطبيق نفس السنة مرتين إذا تسابقت عمليتان
+            db.execute_query(
+                "INSERT INTO balance_rollovers (year, employees) "
+                "SELECT ?, COUNT(*) FROM employees", (year,)
+            )
+    return years
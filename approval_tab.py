@@ -3,12 +3,17 @@ from PyQt6.QtWidgets import (
     QLabel, QHeaderView, QMessageBox
 )
 from PyQt6.QtCore import Qt
+from staffing_coverage import StaffingCoverage
+from leave_workflow import LeaveWorkflowService, LeaveWorkflowError
+from database import ConcurrentUpdateError
 
 class ApprovalTab(QWidget):
     def __init__(self, db_manager, user_role="manager"):
         super().__init__()
         self.db = db_manager
         self.user_role = user_role  # "manager" أو "department_head"
+        self.coverage = StaffingCoverage(self.db)
+        self.workflow = LeaveWorkflowService(self.db)
         self.setup_ui()
         self.load_pending_vacations()
 
@@ -30,14 +35,13 @@ class ApprovalTab(QWidget):
         # جلب جميع الطلبات التي حالتها تحت الإجراء
         query = """
             SELECT v.id, e.name, v.type, v.start_date,
-                   v.end_date, v.duration, v.status, v.dept_approval
+                   v.end_date, v.duration, v.status, v.dept_approval, v.version
             FROM vacations v
             JOIN employees e ON v.employee_id = e.id
             WHERE v.status='تحت الإجراء' OR v.dept_approval='تحت الإجراء'
             ORDER BY v.start_date DESC
         """
-        self.db.execute_query(query)
-        vacations = self.db.cursor.fetchall()
+        vacations = self.db.fetch_all(query)
         self.table.setRowCount(len(vacations) if vacations else 1)
         if not vacations:
             self.table.setItem(0, 0, QTableWidgetItem("لا يوجد طلبات تحت الإجراء"))
@@ -46,7 +50,7 @@ class ApprovalTab(QWidget):
             return
 
         for row_idx, row in enumerate(vacations):
-            vac_id, emp_name, vac_type, start, end, days, status, dept_approval = row
+            vac_id, emp_name, vac_type, start, end, days, status, dept_approval, version = row
             self.table.setItem(row_idx, 0, QTableWidgetItem(str(vac_id) if vac_id else ''))
             self.table.setItem(row_idx, 1, QTableWidgetItem(emp_name if emp_name else ''))
             self.table.setItem(row_idx, 2, QTableWidgetItem(vac_type if vac_type else ''))
@@ -60,9 +64,9 @@ class ApprovalTab(QWidget):
             reject_btn = QPushButton("رفض")
             cancel_btn = QPushButton("إلغاء")
 
-            approve_btn.clicked.connect(lambda _, v_id=vac_id: self.approve_vacation(v_id))
-            reject_btn.clicked.connect(lambda _, v_id=vac_id: self.reject_vacation(v_id))
-            cancel_btn.clicked.connect(lambda _, v_id=vac_id: self.cancel_vacation(v_id))
+            approve_btn.clicked.connect(lambda _, v_id=vac_id, ver=version: self.approve_vacation(v_id, ver))
+            reject_btn.clicked.connect(lambda _, v_id=vac_id, ver=version: self.reject_vacation(v_id, ver))
+            cancel_btn.clicked.connect(lambda _, v_id=vac_id, ver=version: self.cancel_vacation(v_id, ver))
 
             # الشرط الصحيح لظهور الأزرار:
             # تظهر الأزرار لرئيس القسم إذا dept_approval == 'تحت الإجراء'
@@ -82,74 +86,38 @@ class ApprovalTab(QWidget):
                 self.table.setCellWidget(row_idx, 9, QLabel("-"))
                 self.table.setCellWidget(row_idx, 10, QLabel("-"))
 
-    def approve_vacation(self, vac_id):
-        try:
-            if self.user_role == "department_head":
-                self.db.execute_query(
-                    "UPDATE vacations SET dept_approval='موافق' WHERE id=?",
-                    (vac_id,), commit=True
-                )
-            else:  # manager
-                self.db.execute_query("SELECT employee_id, type, duration FROM vacations WHERE id=?", (vac_id,))
-                emp_id, vac_type, duration = self.db.cursor.fetchone()
-                if vac_type == "سنوية":
-                    self.db.execute_query(
-                        "UPDATE employees SET vacation_balance = vacation_balance - ? WHERE id = ?",
-                        (duration, emp_id), commit=True
-                    )
-                if vac_type == "طارئة":
-                    self.db.execute_query(
-                        "UPDATE employees SET emergency_vacation_balance = emergency_vacation_balance - ? WHERE id = ?",
-                        (duration, emp_id), commit=True
-                    )
-                self.db.execute_query(
-                    "UPDATE vacations SET status='موافق' WHERE id=?",
-                    (vac_id,), commit=True
-                )
-            QMessageBox.information(self, "تمت الموافقة", "تمت الموافقة على الإجازة.")
-            self.load_pending_vacations()
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"خطأ أثناء الموافقة: {e}")
+    def approve_vacation(self, vac_id, version=None):
+        def approve():
+            if self.user_role == "department_head" and not self.coverage.confirm_approval(self, vac_id):
+                return False
+            return self.workflow.approve(vac_id, self.user_role, version=version)
+        self.run_transition(
+            approve, "تمت الموافقة", "تمت الموافقة على الإجازة.", "خطأ أثناء الموافقة"
+        )
 
-    def reject_vacation(self, vac_id):
-        try:
-            if self.user_role == "department_head":
-                self.db.execute_query(
-                    "UPDATE vacations SET dept_approval='مرفوض' WHERE id=?",
-                    (vac_id,), commit=True
-                )
-            else:
-                self.db.execute_query(
-                    "UPDATE vacations SET status='مرفوض' WHERE id=?",
-                    (vac_id,), commit=True
-                )
-            QMessageBox.information(self, "تم الرفض", "تم رفض الإجازة.")
-            self.load_pending_vacations()
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"خطأ أثناء الرفض: {e}")
+    def reject_vacation(self, vac_id, version=None):
+        self.run_transition(
+            lambda: self.workflow.reject(vac_id, self.user_role, version=version),
+            "تم الرفض", "تم رفض الإجازة.", "خطأ أثناء الرفض"
+        )
+
+    def cancel_vacation(self, vac_id, version=None):
+        self.run_transition(
+            lambda: self.workflow.cancel(vac_id, version=version),
+            "تم الإلغاء", "تم إلغاء الإجازة.", "خطأ أثناء الإلغاء"
+        )
 
-    def cancel_vacation(self, vac_id):
+    def run_transition(self, transition, title, message, error_prefix):
+        """تنفيذ انتقال حالة عبر LeaveWorkflowService وعرض النتيجة"""
         try:
-            self.db.execute_query(
-                "UPDATE vacations SET status='ملغاة', dept_approval='ملغاة' WHERE id=?",
-                (vac_id,), commit=True
-            )
-            self.db.execute_query("SELECT employee_id, type, duration FROM vacations WHERE id=?", (vac_id,))
-            emp_id, vac_type, duration = self.db.cursor.fetchone()
-            if vac_type == "سنوية":
-                self.db.execute_query(
-                    "UPDATE employees SET vacation_balance = vacation_balance + ? WHERE id = ?",
-                    (duration, emp_id), commit=True
-                )
-            if vac_type == "طارئة":
-                self.db.execute_query(
-                    "UPDATE employees SET emergency_vacation_balance = emergency_vacation_balance + ? WHERE id = ?",
-                    (duration, emp_id), commit=True
-                )
-            QMessageBox.information(self, "تم الإلغاء", "تم إلغاء الإجازة.")
-            self.load_pending_vacations()
+            if not transition():
+                return
+            QMessageBox.information(self, title, message)
+        except (LeaveWorkflowError, ConcurrentUpdateError) as e:
+            QMessageBox.warning(self, "تحذير", str(e))
         except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"خطأ أثناء الإلغاء: {e}")
+            QMessageBox.critical(self, "خطأ", f"{error_prefix}: {e}")
+        self.load_pending_vacations()
 
     def refresh_data(self):
         self.load_pending_vacations()
\ No newline at end of file
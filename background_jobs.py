@@ -0,0 +1,92 @@
+"""تشغيل العمليات الطويلة (الاستيراد والتصدير) خارج خيط الواجهة
+
+كل عملية BackgroundJob (QRunnable) تُنفَّذ في QThreadPool العام وتبلّغ
+الواجهة بإشارات Qt فقط، فتصل الإشارات إلى خيط الواجهة عبر طابور الأحداث
+ولا تلمس العملية أي عنصر واجهة بنفسها:
+
+    job = BackgroundJob(export_rows, path)
+    job.signals.progress.connect(on_progress)
+    job.signals.finished.connect(on_finished)
+    start_job(job)
+
+الدالة المنفذة تستقبل العملية كأول معامل وتستدعي job.report(done, total)
+بين الدفعات؛ report تتحقق من طلب الإلغاء (job.cancel) وترفع JobCancelled
+فيتوقف العمل عند أول نقطة آمنة بعد ما ثُبِّت. إشارات التقدم محدودة بمرة
+كل PROGRESS_INTERVAL ثانية.
+
+قاعدة البيانات: العمليات تستخدم DatabaseManager الواجهة نفسه. كل خيط في
+المجموعة يقرأ من اتصال القراءة الخاص به (WAL)، وحالة transaction() محفوظة
+لكل خيط، فلا تختلط استعلامات معاملة العملية بخيط الواجهة. والكتابة تمر
+بخدمة الكتابة (WriteClient يوزّع الردود على خيوطه) أو قفل الكاتب دفعة
+دفعة، فلا يحجب الاستيراد الموافقات أو التنقل في الواجهة. DatabaseManager
+مستقل لكل عملية يفتح اتصال كتابة آخر يتنافس على نفس قفل الملف دون فائدة.
+"""
+import time
+from threading import Event
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+PROGRESS_INTERVAL = 0.1
+
+
+class JobCancelled(Exception):
+    """أُلغيت العملية بطلب المستخدم"""
+
+
+class JobSignals(QObject):
+    progress = pyqtSignal(int, int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class BackgroundJob(QRunnable):
+    def __init__(self, task, *args, **kwargs):
+        super().__init__()
+        self.task = task
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = JobSignals()
+        self._cancel = Event()
+        self._last_progress = 0.0
+        # صاحب العملية يحتفظ بها حتى تنتهي، فلا يحذفها Qt قبل وصول الإشارات
+        self.setAutoDelete(False)
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def is_cancelled(self):
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def report(self, done, total):
+        """نقطة إلغاء آمنة + إشارة تقدم محدودة التكرار"""
+        self.check_cancelled()
+        now = time.monotonic()
+        if done >= total or now - self._last_progress >= PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.signals.progress.emit(done, total)
+
+    def set_status(self, text):
+        self.check_cancelled()
+        self.signals.status.emit(text)
+
+    def run(self):
+        try:
+            result = self.task(self, *self.args, **self.kwargs)
+        except JobCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
+
+def start_job(job):
+    QThreadPool.globalInstance().start(job)
+    return job
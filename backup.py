@@ -0,0 +1,109 @@
+"""النسخ الاحتياطي الحي لقاعدة البيانات
+
+يعتمد على sqlite3.Connection.backup الذي ينسخ صفحات قاعدة البيانات
+مباشرة على دفعات، فتبقى قاعدة البيانات متاحة للقراءة والكتابة أثناء
+النسخ، والناتج ملف .db ثنائي يُستعاد بمجرد نسخه مكان employees.db.
+النسخ يجري في خيط خلفي فلا تتجمد الواجهة عند الإغلاق.
+
+عند تمرير store (backup_store.BackupStore) تُحفظ النسخة في المخزن المضغوط
+بإزالة التكرار وتُطبَّق سياسة الاحتفاظ بدل ملف مستقل لكل نسخة.
+"""
+import os
+import pathlib
+import sqlite3
+import threading
+from datetime import datetime
+
+from database import DB_PATH, BUSY_TIMEOUT
+
+BACKUP_DIR = os.path.join(os.path.dirname(DB_PATH), 'backups')
+
+# عدد الصفحات المنسوخة في كل خطوة؛ بين الخطوات يستطيع الكاتب متابعة عمله
+PAGES_PER_STEP = 256
+
+# الفاصل الافتراضي بين النسخ الدورية (بالدقائق)
+DEFAULT_INTERVAL_MINUTES = 60
+
+
+def backup_to_file(source_path, target_path, pages=PAGES_PER_STEP, progress=None):
+    """نسخ قاعدة البيانات source_path إلى الملف target_path على خطوات
+
+    progress(copied_pages, total_pages) تُستدعى بعد كل خطوة. الملف
+    الناتج يُكتب أولاً باسم مؤقت ثم يُعاد تسميته، فلا يظهر ملف نسخة ناقص.
+    """
+    def report(status, remaining, total):
+        if progress is not None:
+            progress(total - remaining, total)
+
+    temp_path = target_path + '.part'
+    source_uri = pathlib.Path(source_path).as_uri() + "?mode=ro"
+    source = sqlite3.connect(source_uri, uri=True, timeout=BUSY_TIMEOUT)
+    target = sqlite3.connect(temp_path)
+    try:
+        source.backup(target, pages=pages, progress=report)
+    finally:
+        target.close()
+        source.close()
+    os.replace(temp_path, target_path)
+    return target_path
+
+
+def timestamped_backup_path(backup_dir=BACKUP_DIR):
+    os.makedirs(backup_dir, exist_ok=True)
+    backup_filename = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+    return os.path.join(backup_dir, backup_filename)
+
+
+class BackupJob(threading.Thread):
+    """نسخة احتياطية واحدة في خيط خلفي
+
+    الخيط ليس daemon حتى تكتمل النسخة التي بدأت عند إغلاق النافذة قبل
+    خروج البرنامج. النتيجة في self.path (أو self.snapshot عند استخدام
+    المخزن) أو الخطأ في self.error.
+    """
+
+    def __init__(self, source_path=DB_PATH, target_path=None, progress=None, on_finished=None, store=None):
+        super().__init__(name="BackupJob")
+        self.source_path = source_path
+        self.target_path = target_path
+        self.progress = progress
+        self.on_finished = on_finished
+        self.store = store
+        self.path = None
+        self.snapshot = None
+        self.error = None
+
+    def run(self):
+        try:
+            if self.store is not None and self.target_path is None:
+                self.snapshot = self.store.create_snapshot(self.source_path, progress=self.progress)
+                self.store.apply_retention()
+            else:
+                target_path = self.target_path or timestamped_backup_path()
+                self.path = backup_to_file(self.source_path, target_path, progress=self.progress)
+        except Exception as e:
+            self.error = e
+            print(f"فشل في إنشاء النسخة الاحتياطية: {e}")
+        if self.on_finished is not None:
+            self.on_finished(self)
+
+
+class PeriodicBackup(threading.Thread):
+    """نسخ احتياطي دوري أثناء استخدام البرنامج"""
+
+    def __init__(self, source_path=DB_PATH, interval_minutes=DEFAULT_INTERVAL_MINUTES, progress=None, store=None):
+        super().__init__(name="PeriodicBackup", daemon=True)
+        self.source_path = source_path
+        self.interval = interval_minutes * 60
+        self.progress = progress
+        self.store = store
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            job = BackupJob(self.source_path, progress=self.progress, store=self.store)
+            # التنفيذ داخل هذا الخيط نفسه؛ لا حاجة لخيط إضافي
+            job.run()
+
+    def stop(self):
+        self._stopped.set()
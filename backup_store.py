@@ -0,0 +1,258 @@
+"""مخزن النسخ الاحتياطية بإزالة التكرار والضغط
+
+كل نسخة (snapshot) تؤخذ أولاً بواجهة النسخ الحي (backup.backup_to_file)
+ثم تُقسَّم إلى قطع بحجم ثابت من مضاعفات حجم الصفحة، وتُخزَّن كل قطعة
+مضغوطة باسم بصمتها (sha256). الصفحات التي لم تتغير بين نسختين تعطي نفس
+القطع فلا تُكتب مرة أخرى، فيكبر المخزن بمقدار ما تغيّر فقط. ملف وصف
+النسخة (manifest) يحفظ ترتيب القطع وبصمة الملف الكامل.
+
+الاستخدام من سطر الأوامر:
+    python backup_store.py snapshot
+    python backup_store.py list
+    python backup_store.py verify <snapshot_id>
+    python backup_store.py restore <snapshot_id> <target.db>
+    python backup_store.py prune
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from backup import BACKUP_DIR, backup_to_file
+from database import DB_PATH
+
+STORE_DIR = os.path.join(BACKUP_DIR, 'store')
+
+# حجم القطعة: مضاعف لحجم صفحة SQLite (4096) حتى تبقى الصفحات غير المتغيرة في نفس القطع
+CHUNK_SIZE = 64 * 1024
+
+COMPRESSION_LEVEL = 6
+
+# سياسة الاحتفاظ: آخر نسخة من كل يوم/أسبوع/شهر ضمن هذه الأعداد
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+KEEP_MONTHLY = 12
+
+# لا تُحذف القطع الأحدث من هذه المدة (قد تكون نسخة جارية تستخدمها)
+GC_GRACE_SECONDS = 3600
+
+# يمنع تزامن إنشاء نسخة مع التنظيف داخل نفس العملية
+_store_lock = threading.Lock()
+
+
+class BackupStore:
+    def __init__(self, root=STORE_DIR):
+        self.root = root
+        self.chunks_dir = os.path.join(root, 'chunks')
+        self.snapshots_dir = os.path.join(root, 'snapshots')
+        self.tmp_dir = os.path.join(root, 'tmp')
+        for path in (self.chunks_dir, self.snapshots_dir, self.tmp_dir):
+            os.makedirs(path, exist_ok=True)
+
+    # ---------- القطع ----------
+
+    def _chunk_path(self, digest):
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def _store_chunk(self, digest, data):
+        """كتابة القطعة إذا لم تكن موجودة؛ يرجع True إذا كانت جديدة"""
+        path = self._chunk_path(digest)
+        if os.path.exists(path):
+            # تحديث وقت التعديل حتى لا يحذفها التنظيف أثناء استخدامها
+            os.utime(path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(temp_path, 'wb') as f:
+            f.write(zlib.compress(data, COMPRESSION_LEVEL))
+        os.replace(temp_path, path)
+        return True
+
+    def _read_chunk(self, digest):
+        with open(self._chunk_path(digest), 'rb') as f:
+            data = zlib.decompress(f.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"بصمة القطعة {digest} غير مطابقة")
+        return data
+
+    # ---------- النسخ ----------
+
+    def create_snapshot(self, source_path=DB_PATH, progress=None):
+        """أخذ نسخة جديدة وتخزين القطع المتغيرة فقط، ويرجع وصف النسخة"""
+        with _store_lock:
+            snapshot_id = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            temp_db = os.path.join(self.tmp_dir, f"{snapshot_id}.db")
+            try:
+                backup_to_file(source_path, temp_db, progress=progress)
+                chunks = []
+                new_chunks = 0
+                new_bytes = 0
+                whole = hashlib.sha256()
+                size = 0
+                with open(temp_db, 'rb') as f:
+                    while True:
+                        data = f.read(CHUNK_SIZE)
+                        if not data:
+                            break
+                        digest = hashlib.sha256(data).hexdigest()
+                        whole.update(data)
+                        size += len(data)
+                        if self._store_chunk(digest, data):
+                            new_chunks += 1
+                            new_bytes += len(data)
+                        chunks.append(digest)
+            finally:
+                if os.path.exists(temp_db):
+                    os.remove(temp_db)
+
+            manifest = {
+                'id': snapshot_id,
+                'created_at': datetime.now().isoformat(timespec='seconds'),
+                'size': size,
+                'chunk_size': CHUNK_SIZE,
+                'sha256': whole.hexdigest(),
+                'chunks': chunks,
+                'new_chunks': new_chunks,
+                'new_bytes': new_bytes,
+            }
+            manifest_path = os.path.join(self.snapshots_dir, f"{snapshot_id}.json")
+            with open(manifest_path + '.part', 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.replace(manifest_path + '.part', manifest_path)
+            return manifest
+
+    def list_snapshots(self):
+        """جميع أوصاف النسخ من الأقدم إلى الأحدث"""
+        manifests = []
+        for name in sorted(os.listdir(self.snapshots_dir)):
+            if name.endswith('.json'):
+                manifests.append(self.load_snapshot(name[:-5]))
+        return manifests
+
+    def load_snapshot(self, snapshot_id):
+        with open(os.path.join(self.snapshots_dir, f"{snapshot_id}.json"), encoding='utf-8') as f:
+            return json.load(f)
+
+    # ---------- التحقق والاستعادة ----------
+
+    def verify(self, snapshot_id):
+        """التحقق من وجود وسلامة كل قطع النسخة؛ يرجع قائمة بالمشاكل (فارغة = سليمة)"""
+        manifest = self.load_snapshot(snapshot_id)
+        problems = []
+        whole = hashlib.sha256()
+        for index, digest in enumerate(manifest['chunks']):
+            try:
+                whole.update(self._read_chunk(digest))
+            except (OSError, ValueError, zlib.error) as e:
+                problems.append(f"القطعة {index}: {e}")
+        if not problems and whole.hexdigest() != manifest['sha256']:
+            problems.append("بصمة الملف الكامل غير مطابقة")
+        return problems
+
+    def restore(self, snapshot_id, target_path):
+        """إعادة بناء ملف قاعدة البيانات من النسخة والتحقق منه قبل وضعه في target_path"""
+        manifest = self.load_snapshot(snapshot_id)
+        temp_path = target_path + '.part'
+        whole = hashlib.sha256()
+        with open(temp_path, 'wb') as f:
+            for digest in manifest['chunks']:
+                data = self._read_chunk(digest)
+                whole.update(data)
+                f.write(data)
+        if whole.hexdigest() != manifest['sha256']:
+            os.remove(temp_path)
+            raise ValueError("بصمة النسخة المستعادة غير مطابقة")
+        conn = sqlite3.connect(temp_path)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        if result != 'ok':
+            os.remove(temp_path)
+            raise ValueError(f"فحص سلامة قاعدة البيانات فشل: {result}")
+        os.replace(temp_path, target_path)
+        return target_path
+
+    # ---------- الاحتفاظ والتنظيف ----------
+
+    @staticmethod
+    def _retained_ids(manifests, daily, weekly, monthly):
+        """أحدث نسخة في كل يوم/أسبوع/شهر ضمن عدد الفترات المحدد لكل نوع"""
+        keep = set()
+        periods = (
+            (daily, lambda d: d.date()),
+            (weekly, lambda d: d.isocalendar()[:2]),
+            (monthly, lambda d: (d.year, d.month)),
+        )
+        newest_first = sorted(manifests, key=lambda m: m['id'], reverse=True)
+        for count, period_of in periods:
+            seen = set()
+            for manifest in newest_first:
+                period = period_of(datetime.fromisoformat(manifest['created_at']))
+                if period in seen:
+                    continue
+                if len(seen) >= count:
+                    break
+                seen.add(period)
+                keep.add(manifest['id'])
+        return keep
+
+    def apply_retention(self, daily=KEEP_DAILY, weekly=KEEP_WEEKLY, monthly=KEEP_MONTHLY):
+        """حذف النسخ خارج سياسة الاحتفاظ ثم حذف القطع التي لم تعد مستخدمة"""
+        with _store_lock:
+            manifests = self.list_snapshots()
+            keep = self._retained_ids(manifests, daily, weekly, monthly)
+            removed = []
+            for manifest in manifests:
+                if manifest['id'] not in keep:
+                    os.remove(os.path.join(self.snapshots_dir, f"{manifest['id']}.json"))
+                    removed.append(manifest['id'])
+            referenced = set()
+            for manifest in manifests:
+                if manifest['id'] in keep:
+                    referenced.update(manifest['chunks'])
+            self._collect_garbage(referenced)
+            return removed
+
+    def _collect_garbage(self, referenced):
+        cutoff = time.time() - GC_GRACE_SECONDS
+        for prefix in os.listdir(self.chunks_dir):
+            prefix_dir = os.path.join(self.chunks_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                path = os.path.join(prefix_dir, name)
+                if name not in referenced and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+
+
+def main(argv):
+    store = BackupStore()
+    command = argv[1] if len(argv) > 1 else 'list'
+    if command == 'snapshot':
+        manifest = store.create_snapshot()
+        print(f"{manifest['id']}: {manifest['new_chunks']} قطعة جديدة من {len(manifest['chunks'])}")
+    elif command == 'list':
+        for manifest in store.list_snapshots():
+            print(f"{manifest['id']}  {manifest['created_at']}  {manifest['size']} بايت")
+    elif command == 'verify' and len(argv) == 3:
+        problems = store.verify(argv[2])
+        print("\n".join(problems) if problems else "النسخة سليمة")
+        return 1 if problems else 0
+    elif command == 'restore' and len(argv) == 4:
+        store.restore(argv[2], argv[3])
+        print(f"تمت الاستعادة إلى {argv[3]}")
+    elif command == 'prune':
+        removed = store.apply_retention()
+        print(f"تم حذف {len(removed)} نسخة")
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
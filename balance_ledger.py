@@ -0,0 +1,247 @@
+"""سجل حركات أرصدة الإجازات
+
+كل تغيير في رصيد الإجازة السنوية أو الطارئة قيد موقّع (delta) في جدول
+balance_ledger (الترحيل 8)، والرصيد الحالي يبقى محفوظاً في أعمدة
+employees.vacation_balance و emergency_vacation_balance. المشغّل
+trg_balance_ledger_apply يطبّق كل قيد على عمود الموظف داخل نفس المعاملة،
+فلا يمكن أن يتغير الرصيد دون قيد ولا أن يُسجَّل قيد دون تطبيقه.
+
+الرصيد في تاريخ سابق = آخر لقطة (balance_snapshots) قبل التاريخ + مجموع
+القيود بعدها، فلا يتجاوز عدد القيود المجموعة ما بين لقطتين مهما طال السجل.
+القيد بتاريخ سابق للقطة يُضاف إليها في المشغّل نفسه فتبقى اللقطات صحيحة.
+"""
+from datetime import date, timedelta
+
+from day_numbers import from_day, to_day
+from database import row_type
+
+# أنواع الأرصدة: نفس أسماء أنواع الإجازات، ولكل نوع عموده في employees
+BALANCE_COLUMNS = {
+    "سنوية": "vacation_balance",
+    "طارئة": "emergency_vacation_balance",
+}
+
+REASON_OPENING = "رصيد افتتاحي"
+REASON_APPROVAL = "خصم إجازة"
+REASON_CANCELLATION = "استرجاع إجازة"
+REASON_ADJUSTMENT = "تعديل يدوي"
+REASON_ANNUAL_RESET = "تجديد سنوي"
+REASON_ENTITLEMENT = "استحقاق سنوي"
+REASON_CARRY_OVER_EXPIRY = "تجاوز حد الترحيل"
+REASON_RECONCILIATION = "تسوية"
+
+LedgerEntry = row_type(
+    'id', 'employee_id', 'balance_type', 'delta', 'balance_after',
+    'reason', 'vacation_id', 'entry_date', 'note'
+)
+
+_INSERT_ENTRY = """
+    INSERT INTO balance_ledger (
+        employee_id, balance_type, delta, balance_after, reason, vacation_id, entry_date, note
+    )
+    SELECT id, ?, ?, COALESCE({column}, 0) + ?, ?, ?, ?, ?
+    FROM employees WHERE id = ?
+"""
+
+
+def _column(balance_type):
+    try:
+        return BALANCE_COLUMNS[balance_type]
+    except KeyError:
+        raise ValueError(f"نوع رصيد غير معروف: {balance_type}")
+
+
+def _entry_date(entry_date):
+    return from_day(to_day(entry_date)) if entry_date else date.today().isoformat()
+
+
+def last_month_end(today=None):
+    """آخر يوم في الشهر السابق: تاريخ اللقطة الدورية"""
+    today = today or date.today()
+    return (today.replace(day=1) - timedelta(days=1)).isoformat()
+
+
+def vacation_entry(vacation_id, sign, reason, condition="", params=()):
+    """(query, params) لقيد مدة إجازة محفوظة، مشروط اختيارياً بحالتها (condition على v)
+
+    الأنواع التي ليس لها رصيد (حج، زواج، ...) لا تُسجَّل. المدة والرصيد
+    يُقرآن داخل الاستعلام نفسه حتى يبقى صحيحاً مع خدمة الكتابة الجماعية.
+    """
+    balance = " ".join(
+        f"WHEN '{balance_type}' THEN COALESCE(e.{column}, 0)"
+        for balance_type, column in BALANCE_COLUMNS.items()
+    )
+    types = ", ".join(f"'{balance_type}'" for balance_type in BALANCE_COLUMNS)
+    query = f"""
+        INSERT INTO balance_ledger (
+            employee_id, balance_type, delta, balance_after, reason, vacation_id, entry_date
+        )
+        SELECT e.id, v.type, ? * v.duration, (CASE v.type {balance} END) + ? * v.duration,
+               ?, v.id, ?
+        FROM vacations v JOIN employees e ON e.id = v.employee_id
+        WHERE v.id = ? AND v.type IN ({types}) AND v.duration != 0 {condition}
+    """
+    return query, (sign, sign, reason, _entry_date(None), vacation_id, *params)
+
+
+def balance_entry(employee_id, balance_type, delta, reason, condition="", params=(), note=None):
+    """(query, params) لقيد واحد مشروط اختيارياً بصف الموظف (condition على employees)"""
+    query = f"{_INSERT_ENTRY.format(column=_column(balance_type))} {condition}"
+    return query, (
+        balance_type, delta, delta, reason, None, _entry_date(None), note, employee_id, *params
+    )
+
+
+class BalanceLedger:
+    def __init__(self, db):
+        self.db = db
+
+    # ---------- القيود ----------
+
+    def post(self, employee_id, balance_type, delta, reason,
+             vacation_id=None, entry_date=None, note=None):
+        """تسجيل قيد واحد وتطبيقه على رصيد الموظف"""
+        self.post_many(
+            [(employee_id, balance_type, delta, reason, vacation_id, note)], entry_date
+        )
+
+    def post_many(self, entries, entry_date=None):
+        """تسجيل عدة قيود في معاملة واحدة
+
+        entries: [(employee_id, balance_type, delta, reason, vacation_id, note)]
+        وآخر عنصرين اختياريان. تُنفَّذ القيود بترتيبها، فقيدان لنفس الموظف
+        يحمل كل منهما الرصيد بعده.
+        """
+        entry_date = _entry_date(entry_date)
+        by_type = {}
+        for entry in entries:
+            employee_id, balance_type, delta, reason, *rest = entry
+            vacation_id, note = (list(rest) + [None, None])[:2]
+            if not delta:
+                continue
+            by_type.setdefault(balance_type, []).append(
+                (balance_type, delta, delta, reason, vacation_id, entry_date, note, employee_id)
+            )
+        with self.db.transaction():
+            for balance_type, rows in by_type.items():
+                self.db.execute_many(_INSERT_ENTRY.format(column=_column(balance_type)), rows)
+
+    def post_vacation(self, vacation_id, sign, reason):
+        """قيد خصم (sign = -1) أو استرجاع (sign = 1) لمدة إجازة محفوظة"""
+        self.db.execute_query(*vacation_entry(vacation_id, sign, reason))
+
+    def set_balance(self, employee_id, balance_type, value, reason=REASON_ADJUSTMENT,
+                    entry_date=None, note=None):
+        """ضبط رصيد موظف على قيمة محددة بقيد تعديل بالفرق"""
+        self._set(balance_type, value, reason, entry_date, note, "AND id = ?", (employee_id,))
+
+    def set_all(self, balance_type, value, reason, entry_date=None, note=None):
+        """ضبط رصيد كل الموظفين على قيمة واحدة (مثل تجديد الرصيد الطارئ)"""
+        self._set(balance_type, value, reason, entry_date, note, "", ())
+
+    def post_computed(self, balance_type, delta, reason, entry_date=None, note=None,
+                      source="employees", params=()):
+        """قيد لكل موظف بفرق يُحسب داخل الاستعلام
+
+        delta تعبير SQL على أعمدة source (جدول الموظفين أو استعلام فوقه)،
+        فيُقرأ الرصيد ويُطبَّق القيد في استعلام واحد داخل وحدة الكتابة.
+        params معاملات source. الموظف الذي فرقه صفر لا يُسجَّل له قيد.
+        """
+        column = _column(balance_type)
+        self.db.execute_query(f"""
+            INSERT INTO balance_ledger (
+                employee_id, balance_type, delta, balance_after, reason, entry_date, note
+            )
+            SELECT id, ?, delta, COALESCE({column}, 0) + delta, ?, ?, ?
+            FROM (SELECT id, {column}, ({delta}) AS delta FROM ({source}))
+            WHERE delta != 0
+        """, (balance_type, reason, _entry_date(entry_date), note, *params))
+
+    def _set(self, balance_type, value, reason, entry_date, note, condition, params):
+        column = _column(balance_type)
+        self.db.execute_query(f"""
+            INSERT INTO balance_ledger (
+                employee_id, balance_type, delta, balance_after, reason, entry_date, note
+            )
+            SELECT id, ?, ? - COALESCE({column}, 0), ?, ?, ?, ?
+            FROM employees WHERE COALESCE({column}, 0) != ? {condition}
+        """, (balance_type, value, value, reason, _entry_date(entry_date), note, value, *params))
+
+    def entries(self, employee_id, balance_type=None):
+        """قيود الموظف من الأحدث إلى الأقدم"""
+        query = """
+            SELECT id, employee_id, balance_type, delta, balance_after,
+                   reason, vacation_id, entry_date, note
+            FROM balance_ledger WHERE employee_id = ?
+        """
+        params = [employee_id]
+        if balance_type is not None:
+            query += " AND balance_type = ?"
+            params.append(balance_type)
+        query += " ORDER BY entry_day DESC, id DESC"
+        return self.db.fetch_all(query, params, row_type=LedgerEntry)
+
+    # ---------- الأرصدة ----------
+
+    def balance(self, employee_id, balance_type):
+        """الرصيد الحالي المحفوظ"""
+        return self.db.fetch_scalar(
+            f"SELECT COALESCE({_column(balance_type)}, 0) FROM employees WHERE id = ?",
+            (employee_id,), default=0
+        )
+
+    def balance_as_of(self, employee_id, balance_type, as_of):
+        """الرصيد في نهاية يوم as_of"""
+        day = to_day(as_of)
+        snapshot = self.db.fetch_one("""
+            SELECT snapshot_day, balance FROM balance_snapshots
+            WHERE employee_id = ? AND balance_type = ? AND snapshot_day <= ?
+            ORDER BY snapshot_day DESC LIMIT 1
+        """, (employee_id, balance_type, day))
+        since, base = snapshot if snapshot else (-2 ** 31, 0)
+        return base + self.db.fetch_scalar("""
+            SELECT COALESCE(SUM(delta), 0) FROM balance_ledger
+            WHERE employee_id = ? AND balance_type = ? AND entry_day > ? AND entry_day <= ?
+        """, (employee_id, balance_type, since, day), default=0)
+
+    # ---------- اللقطات ----------
+
+    def take_snapshots(self, as_of=None):
+        """لقطة لأرصدة كل الموظفين في نهاية يوم as_of (افتراضياً آخر يوم في الشهر السابق)
+
+        تُبنى من آخر لقطة سابقة + قيود الفترة بعدها. يرجع عدد الأرصدة المحفوظة.
+        """
+        day = to_day(as_of or last_month_end())
+        with self.db.transaction():
+            self.db.execute_query("""
+                INSERT OR REPLACE INTO balance_snapshots (employee_id, balance_type, snapshot_day, balance)
+                SELECT employee_id, balance_type, ?, SUM(balance)
+                FROM (
+                    SELECT s.employee_id, s.balance_type, s.balance
+                    FROM balance_snapshots s
+                    WHERE s.snapshot_day = (
+                        SELECT MAX(snapshot_day) FROM balance_snapshots p
+                        WHERE p.employee_id = s.employee_id AND p.balance_type = s.balance_type
+                        AND p.snapshot_day < ?
+                    )
+                    UNION ALL
+                    SELECT l.employee_id, l.balance_type, l.delta
+                    FROM balance_ledger l
+                    WHERE l.entry_day <= ? AND l.entry_day > COALESCE((
+                        SELECT MAX(snapshot_day) FROM balance_snapshots p
+                        WHERE p.employee_id = l.employee_id AND p.balance_type = l.balance_type
+                        AND p.snapshot_day < ?
+                    ), -2147483648)
+                )
+                GROUP BY employee_id, balance_type
+            """, (day, day, day, day))
+        return self.db.fetch_scalar(
+            "SELECT COUNT(*) FROM balance_snapshots WHERE snapshot_day = ?", (day,), default=0
+        )
+
+    def ensure_snapshots(self, as_of=None):
+        """أخذ اللقطة الدورية إذا لم تؤخذ بعد"""
+        day = to_day(as_of or last_month_end())
+        if self.db.fetch_one("SELECT 1 FROM balance_snapshots WHERE snapshot_day = ? LIMIT 1", (day,)):
+            return 0
+        return self.take_snapshots(from_day(day))
@@ -0,0 +1,139 @@
+"""مطابقة أرصدة الإجازات مع الإجازات الموافق عليها
+
+الرصيد المتوقع لكل موظف ونوع رصيد (سنوية / طارئة):
+    مجموع قيود السجل + فرق كل إجازة متتبَّعة بين قيودها وما يجب أن تكون
+ما يجب أن تكون عليه قيود الإجازة: -المدة إذا كانت موافقاً عليها، وإلا صفر.
+الإجازة متتبَّعة إذا كان لها قيد في السجل أو أُنشئت بعد القيد الافتتاحي
+لصاحبها؛ الإجازات الأقدم محسوبة أصلاً في الرصيد الافتتاحي.
+
+الفرق بين الرصيد المتوقع وعمود employees هو الانحراف. كل الحساب تجميعات
+pandas على جداول كاملة، والتصحيح (اختياري) في معاملة واحدة: قيود تسوية
+مرتبطة بالإجازات ثم إعادة كتابة العمود بالرصيد المتوقع.
+
+    python balance_reconciliation.py [--apply]
+"""
+import os
+import sys
+
+import pandas as pd
+
+from balance_ledger import BALANCE_COLUMNS, REASON_OPENING, REASON_RECONCILIATION, BalanceLedger
+from query_profiler import LOG_DIR
+
+REPORT_PATH = os.path.join(LOG_DIR, 'balance_reconciliation.csv')
+
+APPROVED = "موافق"
+
+REPORT_COLUMNS = [
+    'employee_id', 'serial_number', 'name', 'balance_type',
+    'recorded', 'ledger', 'expected', 'difference'
+]
+
+
+def _frame(rows, columns):
+    return pd.DataFrame(list(rows), columns=columns)
+
+
+def vacation_corrections(ledger, vacations, opening_at):
+    """قيود التسوية اللازمة لكل إجازة متتبَّعة (vacation_id, employee_id, balance_type, delta)"""
+    posted = ledger.dropna(subset=['vacation_id'])
+    posted = (
+        posted.groupby(posted['vacation_id'].astype('int64'))['delta'].sum()
+        .rename('posted')
+    )
+    vacations = (
+        vacations
+        .join(opening_at, on='employee_id')
+        .join(posted, on='id')
+    )
+    # من ليس له قيد افتتاحي تُتتبَّع كل إجازاته
+    tracked = (
+        vacations['posted'].notna()
+        | (vacations['created_at'] >= vacations['opening_at'].fillna(''))
+    )
+    vacations = vacations[tracked]
+    expected = vacations['duration'].where(vacations['status'] == APPROVED, 0).mul(-1)
+    delta = expected - vacations['posted'].fillna(0)
+    corrections = vacations.assign(delta=delta)[delta != 0]
+    return corrections.rename(columns={'id': 'vacation_id', 'type': 'balance_type'})[
+        ['vacation_id', 'employee_id', 'balance_type', 'delta']
+    ]
+
+
+def reconcile(db):
+    """(تقرير الانحرافات، قيود التسوية) كإطاري بيانات"""
+    types = list(BALANCE_COLUMNS)
+    placeholders = ", ".join("?" * len(types))
+    ledger = _frame(db.fetch_all(
+        "SELECT employee_id, balance_type, delta, vacation_id FROM balance_ledger"
+    ), ['employee_id', 'balance_type', 'delta', 'vacation_id'])
+    opening_at = _frame(db.fetch_all(
+        "SELECT employee_id, MIN(created_at) FROM balance_ledger WHERE reason = ? GROUP BY employee_id",
+        (REASON_OPENING,)
+    ), ['employee_id', 'opening_at']).set_index('employee_id')['opening_at']
+    vacations = _frame(db.fetch_all(f"""
+        SELECT id, employee_id, type, duration, status, created_at
+        FROM vacations WHERE type IN ({placeholders})
+    """, types), ['id', 'employee_id', 'type', 'duration', 'status', 'created_at'])
+    employees = _frame(db.fetch_all(f"""
+        SELECT id, serial_number, name, {", ".join(f"COALESCE({column}, 0)" for column in BALANCE_COLUMNS.values())}
+        FROM employees
+    """), ['employee_id', 'serial_number', 'name', *types])
+
+    recorded = employees.melt(
+        id_vars=['employee_id', 'serial_number', 'name'], value_vars=types,
+        var_name='balance_type', value_name='recorded'
+    )
+    keys = ['employee_id', 'balance_type']
+    corrections = vacation_corrections(ledger, vacations, opening_at)
+    report = (
+        recorded
+        .join(ledger.groupby(keys)['delta'].sum().rename('ledger'), on=keys)
+        .join(corrections.groupby(keys)['delta'].sum().rename('correction'), on=keys)
+        .fillna({'ledger': 0, 'correction': 0})
+    )
+    report['expected'] = report['ledger'] + report['correction']
+    report['difference'] = report['expected'] - report['recorded']
+    drifted = report[(report['difference'] != 0) | (report['ledger'] != report['recorded'])]
+    drifted = drifted[REPORT_COLUMNS].astype(
+        {column: 'int64' for column in ('recorded', 'ledger', 'expected', 'difference')}
+    )
+    return drifted.sort_values(keys).reset_index(drop=True), corrections
+
+
+def write_report(report, path=REPORT_PATH):
+    # utf-8-sig حتى يفتح Excel الأسماء العربية بشكل صحيح
+    report.to_csv(path, index=False, encoding='utf-8-sig')
+    return path
+
+
+def apply_fixes(db, report, corrections):
+    """تطبيق التسوية في معاملة واحدة؛ يرجع عدد الأرصدة المصححة"""
+    if report.empty:
+        return 0
+    with db.transaction():
+        BalanceLedger(db).post_many([
+            (int(row.employee_id), row.balance_type, int(row.delta), REASON_RECONCILIATION, int(row.vacation_id))
+            for row in corrections.itertuples(index=False)
+        ])
+        # ما بقي بعد قيود التسوية تعديل مباشر على العمود خارج السجل: يُعاد بناؤه من السجل
+        for balance_type, rows in report.groupby('balance_type'):
+            db.execute_many(
+                f"UPDATE employees SET {BALANCE_COLUMNS[balance_type]} = ? WHERE id = ?",
+                [(int(row.expected), int(row.employee_id)) for row in rows.itertuples(index=False)]
+            )
+    return len(report)
+
+
+def main(argv):
+    from database import DatabaseManager
+    db = DatabaseManager()
+    report, corrections = reconcile(db)
+    print(f"أرصدة غير مطابقة: {len(report)} (التقرير في {write_report(report)})")
+    if '--apply' in argv[1:]:
+        print(f"تم تصحيح {apply_fixes(db, report, corrections)} رصيد")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,182 +1,537 @@
-import sys
 import sqlite3
 import os
+import pathlib
+import time
+import weakref
+from contextlib import contextmanager
 from PyQt6.QtCore import QDate  
-from threading import Lock
-from datetime import datetime
+from threading import Event, Lock, RLock, Thread, local
+
+import migrations
+
+DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), 'employees.db'))
+
+# مهلة انتظار قفل الكتابة (بالثواني) قبل ظهور "database is locked"
+BUSY_TIMEOUT = 30
+
+# الاستعلامات التي تُوجَّه إلى اتصالات القراءة
+READ_STATEMENTS = ('SELECT', 'EXPLAIN')
+
+
+class _ReadConnection:
+    """حامل اتصال القراءة في التخزين المحلي للخيط
+
+    عند انتهاء الخيط يُحذف تخزينه المحلي ومعه الحامل، فيُغلق الاتصال
+    (weakref.finalize) ولا تتراكم الاتصالات من خيوط QThreadPool وغيرها.
+    """
+    __slots__ = ('conn', '__weakref__')
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+def _close_read_connection(connections, lock, conn):
+    with lock:
+        if conn in connections:
+            connections.remove(conn)
+    conn.close()
+
+
+# عدد الصفوف التي تُجلب في كل دفعة عند المرور على النتائج بـ iter_rows
+ITER_BATCH_SIZE = 500
+
+# الفاصل (بالثواني) بين مرات حفظ تقرير الاستعلامات في start_profile_flush
+PROFILE_FLUSH_SECONDS = 60
+
+
+class ConcurrentUpdateError(Exception):
+    """الصف تغيّر (من عملية أو نافذة أخرى) بعد قراءته فلم يُطبَّق التعديل"""
+
+
+class Row:
+    """صف نتيجة مضغوط يعتمد على __slots__ بدلاً من قاموس لكل صف
+
+    يدعم الوصول بالاسم (row.name) وبالفهرس (row[0]) والتفكيك
+    (emp_id, name = row) مثل الصفوف العادية.
+    """
+    __slots__ = ()
+
+    def __init__(self, *values):
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def __iter__(self):
+        return (getattr(self, field) for field in self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        if isinstance(key, slice):
+            return tuple(self)[key]
+        return getattr(self, self.__slots__[key])
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        values = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"{type(self).__name__}({values})"
+
+
+_row_types = {}
+
+
+def row_type(*fields):
+    """إرجاع نوع صف مضغوط بالحقول المحددة (يُخزَّن ويُعاد استخدامه لنفس الحقول)"""
+    cls = _row_types.get(fields)
+    if cls is None:
+        cls = type("Row_" + "_".join(fields), (Row,), {'__slots__': fields})
+        _row_types[fields] = cls
+    return cls
 
 class DatabaseManager:
-    def __init__(self):
-        self.db_path = os.path.join(os.path.dirname(__file__), 'employees.db')
-        self.connection_lock = Lock()
+    def __init__(self, write_client=None):
+        self.db_path = DB_PATH
+        # عند تمرير WriteClient تذهب الكتابات إلى خدمة التثبيت الجماعي (write_service)
+        self.write_client = write_client
+        # RLock لأن execute_query يُستدعى من داخل transaction() في نفس الخيط
+        self.connection_lock = RLock()
         self.conn = None
-        self.cursor = None
+        # اتصال قراءة مستقل لكل خيط (Thread) + آخر مؤشر استخدمه الخيط
+        self._local = local()
+        self._pool_lock = Lock()
+        self._read_connections = []
+        # قياس زمن كل استعلام وسجل الاستعلامات البطيئة (query_profiler)
+        from query_profiler import QueryProfiler
+        self.profiler = QueryProfiler()
         self.initialize_connection()
         self.initialize_database()
-        self.create_indexes()
+
+    @property
+    def cursor(self):
+        """مؤشر آخر استعلام نفّذه الخيط الحالي (للتوافق مع الاستدعاءات القديمة)"""
+        cursor = getattr(self._local, 'cursor', None)
+        return cursor if cursor is not None else self._write_cursor
 
     def initialize_connection(self):
-        """تهيئة اتصال قاعدة البيانات"""
+        """تهيئة اتصال الكتابة وتفعيل وضع WAL"""
         try:
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
             self.conn.execute("PRAGMA foreign_keys = ON")
-            self.cursor = self.conn.cursor()
+            # في وضع WAL لا يحجب القرّاء الكاتب ولا يحجب الكاتب القرّاء
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+            self._write_cursor = self.conn.cursor()
         except sqlite3.Error as e:
             print(f"فشل في الاتصال بقاعدة البيانات: {e}")
             raise
 
-    def initialize_database(self):
-        tables = [
-            """CREATE TABLE IF NOT EXISTS employees (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                serial_number TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                national_id TEXT UNIQUE NOT NULL,
-                department TEXT,
-                job_grade TEXT,
-                hiring_date TEXT,
-                grade_date TEXT,
-                bonus INTEGER DEFAULT 0,
-                vacation_balance INTEGER DEFAULT 30,
-                emergency_vacation_balance INTEGER DEFAULT 12,
-                work_days TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS departments (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT UNIQUE NOT NULL,
-                head_id INTEGER,
-                head_password TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )""",
-            """CREATE TABLE IF NOT EXISTS vacations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                type TEXT NOT NULL,
-                subtype TEXT,
-                relation TEXT,
-                start_date TEXT NOT NULL,
-                end_date TEXT NOT NULL,
-                duration INTEGER NOT NULL,
-                notes TEXT,
-                status TEXT DEFAULT 'تحت الإجراء',
-                dept_approval TEXT DEFAULT 'تحت الإجراء',
-                dept_approver TEXT,
-                approved_by TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
-            )""",
-            """CREATE TABLE IF NOT EXISTS absences (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                employee_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                type TEXT NOT NULL,
-                duration INTEGER DEFAULT 1,
-                notes TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE,
-                UNIQUE(employee_id, date)
-            )""",
-            """CREATE TABLE IF NOT EXISTS audit_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                action TEXT NOT NULL,
-                table_name TEXT NOT NULL,
-                record_id INTEGER,
-                changes TEXT,
-                user TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )"""
-        ]
+    def _read_connection(self):
+        """إرجاع اتصال القراءة الخاص بالخيط الحالي (يُنشأ عند أول استخدام)"""
+        holder = getattr(self._local, 'read_conn', None)
+        if holder is None:
+            uri = pathlib.Path(self.db_path).as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            holder = self._local.read_conn = _ReadConnection(conn)
+            with self._pool_lock:
+                self._read_connections.append(conn)
+            weakref.finalize(holder, _close_read_connection, self._read_connections, self._pool_lock, conn)
+        return holder.conn
 
-        try:
-            for table in tables:
-                self.cursor.execute(table)
+    @staticmethod
+    def _is_read_query(query):
+        """هل الاستعلام قراءة فقط يمكن تنفيذه على اتصال قراءة؟"""
+        words = query.lstrip().split(None, 1)
+        if not words or words[0].upper() not in READ_STATEMENTS:
+            return False
+        # last_insert_rowid و changes مرتبطتان باتصال الكتابة
+        lowered = query.lower()
+        return 'last_insert_rowid' not in lowered and 'changes()' not in lowered
+
+    def _in_transaction(self):
+        """هل الخيط الحالي داخل transaction()؟"""
+        return getattr(self._local, 'tx_depth', 0) > 0
+
+    def _use_reader(self, query):
+        """القراءة داخل معاملة تتم على اتصال الكتابة لرؤية التعديلات غير المثبتة"""
+        if not self._is_read_query(query):
+            return False
+        # مع خدمة الكتابة تُجمع المعاملة في وحدة واحدة ولا يوجد اتصال كتابة محلي
+        return self.write_client is not None or not self._in_transaction()
+
+    @contextmanager
+    def transaction(self):
+        """تجميع عدة عمليات في معاملة واحدة تُثبَّت مرة واحدة
+
+        المعاملات المتداخلة تتحول إلى SAVEPOINT، فيُلغى الجزء الداخلي وحده
+        عند فشله دون إلغاء المعاملة الخارجية. داخل المعاملة لا يقوم
+        execute_query بالتثبيت بعد كل استعلام.
+
+            with db.transaction():
+                db.execute_query("UPDATE vacations ...")
+                db.execute_query("UPDATE employees ...")
 
-            # إضافة الأعمدة الجديدة إذا لم تكن موجودة
+        مع خدمة الكتابة تُجمع استعلامات المعاملة وتُرسل كوحدة واحدة عند
+        الخروج منها، والقراءة داخلها ترى آخر حالة مثبتة فقط.
+        """
+        if self.write_client is not None:
+            with self._buffered_transaction():
+                yield self
+            return
+
+        with self.connection_lock:
+            depth = getattr(self._local, 'tx_depth', 0)
+            savepoint = f"sp_{depth}"
+            try:
+                if depth == 0:
+                    # IMMEDIATE يحجز قفل الكتابة من البداية بدل الفشل في منتصف المعاملة
+                    self.conn.execute("BEGIN IMMEDIATE")
+                else:
+                    self.conn.execute(f"SAVEPOINT {savepoint}")
+            except sqlite3.Error as e:
+                raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
+            self._local.tx_depth = depth + 1
             try:
-                self.cursor.execute("ALTER TABLE employees ADD COLUMN emergency_vacation_balance INTEGER DEFAULT 12")
-            except Exception:
-                pass
-
-            # إضافة أقسام افتراضية (حسب ما لديك)
-            default_depts = ['الإدارة', 'التمريض', 'المحاسبة', 'المختبر', 'الصيدلة']
-            insert_query = "INSERT OR IGNORE INTO departments (name) VALUES (?)"
-            for dept in default_depts:
-                self.cursor.execute(insert_query, (dept,))
-
-            self.conn.commit()
-        except Exception as e:
-            print(f"خطأ في إنشاء الجداول: {e}")
-            self.conn.rollback()
+                yield self
+                if depth == 0:
+                    self.conn.commit()
+                else:
+                    self.conn.execute(f"RELEASE {savepoint}")
+            except BaseException:
+                if depth == 0:
+                    self.conn.rollback()
+                else:
+                    self.conn.execute(f"ROLLBACK TO {savepoint}")
+                    self.conn.execute(f"RELEASE {savepoint}")
+                raise
+            finally:
+                self._local.tx_depth = depth
+
+    @contextmanager
+    def _buffered_transaction(self):
+        """معاملة تُجمع استعلاماتها محلياً ثم تُرسل لخدمة الكتابة دفعة واحدة"""
+        depth = getattr(self._local, 'tx_depth', 0)
+        if depth == 0:
+            self._local.tx_statements = []
+        mark = len(self._local.tx_statements)
+        self._local.tx_depth = depth + 1
+        try:
+            yield self
+        except BaseException:
+            # مثل ROLLBACK TO: حذف ما أُضيف داخل هذا المستوى فقط
+            del self._local.tx_statements[mark:]
             raise
+        finally:
+            self._local.tx_depth = depth
+        if depth == 0:
+            statements = self._local.tx_statements
+            self._local.tx_statements = None
+            if statements:
+                self.write_client.submit(statements)
 
+    @staticmethod
+    def _process_params(params):
+        """تحويل التواريخ من QDate إلى نص"""
+        processed_params = []
+        for param in params:
+            if isinstance(param, QDate):
+                processed_params.append(param.toString("yyyy-MM-dd"))
+            else:
+                processed_params.append(param)
+        return processed_params
 
+    def _timed_execute(self, cursor, query, params):
+        """تنفيذ الاستعلام على المؤشر وتسجيل زمنه في profiler"""
+        start = time.perf_counter()
+        result = cursor.execute(query, params)
+        self._record(cursor.connection, query, params, start)
+        return result
 
+    def _record(self, conn, query, params, start):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.profiler.record(
+            query, params, elapsed_ms,
+            explain=lambda: conn.execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+        )
 
-    def create_indexes(self):
-        """إنشاء الفهارس لتحسين الأداء"""
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_emp_national_id ON employees(national_id)",
-            "CREATE INDEX IF NOT EXISTS idx_emp_department ON employees(department)",
-            "CREATE INDEX IF NOT EXISTS idx_vacations_employee ON vacations(employee_id)",
-            "CREATE INDEX IF NOT EXISTS idx_vacations_date ON vacations(start_date, end_date)",
-            "CREATE INDEX IF NOT EXISTS idx_absences_employee_date ON absences(employee_id, date)"
-        ]
-        
+    def dump_query_profile(self, report_path=None):
+        """كتابة تقرير زمن الاستعلامات وحفظ عينات الاستعلامات لإعادة تشغيلها"""
         try:
-            for index in indexes:
-                self.cursor.execute(index)
-            self.conn.commit()
-        except sqlite3.Error as e:
-            print(f"خطأ في إنشاء الفهارس: {e}")
+            if report_path is None:
+                self.profiler.dump_report()
+            else:
+                self.profiler.dump_report(report_path)
+            self.profiler.save_workload()
+        except OSError as e:
+            print(f"فشل في حفظ تقرير الاستعلامات: {e}")
+
+    def start_profile_flush(self, report_path=None, interval=PROFILE_FLUSH_SECONDS):
+        """حفظ تقرير الاستعلامات كل interval ثانية في خيط خلفي
+
+        للعمليات التي قد تُنهى دون تنفيذ كود الإغلاق، فلا يضيع إلا ما سُجّل
+        بعد آخر حفظ. ترجع Event يوقف الحفظ الدوري عند ضبطه.
+        """
+        stop = Event()
+
+        def flush():
+            while not stop.wait(interval):
+                self.dump_query_profile(report_path)
+
+        Thread(target=flush, name="query-profile-flush", daemon=True).start()
+        return stop
+
+    def initialize_database(self):
+        """تطبيق ترحيلات المخطط (مجرد فحص لرقم الإصدار إذا كان المخطط محدثاً)"""
+        with self.connection_lock:
+            try:
+                migrations.migrate(self.conn)
+            except Exception as e:
+                print(f"خطأ في ترحيل قاعدة البيانات: {e}")
+                raise
 
     def execute_query(self, query, params=(), commit=True):
-        """تنفيذ استعلام مع معالجة الأخطاء"""
+        """تنفيذ استعلام مع معالجة الأخطاء
+
+        استعلامات القراءة تُنفَّذ على اتصال القراءة الخاص بالخيط دون أي قفل،
+        أما الكتابة فتمر عبر اتصال الكتابة الوحيد تحت القفل، أو عبر خدمة
+        الكتابة الجماعية إذا كان write_client محدداً.
+        """
+        processed_params = self._process_params(params)
+        if self._use_reader(query):
+            cursor = self._read_connection().cursor()
+            try:
+                result = self._timed_execute(cursor, query, processed_params)
+            except sqlite3.Error as e:
+                raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
+            self._local.cursor = cursor
+            return result
+
+        if self.write_client is not None:
+            statement = (query, processed_params, False)
+            if self._in_transaction():
+                # يُنفَّذ مع بقية المعاملة عند الخروج منها
+                self._local.tx_statements.append(statement)
+                return None
+            start = time.perf_counter()
+            result = self.write_client.submit([statement])
+            # الخطة تُستخرج على اتصال القراءة (EXPLAIN لا يكتب شيئاً)
+            self._record(self._read_connection(), query, processed_params, start)
+            return result
+
         with self.connection_lock:
+            in_transaction = self._in_transaction()
+            cursor = self.conn.cursor()
             try:
-                # تحويل التواريخ من QDate إلى نص
-                processed_params = []
-                for param in params:
-                    if isinstance(param, QDate):
-                        processed_params.append(param.toString("yyyy-MM-dd"))
-                    else:
-                        processed_params.append(param)
-                
-                result = self.cursor.execute(query, processed_params)
-                if commit:
+                result = self._timed_execute(cursor, query, processed_params)
+                if commit and not in_transaction:
                     self.conn.commit()
+                self._local.cursor = cursor
                 return result
             except sqlite3.Error as e:
-                self.conn.rollback()
+                # داخل transaction() يتولى مدير المعاملة التراجع
+                if not in_transaction:
+                    self.conn.rollback()
                 raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
 
-    def create_backup(self):
-        """إنشاء نسخة احتياطية من قاعدة البيانات"""
-        try:
-            backup_dir = os.path.join(
-                os.path.dirname(__file__), 
-                'backups'
+    def execute_many(self, query, seq_of_params):
+        """تنفيذ نفس الاستعلام لعدة مجموعات من المعاملات في معاملة واحدة"""
+        seq_of_params = [self._process_params(params) for params in seq_of_params]
+        if not seq_of_params:
+            return None
+        if self.write_client is not None:
+            statement = (query, seq_of_params, True)
+            if self._in_transaction():
+                self._local.tx_statements.append(statement)
+                return None
+            start = time.perf_counter()
+            result = self.write_client.submit([statement])
+            self._record(self._read_connection(), query, seq_of_params[0], start)
+            return result
+
+        with self.connection_lock:
+            in_transaction = self._in_transaction()
+            cursor = self.conn.cursor()
+            try:
+                start = time.perf_counter()
+                result = cursor.executemany(query, seq_of_params)
+                self._record(self.conn, query, seq_of_params[0], start)
+                if not in_transaction:
+                    self.conn.commit()
+                self._local.cursor = cursor
+                return result
+            except sqlite3.Error as e:
+                if not in_transaction:
+                    self.conn.rollback()
+                raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
+
+    def execute_unit(self, statements):
+        """تنفيذ عدة استعلامات كتابة [(query, params)] كوحدة ذرية واحدة
+
+        يرجع نتيجة آخر استعلام (rowcount / lastrowid). مع خدمة الكتابة تُرسل
+        الوحدة في طلب واحد؛ وداخل transaction() مع خدمة الكتابة تُضاف إلى
+        المعاملة ويرجع None لأن النتيجة لا تُعرف قبل إرسالها.
+        """
+        statements = [(query, self._process_params(params), False) for query, params in statements]
+        if self.write_client is not None:
+            if self._in_transaction():
+                self._local.tx_statements.extend(statements)
+                return None
+            start = time.perf_counter()
+            result = self.write_client.submit(statements)
+            query, params, _ = statements[-1]
+            self._record(self._read_connection(), query, params, start)
+            return result
+
+        with self.transaction():
+            result = None
+            for query, params, _ in statements:
+                result = self.execute_query(query, params)
+            return result
+
+    def row_version(self, table, row_id):
+        """رقم إصدار الصف (عمود version) أو None إذا لم يوجد"""
+        return self.fetch_scalar(f"SELECT version FROM {table} WHERE id = ?", (row_id,))
+
+    def compare_and_swap(self, table, row_id, expected_version, changes, then=()):
+        """تعديل صف فقط إذا لم يتغير إصداره منذ قراءته (optimistic concurrency)
+
+        changes: {العمود: القيمة}. يرجع True، ويرفع
+        ConcurrentUpdateError إذا كان الصف قد تغيّر أو حُذف. لا يُحجز أي قفل
+        بين القراءة والتعديل، فالواجهة ولوحة رئيس القسم والبوت يكتبون دون
+        انتظار بعضهم، ويُكتشف التعارض في جملة UPDATE نفسها.
+
+        then: استعلامات [(query, params)] تُنفَّذ في نفس الوحدة بعد التعديل،
+        مشروطة بالإصدار الجديد (expected_version + 1) حتى لا تغيّر شيئاً عند
+        التعارض؛ وحينها تُفحص نتيجة آخرها بدل التعديل.
+
+        داخل transaction() مع خدمة الكتابة لا تُعرف النتيجة قبل إرسال
+        المعاملة، فيُطبَّق الشرط دون فحص ويرجع None.
+        """
+        assignments = ", ".join(f"{column} = ?" for column in changes)
+        swap = (
+            f"UPDATE {table} SET {assignments}, version = version + 1 WHERE id = ? AND version = ?",
+            (*changes.values(), row_id, expected_version)
+        )
+        result = self.execute_unit([swap, *then])
+        if result is None:
+            return None
+        if result.rowcount == 0:
+            raise ConcurrentUpdateError(
+                "تم تعديل هذه البيانات من مكان آخر بعد تحميلها. أعد التحميل وحاول مرة أخرى."
             )
-            os.makedirs(backup_dir, exist_ok=True)
-            
-            backup_filename = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
-            backup_path = os.path.join(backup_dir, backup_filename)
-            
-            with open(backup_path, 'wb') as f:
-                for line in self.conn.iterdump():
-                    f.write(f"{line}\n".encode('utf-8'))
-            return True
-        except Exception as e:
-            print(f"فشل في إنشاء النسخة الاحتياطية: {e}")
-            return False
+        return True
+
+    def _run_read(self, query, params, consume):
+        """تنفيذ استعلام على مؤشر مستقل وتمرير المؤشر إلى consume قبل إغلاقه"""
+        processed_params = self._process_params(params)
+        if self._use_reader(query):
+            cursor = self._read_connection().cursor()
+            try:
+                start = time.perf_counter()
+                cursor.execute(query, processed_params)
+                result = consume(cursor)
+                self._record(cursor.connection, query, processed_params, start)
+                return result
+            except sqlite3.Error as e:
+                raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
+            finally:
+                cursor.close()
+
+        with self.connection_lock:
+            cursor = self.conn.cursor()
+            try:
+                start = time.perf_counter()
+                cursor.execute(query, processed_params)
+                result = consume(cursor)
+                self._record(self.conn, query, processed_params, start)
+                return result
+            except sqlite3.Error as e:
+                raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
+            finally:
+                cursor.close()
+
+    def fetch_all(self, query, params=(), row_type=None):
+        """إرجاع جميع صفوف الاستعلام كقائمة (اختيارياً كصفوف من النوع row_type)"""
+        rows = self._run_read(query, params, lambda cursor: cursor.fetchall())
+        if row_type is not None:
+            return [row_type(*row) for row in rows]
+        return rows
+
+    def fetch_one(self, query, params=(), row_type=None):
+        """إرجاع أول صف من الاستعلام أو None"""
+        row = self._run_read(query, params, lambda cursor: cursor.fetchone())
+        if row is not None and row_type is not None:
+            return row_type(*row)
+        return row
+
+    def fetch_scalar(self, query, params=(), default=None):
+        """إرجاع قيمة العمود الأول من أول صف، أو default إذا لم توجد نتيجة"""
+        row = self.fetch_one(query, params)
+        if row is None or row[0] is None:
+            return default
+        return row[0]
+
+    def iter_rows(self, query, params=(), row_type=None, batch_size=ITER_BATCH_SIZE):
+        """المرور على صفوف الاستعلام على دفعات دون تحميلها كلها في الذاكرة"""
+        if not self._use_reader(query):
+            yield from self.fetch_all(query, params, row_type)
+            return
+        processed_params = self._process_params(params)
+        cursor = self._read_connection().cursor()
+        try:
+            # الزمن المسجل هو زمن SQLite فقط (التنفيذ وجلب الدفعات) دون زمن المستهلك
+            start = time.perf_counter()
+            try:
+                cursor.execute(query, processed_params)
+            except sqlite3.Error as e:
+                raise Exception(f"خطأ في قاعدة البيانات: {str(e)}")
+            elapsed = time.perf_counter() - start
+            while True:
+                start = time.perf_counter()
+                rows = cursor.fetchmany(batch_size)
+                elapsed += time.perf_counter() - start
+                if not rows:
+                    break
+                for row in rows:
+                    yield row_type(*row) if row_type is not None else row
+            self._record(cursor.connection, query, processed_params, time.perf_counter() - elapsed)
+        finally:
+            cursor.close()
+
+    def create_backup(self, progress=None, wait=False):
+        """إنشاء نسخة احتياطية في مخزن النسخ في الخلفية وإرجاع BackupJob الخاص بها"""
+        from backup import BackupJob
+        from backup_store import BackupStore
+        job = BackupJob(self.db_path, progress=progress, store=BackupStore())
+        job.start()
+        if wait:
+            job.join()
+        return job
+
+    def start_periodic_backup(self, interval_minutes=None, progress=None):
+        """تشغيل نسخ احتياطي دوري أثناء عمل البرنامج"""
+        from backup import PeriodicBackup, DEFAULT_INTERVAL_MINUTES
+        from backup_store import BackupStore
+        periodic = PeriodicBackup(
+            self.db_path,
+            interval_minutes or DEFAULT_INTERVAL_MINUTES,
+            progress=progress,
+            store=BackupStore()
+        )
+        periodic.start()
+        return periodic
 
     def __del__(self):
         """إغلاق اتصال قاعدة البيانات"""
         if self.conn:
             try:
-                if sys and sys.meta_path:
-                    self.create_backup()
+                with self._pool_lock:
+                    for conn in self._read_connections:
+                        conn.close()
+                    self._read_connections.clear()
                 self.conn.close()
             except Exception as e:
                 print(f"تحذير: خطأ أثناء الإغلاق: {e}")
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""أرقام الأيام: التاريخ كعدد صحيح (عدد الأيام منذ 1970-01-01)
+
+التواريخ محفوظة نصاً بصيغة yyyy-MM-dd، والمقارنة عليها عبر
+strftime() تمنع استخدام الفهارس. الأعمدة المولّدة absences.day و
+vacations.start_day / end_day (الترحيل 3) تحسب رقم اليوم بنفس الصيغة
+DAY_SQL، فتُكتب فلاتر الشهور والفترات كمدى على أعداد صحيحة مفهرسة:
+
+    first, end = month_range(2024, 3)
+    db.fetch_all("... WHERE a.day >= ? AND a.day < ?", (first, end))
+"""
+from datetime import date, datetime, timedelta
+
+EPOCH = date(1970, 1, 1)
+
+# 2440587.5 = اليوم الجولياني لمنتصف ليل 1970-01-01
+DAY_SQL = "CAST(julianday({column}) - 2440587.5 AS INTEGER)"
+
+
+def to_day(value):
+    """رقم اليوم لتاريخ نصي (yyyy-MM-dd) أو date/datetime أو QDate"""
+    if value is None:
+        return None
+    if hasattr(value, 'toPyDate'):
+        value = value.toPyDate()
+    elif isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def from_day(day):
+    """التاريخ النصي yyyy-MM-dd لرقم اليوم"""
+    return (EPOCH + timedelta(days=day)).isoformat()
+
+
+def to_date(day):
+    return EPOCH + timedelta(days=day)
+
+
+def month_range(year, month):
+    """(أول يوم في الشهر، أول يوم في الشهر التالي) كمدى نصف مفتوح"""
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return (first - EPOCH).days, (following - EPOCH).days
+
+
+def parse_month(month_key):
+    """مدى الأيام لمفتاح الشهر "yyyy-MM" المستخدم في فلاتر الواجهة"""
+    year, month = month_key.split('-')
+    return month_range(int(year), int(month))
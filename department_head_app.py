@@ -134,12 +134,10 @@ class DepartmentHeadApp(QMainWindow):
                 sys.exit(0)  # خروج إذا تم الإلغاء
 
             # تحقق من كلمة المرور في جدول الأقسام وأرجع اسم القسم
-            self.db.execute_query(
+            row = self.db.fetch_one(
                 "SELECT name FROM departments WHERE head_password=?",
-                (password,),
-                commit=False
+                (password,)
             )
-            row = self.db.cursor.fetchone()
             if row:
                 dept_name = row[0]
                 self.status_bar.showMessage(f"مرحباً رئيس قسم {dept_name}", 5000)
@@ -153,6 +151,7 @@ class DepartmentHeadApp(QMainWindow):
 
     def closeEvent(self, event):
         self.db.create_backup()
+        self.db.dump_query_profile()
         super().closeEvent(event)
 
 if __name__ == "__main__":
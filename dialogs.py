@@ -1,7 +1,7 @@
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QComboBox, QLineEdit,
     QPushButton, QFormLayout, QLabel, QMessageBox, QRadioButton,
-    QDialogButtonBox, QDateEdit, QGroupBox
+    QDialogButtonBox, QDateEdit, QGroupBox, QSpinBox
 )
 from PyQt6.QtCore import QDate
 
@@ -16,7 +16,7 @@ class DepartmentDialog(QDialog):
     def setup_ui(self):
         """تهيئة واجهة إدارة الأقسام"""
         self.setWindowTitle("إدارة الأقسام")
-        self.setFixedSize(500, 350)
+        self.setFixedSize(500, 380)
 
         layout = QVBoxLayout()
 
@@ -58,6 +58,12 @@ class DepartmentDialog(QDialog):
         self.edit_head_password_input.setEchoMode(QLineEdit.EchoMode.Password)
         delete_layout.addRow("كلمة السر الجديدة:", self.edit_head_password_input)
 
+        # الحد الأدنى للحاضرين؛ 0 يعني بدون حد
+        self.min_staff_spin = QSpinBox()
+        self.min_staff_spin.setRange(0, 1000)
+        self.min_staff_spin.setSpecialValueText("بدون حد")
+        delete_layout.addRow("الحد الأدنى للحاضرين:", self.min_staff_spin)
+
         # زر تعديل
         self.update_btn = QPushButton("تعديل بيانات القسم")
         self.update_btn.clicked.connect(self.update_department)
@@ -82,10 +88,9 @@ class DepartmentDialog(QDialog):
     def load_departments(self):
         """تحميل قائمة الأقسام"""
         try:
-            self.parent.db.execute_query(
+            departments = [dept[0] for dept in self.parent.db.fetch_all(
                 "SELECT name FROM departments ORDER BY name"
-            )
-            departments = [dept[0] for dept in self.parent.db.cursor.fetchall()]
+            )]
             self.department_combo.clear()
             self.department_combo.addItems(departments)
         except Exception as e:
@@ -98,10 +103,9 @@ class DepartmentDialog(QDialog):
     def load_employees(self):
         """تحميل قائمة الموظفين لرؤساء الأقسام"""
         try:
-            self.parent.db.execute_query(
+            employees = self.parent.db.fetch_all(
                 "SELECT id, name FROM employees ORDER BY name"
             )
-            employees = self.parent.db.cursor.fetchall()
             self.head_combo.clear()
             self.edit_head_combo.clear()
             for emp_id, name in employees:
@@ -120,21 +124,21 @@ class DepartmentDialog(QDialog):
         if not selected:
             return
         try:
-            self.parent.db.execute_query(
-                "SELECT head_id, head_password FROM departments WHERE name=?",
-                (selected,),
-                commit=False
+            row = self.parent.db.fetch_one(
+                "SELECT head_id, head_password, min_staff FROM departments WHERE name=?",
+                (selected,)
             )
-            row = self.parent.db.cursor.fetchone()
             if row:
-                head_id, head_password = row
+                head_id, head_password, min_staff = row
                 idx = self.edit_head_combo.findData(head_id)
                 if idx >= 0:
                     self.edit_head_combo.setCurrentIndex(idx)
                 self.edit_head_password_input.setText(head_password if head_password else "")
+                self.min_staff_spin.setValue(min_staff or 0)
             else:
                 self.edit_head_combo.setCurrentIndex(0)
                 self.edit_head_password_input.clear()
+                self.min_staff_spin.setValue(0)
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"خطأ في تحميل بيانات القسم: {str(e)}")
 
@@ -179,8 +183,8 @@ class DepartmentDialog(QDialog):
             return
         try:
             self.parent.db.execute_query(
-                "UPDATE departments SET head_id=?, head_password=? WHERE name=?",
-                (head_id, head_password, selected)
+                "UPDATE departments SET head_id=?, head_password=?, min_staff=? WHERE name=?",
+                (head_id, head_password, self.min_staff_spin.value() or None, selected)
             )
             QMessageBox.information(self, "تم", "تم تعديل بيانات القسم بنجاح")
             self.load_departments()
@@ -194,12 +198,11 @@ class DepartmentDialog(QDialog):
             return
         try:
             # التحقق من عدم وجود موظفين في القسم
-            self.parent.db.execute_query(
+            employee_count = self.parent.db.fetch_scalar(
                 "SELECT COUNT(*) FROM employees WHERE department = ?",
                 (selected,),
-                commit=False
+                default=0
             )
-            employee_count = self.parent.db.cursor.fetchone()[0]
             if employee_count > 0:
                 QMessageBox.warning(
                     self,
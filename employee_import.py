@@ -0,0 +1,398 @@
+"""استيراد الموظفين من Excel
+
+التحقق والتحويل يتمان على أعمدة إطار البيانات كاملة (pandas) بدل المرور
+على الصفوف: الحقول المطلوبة، صيغة الرقم الوطني، التواريخ، التكرار داخل
+الملف، وترميز أيام العمل مرة واحدة لكل قيمة مختلفة.
+
+ثم تُقارن الصفوف بالموظفين الحاليين (ImportPlanner) بالرقم الآلي أو الرقم
+الوطني: جديد، معدَّل، أو بلا تغيير. المقارنة دفعة دفعة، ولا يُحتفظ إلا
+بالجديد والمعدَّل، فالصفوف بلا تغيير (أغلب الملف عند إعادة الاستيراد)
+تُعدّ فقط. المقارنة للأعمدة الموجودة في الملف
+فقط، فالعمود الغائب لا يمحو القيمة المحفوظة. الخطة تُعرض للمستخدم قبل
+التنفيذ (dry-run)، ثم يكتب apply_plan الجديد والمعدَّل فقط بـ INSERT ...
+ON CONFLICT DO UPDATE: الموظف يحتفظ بمعرّفه وإجازاته وغيابه وسجل رصيده
+بدل الحذف وإعادة الإدراج. فرق الرصيد السنوي يُسجَّل قيد تعديل في سجل
+الأرصدة.
+
+الكتابة بـ execute_many على دفعات من CHUNK_ROWS صف، كل دفعة في معاملة
+واحدة مع قيود رصيد موظفيها، فلا يُعدَّل موظف دون قيد رصيده. إذا فشلت
+دفعة تُعاد صفوفها (مع قيودها) واحداً واحداً لمعرفة الصف المسبب، وتُجمع
+كل أخطاء الصفوف في import_errors.log.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from balance_ledger import BalanceLedger, REASON_ADJUSTMENT
+from query_profiler import LOG_DIR
+from work_schedule import encode as encode_work_days, DEFAULT_WORK_DAYS
+
+ERRORS_PATH = os.path.join(LOG_DIR, 'import_errors.log')
+
+CHUNK_ROWS = 5000
+
+REQUIRED_COLUMNS = ['serial_number', 'name', 'national_id']
+KEY_COLUMNS = ['serial_number', 'national_id']
+
+EMPLOYEE_COLUMNS = [
+    'serial_number', 'name', 'national_id', 'department',
+    'job_grade', 'hiring_date', 'grade_date', 'bonus',
+    'vacation_balance', 'work_days', 'work_days_mask', 'work_status'
+]
+
+DEFAULT_DEPARTMENT = "غير محدد"
+DEFAULT_VACATION_BALANCE = 30
+IMPORT_NOTE = "استيراد من Excel"
+
+
+class ImportPlan:
+    """نتيجة المقارنة قبل الكتابة
+
+    inserted / updated: إطارات الصفوف (updated فيها employee_id)، و unchanged
+    عدد الصفوف بلا تغيير. adjustments: قيود فرق الرصيد لسجل الأرصدة. columns:
+    الأعمدة الموجودة في الملف، وهي وحدها التي تُعدَّل في الموظفين الحاليين.
+    """
+
+    def __init__(self, inserted, updated, unchanged, adjustments, errors, columns):
+        self.inserted = inserted
+        self.updated = updated
+        self.unchanged = unchanged
+        self.adjustments = adjustments
+        self.errors = errors
+        self.columns = columns
+
+    def summary(self):
+        return (
+            f"موظفون جدد: {len(self.inserted)}\n"
+            f"موظفون معدَّلون: {len(self.updated)}\n"
+            f"تعديلات رصيد: {len(self.adjustments)}\n"
+            f"بدون تغيير: {self.unchanged}\n"
+            f"صفوف مرفوضة: {len(self.errors)}"
+        )
+
+
+class ImportResult:
+    """نتيجة الاستيراد: عدد الصفوف المحفوظة وأخطاء الصفوف المرفوضة"""
+
+    def __init__(self, imported=0, errors=None):
+        self.imported = imported
+        self.errors = errors or []
+
+
+def _text(df, column, default=''):
+    """عمود نصي منظّف؛ الأرقام الصحيحة المقروءة كأعداد عشرية (1001.0) تُكتب بدون كسر"""
+    if column not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    values = df[column]
+    if pd.api.types.is_float_dtype(values) and (values.dropna() % 1 == 0).all():
+        values = values.astype('Int64')
+    values = values.astype('string').str.strip()
+    return values.fillna(default).replace('', default).astype(object)
+
+
+def _number(df, column, default):
+    if column not in df.columns:
+        return pd.Series(default, index=df.index, dtype='int64')
+    return pd.to_numeric(df[column], errors='coerce').fillna(default).astype('int64')
+
+
+def _date(df, column, errors):
+    """التواريخ بصيغة yyyy-MM-dd؛ القيمة غير القابلة للتحويل خطأ في صفها"""
+    if column not in df.columns:
+        return pd.Series([None] * len(df), index=df.index, dtype=object)
+    raw = df[column]
+    dates = pd.to_datetime(raw, errors='coerce', format='mixed')
+    present = raw.notna() & (raw.astype('string').str.strip() != '')
+    errors.append((present & dates.isna(), f"تاريخ غير صالح في {column}"))
+    return dates.dt.strftime('%Y-%m-%d').astype(object).where(dates.notna(), None)
+
+
+def _row_errors(lines, checks, source=""):
+    """[(قناع الصفوف المرفوضة، الرسالة)] -> أخطاء بترتيب السطور"""
+    messages = {}
+    for mask, message in checks:
+        for line in lines[mask.to_numpy()]:
+            messages.setdefault(line, []).append(message)
+    return [f"{source}سطر {line}: {'، '.join(messages[line])}" for line in sorted(messages)]
+
+
+def check_columns(columns):
+    """رفع ValueError إذا غاب عمود مطلوب عن عناوين الملف"""
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise ValueError(f"الأعمدة المفقودة: {', '.join(missing_columns)}")
+
+
+def prepare_employees(df, first_line=2, source=""):
+    """التحقق من إطار البيانات وتحويله
+
+    يرجع (الصفوف السليمة بأعمدة EMPLOYEE_COLUMNS، أخطاء الصفوف المرفوضة).
+    رقم السطر في الأخطاء هو رقمه في ملف Excel (السطر الأول للعناوين)؛
+    first_line لدفعة تبدأ في منتصف الورقة، و source بادئة الأخطاء (الملف
+    والورقة) عند استيراد عدة أوراق.
+    """
+    check_columns(df.columns)
+
+    df = df.reset_index(drop=True)
+    lines = df.index.to_numpy() + first_line
+    checks = []
+    serial_number = _text(df, 'serial_number')
+    name = _text(df, 'name')
+    national_id = _text(df, 'national_id')
+    work_days = _text(df, 'work_days', DEFAULT_WORK_DAYS)
+    rows = pd.DataFrame({
+        'source': source,
+        'line': lines,
+        'serial_number': serial_number,
+        'name': name,
+        'national_id': national_id,
+        'department': _text(df, 'department', DEFAULT_DEPARTMENT),
+        'job_grade': _text(df, 'job_grade'),
+        'hiring_date': _date(df, 'hiring_date', checks),
+        'grade_date': _date(df, 'grade_date', checks),
+        'bonus': _number(df, 'bonus', 0),
+        'vacation_balance': _number(df, 'vacation_balance', DEFAULT_VACATION_BALANCE).clip(lower=0),
+        'work_days': work_days,
+    })
+    # ترميز أيام العمل مرة واحدة لكل قيمة مختلفة
+    encoded = {value: encode_work_days(value) for value in work_days.unique()}
+    rows['work_days_mask'] = work_days.map(lambda value: encoded[value][0]).astype('int64')
+    rows['work_status'] = work_days.map(lambda value: encoded[value][1]).astype('int64')
+
+    # الصف بلا رقم آلي يُتجاهل كما في الاستيراد السابق
+    blank = serial_number == ''
+    checks += [
+        (~blank & (name == ''), "حقل الاسم الكامل مطلوب"),
+        (~blank & (national_id == ''), "حقل الرقم الوطني مطلوب"),
+        (~blank & (national_id != '') & ~national_id.str.fullmatch(r'\d{12}'),
+         "الرقم الوطني يجب أن يتكون من 12 رقمًا"),
+        (~blank & serial_number.duplicated(), "الرقم الآلي مكرر في الملف"),
+        (~blank & (national_id != '') & national_id.duplicated(), "الرقم الوطني مكرر في الملف"),
+    ]
+    checks = [(~blank & mask, message) for mask, message in checks]
+    rejected = blank.copy()
+    for mask, _ in checks:
+        rejected |= mask
+    return rows[~rejected].reset_index(drop=True), _row_errors(lines, checks, source)
+
+
+def reject_duplicates(rows, seen_serials, seen_national_ids):
+    """رفض تكرار الرقم الآلي أو الوطني بين دفعات أو أوراق مختلفة؛ يبقى أول ظهور
+
+    الدفعات تُمرَّر بترتيب الملف، و seen_* مجموعات الأرقام في الدفعات السابقة
+    (تُحدَّث هنا).
+    """
+    serials, national_ids = rows['serial_number'], rows['national_id']
+    duplicated = (
+        serials.duplicated() | national_ids.duplicated()
+        | serials.isin(seen_serials) | national_ids.isin(seen_national_ids)
+    )
+    seen_serials.update(serials)
+    seen_national_ids.update(national_ids)
+    errors = [
+        f"{source}سطر {line}: الرقم الآلي أو الوطني مكرر في ملف أو ورقة سابقة"
+        for source, line in zip(rows.loc[duplicated, 'source'], rows.loc[duplicated, 'line'])
+    ]
+    return rows[~duplicated].reset_index(drop=True), errors
+
+
+def supplied_columns(names):
+    """أعمدة الموظفين الموجودة في عناوين الملف (مع عمودي الترميز إذا وُجد work_days)"""
+    columns = [column for column in EMPLOYEE_COLUMNS if column in names]
+    if 'work_days' in columns:
+        columns += ['work_days_mask', 'work_status']
+    return columns
+
+
+def _comparable(values):
+    """قيم قابلة للمقارنة بين الملف وقاعدة البيانات: نص، والفارغ = None = ''"""
+    return values.astype('string').fillna('').to_numpy()
+
+
+class ImportPlanner:
+    """مقارنة دفعات الصفوف (بعد التحقق) بالموظفين الحاليين دون كتابة شيء
+
+    الموظفون الحاليون يُقرؤون مرة واحدة، ثم تُمرَّر الدفعات إلى add بترتيب
+    الملف فور وصولها، و plan ترجع ImportPlan لكل ما سبق.
+    """
+
+    def __init__(self, db, columns):
+        self.columns = columns
+        existing = pd.DataFrame(db.fetch_all("""
+            SELECT id, serial_number, name, national_id, department,
+                   job_grade, hiring_date, grade_date, COALESCE(bonus, 0),
+                   COALESCE(vacation_balance, 0), work_days, work_days_mask, work_status
+            FROM employees
+        """), columns=['employee_id', *EMPLOYEE_COLUMNS])
+        self._by_serial = existing.set_index('serial_number')['employee_id']
+        self._by_national_id = existing.set_index('national_id')['employee_id']
+        self._stored = existing.set_index('employee_id')
+        self._inserted = []
+        self._updated = []
+        self.unchanged = 0
+        self.adjustments = []
+        self.errors = []
+
+    def add(self, rows, errors=()):
+        self.errors += errors
+        if rows is None or rows.empty:
+            return
+        # الرقم الآلي أولاً ثم الرقم الوطني (موظف تغيّر رقمه الآلي)
+        by_serial = rows['serial_number'].map(self._by_serial)
+        by_national_id = rows['national_id'].map(self._by_national_id)
+        conflict = by_serial.notna() & by_national_id.notna() & (by_serial != by_national_id)
+        self.errors += [
+            f"{source}سطر {line}: الرقم الآلي والرقم الوطني مسجلان لموظفين مختلفين"
+            for source, line in zip(rows.loc[conflict, 'source'], rows.loc[conflict, 'line'])
+        ]
+        rows = rows.assign(employee_id=by_serial.fillna(by_national_id))[~conflict]
+
+        matched = rows['employee_id'].notna().to_numpy()
+        self._inserted.append(rows[~matched].drop(columns='employee_id'))
+        current = rows[matched].astype({'employee_id': 'int64'}).reset_index(drop=True)
+        stored = self._stored.loc[current['employee_id']].reset_index(drop=True)
+
+        changed = np.zeros(len(current), dtype=bool)
+        for column in self.columns:
+            if column != 'vacation_balance':
+                changed |= _comparable(current[column]) != _comparable(stored[column])
+        delta = np.zeros(len(current), dtype=np.int64)
+        if 'vacation_balance' in self.columns:
+            delta = (current['vacation_balance'] - stored['vacation_balance']).to_numpy()
+        self.adjustments += [
+            (int(employee_id), "سنوية", int(amount), REASON_ADJUSTMENT, None, IMPORT_NOTE)
+            for employee_id, amount in zip(current['employee_id'][delta != 0], delta[delta != 0])
+        ]
+        self._updated.append(current[changed])
+        self.unchanged += int((~changed & (delta == 0)).sum())
+
+    def plan(self):
+        columns = ['source', 'line', *EMPLOYEE_COLUMNS]
+        return ImportPlan(
+            _concat(self._inserted, columns), _concat(self._updated, [*columns, 'employee_id']),
+            self.unchanged, self.adjustments, self.errors, self.columns
+        )
+
+
+def _concat(frames, columns):
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def plan_import(db, df):
+    """مقارنة الملف بالموظفين الحاليين دون كتابة شيء؛ يرجع ImportPlan"""
+    rows, errors = prepare_employees(df)
+    return plan_rows(db, rows, errors, supplied_columns(df.columns))
+
+
+def plan_rows(db, rows, errors, columns):
+    """المقارنة لصفوف سبق التحقق منها دفعة واحدة (prepare_employees)"""
+    planner = ImportPlanner(db, columns)
+    planner.add(rows, list(errors))
+    return planner.plan()
+
+
+def _upsert_query(columns):
+    """الإدراج بكل الأعمدة (بالقيم الافتراضية للغائبة)، والتعديل للأعمدة الموجودة في الملف فقط
+
+    الرصيد لا يُعدَّل هنا بل بقيد في سجل الأرصدة.
+    """
+    def assignments(key):
+        return ", ".join(
+            [f"{column} = excluded.{column}" for column in columns
+             if column not in (key, 'vacation_balance')] + ["updated_at = CURRENT_TIMESTAMP"]
+        )
+    return f"""
+        INSERT INTO employees ({", ".join(EMPLOYEE_COLUMNS)})
+        VALUES ({", ".join("?" * len(EMPLOYEE_COLUMNS))})
+        ON CONFLICT(serial_number) DO UPDATE SET {assignments('serial_number')}
+        ON CONFLICT(national_id) DO UPDATE SET {assignments('national_id')}
+    """
+
+
+def _records(rows):
+    """صفوف الإطار كـ tuples بأنواع بايثون (sqlite3 لا يقبل أنواع numpy)"""
+    return list(rows[EMPLOYEE_COLUMNS].astype(object).itertuples(index=False, name=None))
+
+
+def _row_adjustments(rows, adjustments):
+    """قيود رصيد كل صف (قائمة فارغة للصفوف الجديدة)، مع حذفها من adjustments"""
+    if 'employee_id' not in rows:
+        return [[] for _ in range(len(rows))]
+    return [
+        adjustments.pop(int(employee_id), []) if pd.notna(employee_id) else []
+        for employee_id in rows['employee_id']
+    ]
+
+
+def _write(db, ledger, query, records, entries):
+    """كتابة الصفوف وقيود رصيدها في معاملة واحدة"""
+    with db.transaction():
+        if len(records) == 1:
+            db.execute_query(query, records[0])
+        else:
+            db.execute_many(query, records)
+        if entries:
+            ledger.post_many(entries)
+
+
+def write_employees(db, rows, query, progress=None, adjustments=None):
+    """كتابة الصفوف على دفعات؛ يرجع ImportResult
+
+    adjustments: {employee_id: [قيود الرصيد]} تُثبَّت مع صف الموظف في نفس
+    المعاملة، وقيود من ليس له صف (تغيّر رصيده فقط) تُثبَّت بعد آخر دفعة.
+    progress(done, total) يُستدعى قبل كل دفعة وبعد آخرها، ويمكنه إيقاف
+    الكتابة برفع استثناء (إلغاء العملية) فتبقى الدفعات المثبتة محفوظة.
+    """
+    result = ImportResult()
+    ledger = BalanceLedger(db)
+    adjustments = dict(adjustments or {})
+    total = len(rows)
+    for start in range(0, total, CHUNK_ROWS):
+        if progress:
+            progress(start, total)
+        chunk_rows = rows.iloc[start:start + CHUNK_ROWS]
+        chunk = _records(chunk_rows)
+        entries = _row_adjustments(chunk_rows, adjustments)
+        try:
+            _write(db, ledger, query, chunk, [entry for row in entries for entry in row])
+            result.imported += len(chunk)
+        except Exception:
+            # إعادة الدفعة صفاً صفاً لمعرفة الصفوف المرفوضة
+            for record, row_entries in zip(chunk, entries):
+                try:
+                    _write(db, ledger, query, [record], row_entries)
+                    result.imported += 1
+                except Exception as e:
+                    result.errors.append(f"الرقم الآلي {record[0]}: {str(e)}")
+    remaining = [entry for entries in adjustments.values() for entry in entries]
+    if remaining:
+        ledger.post_many(remaining)
+    if progress:
+        progress(total, total)
+    return result
+
+
+def apply_plan(db, plan, progress=None):
+    """كتابة الجديد والمعدَّل وقيود الرصيد فقط؛ يرجع ImportResult بكل الأخطاء"""
+    rows = pd.concat([plan.inserted, plan.updated], ignore_index=True)
+    adjustments = {}
+    for entry in plan.adjustments:
+        adjustments.setdefault(entry[0], []).append(entry)
+    result = write_employees(db, rows, _upsert_query(plan.columns), progress, adjustments)
+    result.errors = plan.errors + result.errors
+    return result
+
+
+def import_employees(db, df, progress=None):
+    """المقارنة والكتابة دون معاينة"""
+    return apply_plan(db, plan_import(db, df), progress)
+
+
+def write_errors(errors, path=ERRORS_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(errors))
+    return path
@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+
 from PyQt6.QtCore import Qt, QDate
 from PyQt6.QtGui import QColor
 from PyQt6.QtWidgets import (
@@ -7,6 +9,12 @@ from PyQt6.QtWidgets import (
     QFormLayout, QHeaderView, QMenu, QTabWidget, QGridLayout
 )
 from dialogs import DepartmentDialog
+from work_schedule import (
+    encode as encode_work_days, day_periods,
+    STATUS_REGULAR, STATUS_SECONDMENT, STATUS_DEDICATION
+)
+from balance_ledger import REASON_ADJUSTMENT, balance_entry
+from database import ConcurrentUpdateError
 
 class EmployeeManagementTab(QWidget):
     def __init__(self, db_manager, main_window=None):
@@ -14,6 +22,11 @@ class EmployeeManagementTab(QWidget):
         self.db = db_manager
         self.main_window = main_window
         self.current_employee_id = None
+        # الإصدار والرصيد كما حُمِّلا في النموذج، للتعديل المتفائل عند الحفظ
+        self.current_employee_version = None
+        self.current_employee_balance = 0
+        # الرصيد كما ظهر في النموذج عند التحميل (قد يختلف عن المخزَّن إذا كان NULL)
+        self.current_employee_shown_balance = 0
         self.employees_table = QTableWidget()
         self.days_checkboxes = []
         self.day_periods = {}
@@ -177,13 +190,12 @@ class EmployeeManagementTab(QWidget):
 
     def load_employees(self):
         try:
-            self.db.execute_query("""
+            employees = self.db.fetch_all("""
                 SELECT id, serial_number, name, national_id, department,
                        job_grade, hiring_date, bonus, vacation_balance, work_days
                 FROM employees
                 ORDER BY name
-            """, commit=False)
-            employees = self.db.cursor.fetchall()
+            """)
             self.employees_table.setRowCount(len(employees))
             for row_idx, employee in enumerate(employees):
                 for col_idx, value in enumerate(employee):
@@ -205,6 +217,7 @@ class EmployeeManagementTab(QWidget):
             QMessageBox.warning(self, "تحذير", "\n".join(errors))
             return
         try:
+            work_days = self.get_work_days()
             employee_data = (
                 self.serial_input.text().strip(),
                 self.name_input.text().strip(),
@@ -215,34 +228,54 @@ class EmployeeManagementTab(QWidget):
                 self.grade_date.date().toString("yyyy-MM-dd"),
                 self.bonus_spinbox.value(),
                 max(0, self.vacation_balance.value()),
-                self.get_work_days()
+                work_days,
+                *encode_work_days(work_days)
             )
             if self.current_employee_id:
-                query = """
-                    UPDATE employees SET
-                        serial_number=?, name=?, national_id=?, department=?,
-                        job_grade=?, hiring_date=?, grade_date=?, bonus=?,
-                        vacation_balance=?, work_days=?, updated_at=CURRENT_TIMESTAMP
-                    WHERE id=?
-                """
-                self.db.execute_query(query, employee_data + (self.current_employee_id,))
+                self.update_employee(employee_data)
             else:
                 query = """
                     INSERT INTO employees (
                         serial_number, name, national_id, department,
                         job_grade, hiring_date, grade_date, bonus,
-                        vacation_balance, work_days
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        vacation_balance, work_days, work_days_mask, work_status
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """
-                self.db.execute_query(query, employee_data)
-                self.db.execute_query("SELECT last_insert_rowid()")
-                self.current_employee_id = self.db.cursor.fetchone()[0]
+                self.current_employee_id = self.db.execute_query(query, employee_data).lastrowid
             QMessageBox.information(self, "تم", "تم حفظ بيانات الموظف بنجاح")
             self.load_employees()
             self.clear_form()
+        except ConcurrentUpdateError as e:
+            QMessageBox.warning(self, "تحذير", str(e))
+            self.load_employee_data(self.current_employee_id)
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء الحفظ:\n{str(e)}")
 
+    def update_employee(self, employee_data):
+        """حفظ التعديل فقط إذا لم يتغير الموظف منذ تحميله في النموذج
+
+        تعديل الرصيد يُسجَّل قيداً بالفرق في سجل الأرصدة بدل الكتابة المباشرة،
+        في نفس الوحدة وبشرط نجاح التعديل. أي خصم أو استرجاع تم بعد التحميل
+        يغيّر الإصدار فلا يُكتب فوقه رصيد قديم.
+        """
+        emp_id, version = self.current_employee_id, self.current_employee_version
+        columns = (
+            'serial_number', 'name', 'national_id', 'department', 'job_grade',
+            'hiring_date', 'grade_date', 'bonus', 'work_days', 'work_days_mask', 'work_status'
+        )
+        changes = dict(zip(columns, employee_data[:8] + employee_data[9:]))
+        changes['updated_at'] = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+        then = []
+        # الرصيد الذي لم يُعدَّل في النموذج لا يُسجَّل له قيد
+        delta = 0
+        if employee_data[8] != self.current_employee_shown_balance:
+            delta = employee_data[8] - self.current_employee_balance
+        if delta:
+            then.append(balance_entry(
+                emp_id, "سنوية", delta, REASON_ADJUSTMENT, "AND version = ?", (version + 1,)
+            ))
+        self.db.compare_and_swap("employees", emp_id, version, changes, then)
+
     def show_context_menu(self, pos):
         menu = QMenu()
         resize_action = menu.addAction("ضبط حجم الأعمدة")
@@ -280,18 +313,19 @@ class EmployeeManagementTab(QWidget):
 
     def load_employee_data(self, emp_id):
         try:
-            self.db.execute_query(
+            employee = self.db.fetch_one(
                 "SELECT id, serial_number, name, national_id, department, "
-                "job_grade, hiring_date, grade_date, bonus, vacation_balance, work_days "
+                "job_grade, hiring_date, grade_date, bonus, vacation_balance, "
+                "work_days_mask, work_status, version "
                 "FROM employees WHERE id = ?",
-                (emp_id,),
-                commit=False
+                (emp_id,)
             )
-            employee = self.db.cursor.fetchone()
             if not employee:
                 QMessageBox.warning(self, "تحذير", "لم يتم العثور على بيانات الموظف")
                 return
             self.current_employee_id = employee[0]
+            self.current_employee_balance = employee[9] or 0
+            self.current_employee_version = employee[12]
             self.serial_input.setText(employee[1])
             self.name_input.setText(employee[2])
             self.national_id_input.setText(employee[3])
@@ -302,32 +336,19 @@ class EmployeeManagementTab(QWidget):
             self.hiring_date.setDate(QDate.fromString(employee[6], "yyyy-MM-dd"))
             self.grade_date.setDate(QDate.fromString(employee[7], "yyyy-MM-dd"))
             self.bonus_spinbox.setValue(employee[8])
-            self.vacation_balance.setValue(employee[9] if employee[9] else 30)
+            self.vacation_balance.setValue(employee[9] if employee[9] is not None else 30)
+            self.current_employee_shown_balance = self.vacation_balance.value()
             # معالجة خيار الندب والتفرغ
-            if employee[10] == "الندب":
-                self.secondment_checkbox.setChecked(True)
-                self.dedication_checkbox.setChecked(False)
-            elif employee[10] == "تفرغ":
-                self.secondment_checkbox.setChecked(False)
-                self.dedication_checkbox.setChecked(True)
-            else:
-                self.secondment_checkbox.setChecked(False)
-                self.dedication_checkbox.setChecked(False)
-                # تحميل الأيام والفترات
-                work_days = employee[10].split(',') if employee[10] else []
-                days_map = {"0":"السبت","1":"الأحد","2":"الإثنين",
-                           "3":"الثلاثاء","4":"الأربعاء","5":"الخميس","6":"الجمعة"}
-                for cb in self.days_checkboxes:
-                    day_name = cb.text()
-                    day_code = next((k for k,v in days_map.items() if v == day_name), None)
-                    cb.setChecked(any(wd.startswith(f"{day_code}:") for wd in work_days))
-                    if day_code:
-                        for wd in work_days:
-                            if wd.startswith(f"{day_code}:"):
-                                period_code = wd.split(':')[1]
-                                period_map = {"M":0, "E":1, "F":2}
-                                self.day_periods[day_name].setCurrentIndex(period_map.get(period_code, 2))
-                                break
+            work_days_mask, work_status = employee[10], employee[11]
+            self.secondment_checkbox.setChecked(work_status == STATUS_SECONDMENT)
+            self.dedication_checkbox.setChecked(work_status == STATUS_DEDICATION)
+            if work_status == STATUS_REGULAR:
+                # تحميل الأيام والفترات (أيام السبت..الجمعة بنفس ترتيب مربعات الاختيار)
+                periods = day_periods(work_days_mask)
+                for day, cb in enumerate(self.days_checkboxes):
+                    cb.setChecked(day in periods)
+                    if day in periods:
+                        self.day_periods[cb.text()].setCurrentIndex(periods[day])
             self.toggle_special_work_status()  # لضبط حالة التمكين/التعطيل
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"حدث خطأ أثناء تحميل البيانات:\n{str(e)}")
@@ -344,12 +365,10 @@ class EmployeeManagementTab(QWidget):
         elif not national_id.isdigit() or len(national_id) != 12:
             errors.append("الرقم الوطني يجب أن يتكون من 12 رقمًا")
         if not self.current_employee_id:
-            self.db.execute_query(
+            if self.db.fetch_one(
                 "SELECT id FROM employees WHERE national_id=? OR serial_number=?",
-                (national_id, self.serial_input.text().strip()),
-                commit=False
-            )
-            if self.db.cursor.fetchone():
+                (national_id, self.serial_input.text().strip())
+            ):
                 errors.append("الرقم الوطني أو الآلي مسجل مسبقاً")
         try:
             vacation_balance = self.vacation_balance.value()
@@ -361,8 +380,7 @@ class EmployeeManagementTab(QWidget):
 
     def load_departments(self):
         try:
-            self.db.execute_query("SELECT name FROM departments ORDER BY name")
-            departments = [dept[0] for dept in self.db.cursor.fetchall()]
+            departments = [dept[0] for dept in self.db.fetch_all("SELECT name FROM departments ORDER BY name")]
             self.department_combo.clear()
             self.department_combo.addItems(departments)
         except Exception as e:
@@ -424,6 +442,9 @@ class EmployeeManagementTab(QWidget):
 
     def clear_form(self):
         self.current_employee_id = None
+        self.current_employee_version = None
+        self.current_employee_balance = 0
+        self.current_employee_shown_balance = 0
         self.serial_input.clear()
         self.name_input.clear()
         self.national_id_input.clear()
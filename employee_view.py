@@ -83,8 +83,7 @@ class EmployeeViewTab(QWidget):
             self.department_combo.clear()
             self.department_combo.addItem("جميع الأقسام")
         
-            self.db.execute_query("SELECT name FROM departments ORDER BY name")
-            depts = [dept[0] for dept in self.db.cursor.fetchall()]
+            depts = [dept[0] for dept in self.db.fetch_all("SELECT name FROM departments ORDER BY name")]
             self.department_combo.addItems(depts)
         
             if new_dept and new_dept in depts:
@@ -113,8 +112,7 @@ class EmployeeViewTab(QWidget):
     def load_departments(self):
         """تحميل قائمة الأقسام للفلترة"""
         try:
-            self.db.execute_query("SELECT name FROM departments ORDER BY name")
-            departments = [dept[0] for dept in self.db.cursor.fetchall()]
+            departments = [dept[0] for dept in self.db.fetch_all("SELECT name FROM departments ORDER BY name")]
             current = self.department_combo.currentText()
             
             self.department_combo.clear()
@@ -156,8 +154,7 @@ class EmployeeViewTab(QWidget):
             query += " ORDER BY name LIMIT ? OFFSET ?"
             params.extend([self.page_size, self.current_page * self.page_size])
             
-            self.db.execute_query(query, params, commit=False)
-            employees = self.db.cursor.fetchall()
+            employees = self.db.fetch_all(query, params)
             
             self.employees_table.setRowCount(len(employees))
             for row_idx, employee in enumerate(employees):
@@ -198,11 +195,10 @@ class EmployeeViewTab(QWidget):
         
         # التحقق مما إذا كانت هناك المزيد من الصفحات
         try:
-            self.db.execute_query(
+            total_count = self.db.fetch_scalar(
                 "SELECT COUNT(*) FROM employees",
-                commit=False
+                default=0
             )
-            total_count = self.db.cursor.fetchone()[0]
             self.next_btn.setEnabled(total_count > (self.current_page + 1) * self.page_size)
         except Exception as e:
             print(f"Error checking next page: {e}")
@@ -0,0 +1,215 @@
+"""تصدير الجداول إلى Excel أو CSV بذاكرة ثابتة
+
+الصفوف تُقرأ من مؤشر القراءة على دفعات (DatabaseManager.iter_rows) وتُكتب
+مباشرة إلى مصنف openpyxl بوضع الكتابة فقط (write_only) أو إلى csv.writer،
+فلا تُبنى قائمة ولا DataFrame بكل البيانات مهما كبر الجدول.
+
+لكل جدول في EXPORT_TABLES أعمدته (المفتاح، تعبير SQL، العنوان في الملف)
+وفلاتره. الفلاتر المدعومة لكل جدول في filters، وفلاتر الفترة بأرقام
+الأيام (day_numbers) كمدى نصف مفتوح [start_day, end_day) مثل month_range.
+عناوين أعمدة الموظفين هي أسماء الأعمدة نفسها حتى يُعاد استيراد الملف.
+"""
+import csv
+import os
+
+from openpyxl import Workbook
+
+from day_numbers import from_day
+
+# كل كم صف يُبلَّغ التقدم (ونقطة إلغاء للعمليات في الخلفية)
+PROGRESS_ROWS = 1000
+
+
+class ExportTable:
+    def __init__(self, label, source, columns, order, filters):
+        self.label = label
+        self.source = source
+        # [(المفتاح، تعبير SQL، العنوان)]
+        self.columns = columns
+        self.order = order
+        # {اسم الفلتر: دالة القيمة -> (شرط SQL، المعاملات)}
+        self.filters = filters
+
+    def headers(self, keys):
+        titles = {key: title for key, _, title in self.columns}
+        return [titles[key] for key in keys]
+
+
+def _equals(column):
+    return lambda value: (f"{column} = ?", (value,))
+
+
+def _from_day(column):
+    return lambda value: (f"{column} >= ?", (value,))
+
+
+def _before_day(column):
+    return lambda value: (f"{column} < ?", (value,))
+
+
+EXPORT_TABLES = {
+    'employees': ExportTable("الموظفون", "employees e", [
+        ('serial_number', "e.serial_number", 'serial_number'),
+        ('name', "e.name", 'name'),
+        ('national_id', "e.national_id", 'national_id'),
+        ('department', "e.department", 'department'),
+        ('job_grade', "e.job_grade", 'job_grade'),
+        ('hiring_date', "e.hiring_date", 'hiring_date'),
+        ('grade_date', "e.grade_date", 'grade_date'),
+        ('bonus', "e.bonus", 'bonus'),
+        ('vacation_balance', "e.vacation_balance", 'vacation_balance'),
+        ('emergency_vacation_balance', "e.emergency_vacation_balance", 'emergency_vacation_balance'),
+        ('work_days', "e.work_days", 'work_days'),
+    ], "e.name", {
+        'department': _equals("e.department"),
+        'employee_id': _equals("e.id"),
+    }),
+    'vacations': ExportTable("الإجازات", "vacations v JOIN employees e ON e.id = v.employee_id", [
+        ('serial_number', "e.serial_number", "الرقم الآلي"),
+        ('name', "e.name", "الموظف"),
+        ('department', "e.department", "القسم"),
+        ('type', "v.type", "النوع"),
+        ('subtype', "v.subtype", "التفصيل"),
+        ('start_date', "v.start_date", "من"),
+        ('end_date', "v.end_date", "إلى"),
+        ('duration', "v.duration", "المدة"),
+        ('status', "v.status", "الحالة"),
+        ('dept_approval', "v.dept_approval", "موافقة القسم"),
+        ('notes', "v.notes", "ملاحظات"),
+        ('created_at', "v.created_at", "تاريخ الطلب"),
+    ], "v.start_day, e.name", {
+        # الإجازات المتداخلة مع الفترة
+        'start_day': _from_day("v.end_day"),
+        'end_day': _before_day("v.start_day"),
+        'department': _equals("e.department"),
+        'employee_id': _equals("v.employee_id"),
+        'status': _equals("v.status"),
+    }),
+    'absences': ExportTable("الغياب", "absences a JOIN employees e ON e.id = a.employee_id", [
+        ('serial_number', "e.serial_number", "الرقم الآلي"),
+        ('name', "e.name", "الموظف"),
+        ('department', "e.department", "القسم"),
+        ('date', "a.date", "التاريخ"),
+        ('type', "a.type", "النوع"),
+        ('duration', "a.duration", "المدة"),
+        ('notes', "a.notes", "ملاحظات"),
+    ], "a.day, e.name", {
+        'start_day': _from_day("a.day"),
+        'end_day': _before_day("a.day"),
+        'department': _equals("e.department"),
+        'employee_id': _equals("a.employee_id"),
+    }),
+    'audit_log': ExportTable("سجل التعديلات", "audit_log l", [
+        ('created_at', "l.created_at", "الوقت"),
+        ('action', "l.action", "العملية"),
+        ('table_name', "l.table_name", "الجدول"),
+        ('record_id', "l.record_id", "رقم السجل"),
+        ('changes', "l.changes", "التعديلات"),
+        ('user', "l.user", "المستخدم"),
+    ], "l.created_at", {
+        # created_at نص "yyyy-MM-dd HH:MM:SS" فيُقارن بتاريخ اليوم نصياً
+        'start_day': lambda day: ("l.created_at >= ?", (from_day(day),)),
+        'end_day': lambda day: ("l.created_at < ?", (from_day(day),)),
+        'table_name': _equals("l.table_name"),
+    }),
+}
+
+
+def _table(name):
+    try:
+        return EXPORT_TABLES[name]
+    except KeyError:
+        raise ValueError(f"جدول غير معروف للتصدير: {name}")
+
+
+def build_query(name, columns=None, filters=None, order=None):
+    """(select, count, params, keys) للجدول والأعمدة والفلاتر المختارة
+
+    order يستبدل ترتيب الجدول الافتراضي (تعبير ORDER BY على أعمدة source).
+    """
+    table = _table(name)
+    known = [key for key, _, _ in table.columns]
+    keys = list(columns) if columns else known
+    unknown = [key for key in keys if key not in known]
+    if unknown:
+        raise ValueError(f"أعمدة غير معروفة في {table.label}: {', '.join(unknown)}")
+    conditions, params = [], []
+    for filter_name, value in (filters or {}).items():
+        if value is None:
+            continue
+        if filter_name not in table.filters:
+            raise ValueError(f"فلتر غير مدعوم في {table.label}: {filter_name}")
+        condition, values = table.filters[filter_name](value)
+        conditions.append(condition)
+        params.extend(values)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    expressions = {key: expression for key, expression, _ in table.columns}
+    select = (
+        f"SELECT {', '.join(expressions[key] for key in keys)} "
+        f"FROM {table.source}{where} ORDER BY {order or table.order}"
+    )
+    count = f"SELECT COUNT(*) FROM {table.source}{where}"
+    return select, count, tuple(params), keys
+
+
+def _with_progress(rows, total, progress):
+    for done, row in enumerate(rows, start=1):
+        if progress and done % PROGRESS_ROWS == 0:
+            progress(done, total)
+        yield row
+    if progress:
+        progress(total, total)
+
+
+def write_xlsx(path, title, headers, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title)
+    sheet.sheet_view.rightToLeft = True
+    sheet.append(headers)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(path)
+    return count
+
+
+def write_csv(path, headers, rows):
+    # utf-8-sig حتى يفتح Excel الأسماء العربية بشكل صحيح
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(headers)
+        count = 0
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def count_rows(db, name, filters=None):
+    """عدد الصفوف التي سيصدّرها export_table بنفس الفلاتر"""
+    _, count, params, _ = build_query(name, filters=filters)
+    return db.fetch_scalar(count, params, default=0)
+
+
+def export_table(db, name, path, columns=None, filters=None, progress=None, order=None):
+    """تصدير الجدول إلى path (xlsx أو csv حسب الامتداد)؛ يرجع عدد الصفوف
+
+    إذا لم توجد صفوف لا يُنشأ الملف ويرجع 0، وإذا توقف التصدير (خطأ أو
+    إلغاء) يُحذف الملف الناقص.
+    """
+    select, count, params, keys = build_query(name, columns, filters, order)
+    total = db.fetch_scalar(count, params, default=0)
+    if not total:
+        return 0
+    table = _table(name)
+    rows = _with_progress(db.iter_rows(select, params), total, progress)
+    headers = table.headers(keys)
+    try:
+        if path.lower().endswith(".csv"):
+            return write_csv(path, headers, rows)
+        return write_xlsx(path, table.label, headers, rows)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
@@ -1,21 +1,60 @@
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QPushButton,
     QFileDialog, QMessageBox, QProgressBar, QLabel,
-    QGroupBox
+    QGroupBox, QComboBox, QListWidget, QListWidgetItem,
+    QCheckBox, QDateEdit, QFormLayout
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QDate
 import pandas as pd
 from datetime import datetime
+from day_numbers import to_day
+from employee_import import ImportPlanner, apply_plan, write_errors
+from export_engine import EXPORT_TABLES, export_table
+from import_reader import common_columns, list_sheets, read_employees
+from background_jobs import BackgroundJob, start_job
+
+ALL_DEPARTMENTS = "الكل"
+
+
+# ---------- المهام المنفذة في الخلفية (لا تلمس عناصر الواجهة) ----------
+
+def read_import_plan(job, db, file_paths):
+    # قراءة الأوراق والتحقق منها على التوازي (import_reader)، ومقارنة كل دفعة فور وصولها
+    sheets = list_sheets(file_paths)
+    planner = ImportPlanner(db, common_columns(sheets))
+    for rows, errors in read_employees(sheets, job.report):
+        planner.add(rows, errors)
+    return planner.plan()
+
+
+def apply_import_plan(job, db, plan):
+    return apply_plan(db, plan, job.report)
+
+
+def run_export(job, db, table, file_path, columns, filters):
+    """يرجع عدد السجلات المصدَّرة (0 إذا لم توجد بيانات)"""
+    return export_table(db, table, file_path, columns, filters, job.report)
+
 
 class ImportExportTab(QWidget):
     def __init__(self, db_manager):
         super().__init__()
         self.db = db_manager
         self.import_btn = QPushButton("استيراد من Excel")
-        self.export_btn = QPushButton("تصدير إلى Excel")  # تم تعريفه هنا
+        self.export_btn = QPushButton("تصدير")  # تم تعريفه هنا
+        # اختيار الجدول والأعمدة والفلاتر (export_engine)
+        self.export_table_combo = QComboBox()
+        self.export_columns_list = QListWidget()
+        self.export_period_check = QCheckBox("تحديد فترة")
+        self.export_from_date = QDateEdit(QDate(QDate.currentDate().year(), 1, 1))
+        self.export_to_date = QDateEdit(QDate.currentDate())
+        self.export_department_combo = QComboBox()
         self.template_btn = QPushButton("تحميل نموذج Excel")
+        self.cancel_btn = QPushButton("إلغاء العملية")
         self.progress_bar = QProgressBar()
         self.status_label = QLabel()
+        # العملية الجارية في الخلفية (background_jobs)
+        self.current_job = None
         self.setup_ui()
 
     def refresh_employee_view(self):
@@ -43,12 +82,15 @@ class ImportExportTab(QWidget):
         import_layout = QVBoxLayout()
         
         self.import_btn.clicked.connect(self.import_data)
+        self.cancel_btn.clicked.connect(self.cancel_job)
+        self.cancel_btn.setVisible(False)
         self.progress_bar.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.progress_bar.setVisible(False)
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         
         import_layout.addWidget(self.import_btn)
         import_layout.addWidget(self.progress_bar)
+        import_layout.addWidget(self.cancel_btn)
         import_layout.addWidget(self.status_label)
         import_group.setLayout(import_layout)
         
@@ -58,7 +100,29 @@ class ImportExportTab(QWidget):
         
         self.export_btn.clicked.connect(self.export_data)
         self.template_btn.clicked.connect(self.download_template)
-        
+
+        for name, table in EXPORT_TABLES.items():
+            self.export_table_combo.addItem(table.label, name)
+        self.export_table_combo.currentIndexChanged.connect(self.load_export_options)
+        for date_edit in [self.export_from_date, self.export_to_date]:
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("yyyy-MM-dd")
+        self.export_period_check.toggled.connect(self.export_from_date.setEnabled)
+        self.export_period_check.toggled.connect(self.export_to_date.setEnabled)
+        self.export_period_check.setChecked(False)
+        self.export_from_date.setEnabled(False)
+        self.export_to_date.setEnabled(False)
+
+        export_form = QFormLayout()
+        export_form.addRow("الجدول:", self.export_table_combo)
+        export_form.addRow("الأعمدة:", self.export_columns_list)
+        export_form.addRow(self.export_period_check)
+        export_form.addRow("من:", self.export_from_date)
+        export_form.addRow("إلى:", self.export_to_date)
+        export_form.addRow("القسم:", self.export_department_combo)
+        export_layout.addLayout(export_form)
+        self.load_export_options()
+
         export_layout.addWidget(self.export_btn)
         export_layout.addWidget(self.template_btn)
         export_group.setLayout(export_layout)
@@ -97,220 +161,179 @@ class ImportExportTab(QWidget):
         self.setLayout(main_layout)
 
     def import_data(self):
-        """استيراد البيانات من ملف Excel"""
-        file_path, _ = QFileDialog.getOpenFileName(
+        """استيراد البيانات من ملف Excel أو عدة ملفات (كل الأوراق)"""
+        file_paths, _ = QFileDialog.getOpenFileNames(
             self,
-            "اختر ملف Excel",
+            "اختر ملفات Excel",
             "",
             "Excel Files (*.xlsx *.xls)"
         )
     
-        if not file_path:
+        if not file_paths:
             return
-        
+
+        # القراءة والمقارنة في الخلفية ثم معاينة التغييرات قبل الكتابة (dry-run)
+        self.run_job(
+            BackgroundJob(read_import_plan, self.db, file_paths),
+            self.preview_import, "جاري قراءة الملف..."
+        )
+
+    def preview_import(self, plan):
+        self.set_busy(False)
         confirm = QMessageBox.question(
             self,
             "تأكيد الاستيراد",
-            "هل أنت متأكد من استيراد البيانات من هذا الملف؟",
+            f"{plan.summary()}\n\nهل تريد تطبيق هذه التغييرات؟",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
-        
         if confirm != QMessageBox.StandardButton.Yes:
+            self.status_label.setText("تم إلغاء الاستيراد")
             return
-            
-        try:
-            self.progress_bar.setVisible(True)
-            self.status_label.setText("جاري قراءة الملف...")
-            self.progress_bar.setValue(10)
-        
-            # قراءة ملف Excel
-            df = pd.read_excel(file_path)
-        
-            # التحقق من الأعمدة المطلوبة
-            required_columns = ['serial_number', 'name', 'national_id']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-        
-            if missing_columns:
-                raise ValueError(f"الأعمدة المفقودة: {', '.join(missing_columns)}")
-        
-            self.status_label.setText("جاري معالجة البيانات...")
-            self.progress_bar.setValue(30)
-        
-            # تنظيف البيانات
-            df = self.clean_import_data(df)
-        
-            self.status_label.setText("جاري حفظ البيانات...")
-            self.progress_bar.setValue(50)
-            
-            # حفظ البيانات في قاعدة البيانات
-            self.save_to_database(df)
-        
-            self.progress_bar.setValue(100)
-            self.status_label.setText("تم الاستيراد بنجاح")
-        
-            QMessageBox.information(
+        # حفظ الجديد والمعدَّل فقط في قاعدة البيانات
+        self.run_job(
+            BackgroundJob(apply_import_plan, self.db, plan),
+            self.import_finished, "جاري حفظ البيانات..."
+        )
+
+    def import_finished(self, result):
+        self.set_busy(False)
+        self.status_label.setText("تم الاستيراد بنجاح")
+        if result.errors:
+            path = write_errors(result.errors)
+            QMessageBox.warning(
                 self,
-                "تم",
-                f"تم استيراد {len(df)} سجل بنجاح"
+                "تحذير",
+                f"تم استيراد {result.imported} سجل بنجاح، مع {len(result.errors)} أخطاء.\n"
+                f"تم حفظ تفاصيل الأخطاء في ملف {path}"
             )
-            
-            # تحديث عرض الموظفين إذا كان موجوداً
-            if hasattr(self.parent(), 'employee_view_tab'):
-                self.parent().employee_view_tab.load_employees()
-            elif hasattr(self.parent(), 'main_window') and hasattr(self.parent().main_window, 'employee_view_tab'):
-                self.parent().main_window.employee_view_tab.load_employees()
-        
-        except Exception as e:
-            QMessageBox.critical(
+        else:
+            QMessageBox.information(
                 self,
-                "خطأ",
-                f"حدث خطأ أثناء الاستيراد: {str(e)}"
+                "تم",
+                f"تم استيراد {result.imported} سجل بنجاح"
             )
-        finally:
-            self.progress_bar.setVisible(False)
-
-    def clean_import_data(self, df):
-        """تنظيف وتهيئة البيانات المستوردة"""
-        # تحويل الأعمدة الرقمية
-        numeric_cols = ['bonus', 'vacation_balance']
-        for col in numeric_cols:
-            if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
-    
-        # تحويل التواريخ
-        date_cols = ['hiring_date', 'grade_date']
-        for col in date_cols:
-            if col in df.columns:
-                df[col] = pd.to_datetime(df[col], errors='coerce').dt.strftime('%Y-%m-%d')
-    
-        # تعيين القيم الافتراضية
-        if 'vacation_balance' in df.columns:
-            df['vacation_balance'] = df['vacation_balance'].apply(lambda x: max(0, x))
-        else:
-            df['vacation_balance'] = 30  # القيمة الافتراضية
-        
-        if 'bonus' not in df.columns:
-            df['bonus'] = 0
-        
-        if 'work_days' not in df.columns:
-            df['work_days'] = "0:M,1:M,2:M,3:M,4:M,5:M,6:M"  # أيام العمل الافتراضية
-        
-        if 'department' not in df.columns:
-            df['department'] = "غير محدد"
-        
-        return df
+        if result.imported > 0:
+            self.refresh_employee_view()
 
-    def save_to_database(self, df):
-        """حفظ البيانات المستوردة في قاعدة البيانات"""
-        try:
-            total = len(df)
-            success = 0
-            errors = []
-        
-            for idx, row in df.iterrows():
-                try:
-                    serial_number = str(row['serial_number']).strip()
-                    if not serial_number:
-                        continue
-                        
-                    self.db.execute_query(
-                        "INSERT OR REPLACE INTO employees ("
-                        "serial_number, name, national_id, department, "
-                        "job_grade, hiring_date, grade_date, bonus, "
-                        "vacation_balance, work_days"
-                        ") VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                        (
-                            serial_number,
-                            str(row.get('name', '')).strip(),
-                            str(row.get('national_id', '')).strip(),
-                            str(row.get('department', 'غير محدد')).strip(),
-                            str(row.get('job_grade', '')).strip(),
-                            row.get('hiring_date', ''),
-                            row.get('grade_date', ''),
-                            int(row.get('bonus', 0)),
-                            int(row.get('vacation_balance', 30)),
-                            row.get('work_days', "0:M,1:M,2:M,3:M,4:M,5:M,6:M")
-                        )
-                    )
-                    success += 1
-                except Exception as e:
-                    errors.append(f"سطر {idx+2}: {str(e)}")
-                
-                # تحديث شريط التقدم
-                progress = 50 + int((idx + 1) / total * 50)
-                self.progress_bar.setValue(progress)
-                self.status_label.setText(f"جاري معالجة السجل {idx+1} من {total}")
-            
-            if errors:
-                with open("import_errors.log", "w", encoding="utf-8") as f:
-                    f.write("\n".join(errors))
-                
-                QMessageBox.warning(
-                    self,
-                    "تحذير",
-                    f"تم استيراد {success} سجل بنجاح، مع {len(errors)} أخطاء.\n"
-                    "تم حفظ تفاصيل الأخطاء في ملف import_errors.log"
-                )
-            if success > 0:  
-                self.refresh_employee_view()
-                
-        except Exception as e:
-            raise e
+    def load_export_options(self):
+        """أعمدة الجدول المختار وفلاتره المتاحة"""
+        table = EXPORT_TABLES[self.export_table_combo.currentData()]
+        self.export_columns_list.clear()
+        for key, _, title in table.columns:
+            item = QListWidgetItem(title)
+            item.setData(Qt.ItemDataRole.UserRole, key)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked)
+            self.export_columns_list.addItem(item)
+        self.export_period_check.setEnabled('start_day' in table.filters)
+        if 'start_day' not in table.filters:
+            self.export_period_check.setChecked(False)
+        self.export_department_combo.clear()
+        self.export_department_combo.addItem(ALL_DEPARTMENTS, None)
+        if 'department' in table.filters:
+            for (name,) in self.db.fetch_all("SELECT name FROM departments ORDER BY name"):
+                self.export_department_combo.addItem(name, name)
+        self.export_department_combo.setEnabled('department' in table.filters)
+
+    def export_selection(self):
+        """(الأعمدة المختارة، الفلاتر) من عناصر التصدير"""
+        columns = [
+            self.export_columns_list.item(row).data(Qt.ItemDataRole.UserRole)
+            for row in range(self.export_columns_list.count())
+            if self.export_columns_list.item(row).checkState() == Qt.CheckState.Checked
+        ]
+        filters = {'department': self.export_department_combo.currentData()}
+        if self.export_period_check.isChecked():
+            # نهاية الفترة شاملة، والفلتر نصف مفتوح
+            filters['start_day'] = to_day(self.export_from_date.date())
+            filters['end_day'] = to_day(self.export_to_date.date()) + 1
+        return columns, filters
 
     def export_data(self):
-        """تصدير البيانات إلى ملف Excel"""
+        """تصدير الجدول المختار إلى ملف Excel أو CSV"""
+        table = self.export_table_combo.currentData()
+        columns, filters = self.export_selection()
+        if not columns:
+            QMessageBox.warning(self, "تحذير", "يرجى اختيار عمود واحد على الأقل")
+            return
         file_path, _ = QFileDialog.getSaveFileName(
             self,
-            "حفظ كملف Excel",
-            f"employees_export_{datetime.now().strftime('%Y%m%d')}.xlsx",
-            "Excel Files (*.xlsx)"
+            "حفظ ملف التصدير",
+            f"{table}_export_{datetime.now().strftime('%Y%m%d')}.xlsx",
+            "Excel Files (*.xlsx);;CSV Files (*.csv)"
         )
         
         if not file_path:
             return
-            
-        try:
-            # جلب البيانات من قاعدة البيانات
-            self.db.execute_query("""
-                SELECT 
-                    serial_number, name, national_id, department,
-                    job_grade, hiring_date, grade_date, bonus, vacation_balance
-                FROM employees
-                ORDER BY name
-            """, commit=False)
-            
-            data = self.db.cursor.fetchall()
-            
-            if not data:
-                QMessageBox.warning(
-                    self,
-                    "تحذير",
-                    "لا توجد بيانات للتصدير"
-                )
-                return
-                
-            # إنشاء DataFrame
-            columns = [
-                'serial_number', 'name', 'national_id', 'department',
-                'job_grade', 'hiring_date', 'grade_date', 'bonus', 'vacation_balance'
-            ]
-            df = pd.DataFrame(data, columns=columns)
-            
-            # تصدير إلى Excel
-            df.to_excel(file_path, index=False)
-            
-            QMessageBox.information(
-                self,
-                "تم",
-                f"تم تصدير {len(data)} سجل بنجاح"
-            )
-            
-        except Exception as e:
-            QMessageBox.critical(
+
+        self.run_job(
+            BackgroundJob(run_export, self.db, table, file_path, columns, filters),
+            self.export_finished, "جاري التصدير..."
+        )
+
+    def export_finished(self, count):
+        self.set_busy(False)
+        self.status_label.setText("")
+        if not count:
+            QMessageBox.warning(
                 self,
-                "خطأ",
-                f"حدث خطأ أثناء التصدير: {str(e)}"
+                "تحذير",
+                "لا توجد بيانات للتصدير"
             )
+            return
+        QMessageBox.information(
+            self,
+            "تم",
+            f"تم تصدير {count} سجل بنجاح"
+        )
+
+    # ---------- العمليات في الخلفية ----------
+
+    def run_job(self, job, on_finished, status):
+        """تشغيل عملية في الخلفية وربط إشاراتها بشريط التقدم"""
+        self.current_job = job
+        job.signals.progress.connect(self.update_job_progress)
+        job.signals.status.connect(self.status_label.setText)
+        job.signals.finished.connect(on_finished)
+        job.signals.failed.connect(self.job_failed)
+        job.signals.cancelled.connect(self.job_cancelled)
+        self.progress_bar.setValue(0)
+        self.status_label.setText(status)
+        self.set_busy(True)
+        start_job(job)
+
+    def set_busy(self, busy):
+        for btn in [self.import_btn, self.export_btn, self.template_btn]:
+            btn.setEnabled(not busy)
+        self.progress_bar.setVisible(busy)
+        self.cancel_btn.setVisible(busy)
+        self.cancel_btn.setEnabled(busy)
+
+    def update_job_progress(self, done, total):
+        if total:
+            self.progress_bar.setValue(int(done / total * 100))
+            self.status_label.setText(f"جاري معالجة السجل {done} من {total}")
+
+    def cancel_job(self):
+        if self.current_job is not None:
+            self.current_job.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText("جاري الإلغاء...")
+
+    def job_failed(self, message):
+        self.set_busy(False)
+        self.status_label.setText("")
+        QMessageBox.critical(
+            self,
+            "خطأ",
+            f"حدث خطأ أثناء العملية: {message}"
+        )
+
+    def job_cancelled(self):
+        self.set_busy(False)
+        # الدفعات التي ثُبِّتت قبل الإلغاء تبقى محفوظة
+        self.status_label.setText("تم إلغاء العملية")
+        self.refresh_employee_view()
 
     def download_template(self):
         """تحميل نموذج Excel للاستيراد"""
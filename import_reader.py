@@ -0,0 +1,241 @@
+"""قراءة ملفات استيراد الموظفين الكبيرة على التوازي
+
+كل ورقة تُقرأ وتُتحقق منها في عملية مستقلة (ProcessPoolExecutor): تفتح
+العملية الملف بوضع القراءة فقط (read_only) وتمر على صفوف الورقة بـ
+iter_rows، وتجمع CHUNK_ROWS صف وتتحقق منها (prepare_employees) وترسلها
+إلى طابور محدود (Manager().Queue بحجم QUEUE_CHUNKS). فتُحلَّل الأوراق على
+كل الأنوية، وتُحلَّل الورقة الواحدة في عمليتها بينما تقارن العملية
+الرئيسية ما وصل منها بالموظفين الحاليين.
+
+read_employees مولّد يعيد الدفعات بترتيب الملفات والأوراق والسطور فور
+وصول ما قبلها، بعد رفض التكرار مع الدفعات السابقة (reject_duplicates)،
+فيقارنها المستهلك (employee_import.ImportPlanner) دون جمع الملف كله في
+الذاكرة. لا تُرسل إلى العمليات إلا ورقة واحدة لكل عملية زيادة على الورقة
+التي ينتظرها المستهلك، فلا تتكدس الدفعات التي وصلت قبل أوانها.
+
+الملفات الصغيرة (أقل من POOL_ROWS صف) أو القراءة بعملية واحدة تُقرأ في
+العملية الحالية دون مجموعة عمليات. ملفات .xls القديمة لا يقرؤها openpyxl
+فتُقرأ بـ pandas.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import Manager
+from queue import Empty
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from database import row_type
+from employee_import import check_columns, prepare_employees, reject_duplicates, supplied_columns
+
+CHUNK_ROWS = 5000
+# أقل عدد صفوف تُستخدم له مجموعة العمليات
+POOL_ROWS = 20000
+# أقصى عدد دفعات تنتظر المستهلك في الطابور
+QUEUE_CHUNKS = 8
+POLL_SECONDS = 1
+
+_CHUNK, _DONE = "chunk", "done"
+
+Sheet = row_type('path', 'name', 'rows', 'columns')
+
+
+def _is_xls(path):
+    return path.lower().endswith(".xls")
+
+
+def _names(header):
+    return [str(name).strip() if name is not None else "" for name in header]
+
+
+def _source(path, name):
+    return f"{os.path.basename(path)} / {name}: "
+
+
+def list_sheets(paths):
+    """Sheet لكل أوراق الملفات: المسار، الاسم، عدد الصفوف التقريبي أو None، العناوين"""
+    sheets = []
+    for path in paths:
+        if _is_xls(path):
+            with pd.ExcelFile(path) as book:
+                for name in book.sheet_names:
+                    header = book.parse(name, nrows=0).columns
+                    sheets.append(Sheet(path, name, None, _names(header)))
+            continue
+        workbook = load_workbook(path, read_only=True)
+        try:
+            for ws in workbook.worksheets:
+                header = next(ws.iter_rows(max_row=1, values_only=True), ())
+                # max_row من وسم الأبعاد في الملف، وقد لا يكون موجوداً
+                sheets.append(Sheet(path, ws.title, ws.max_row, _names(header)))
+        finally:
+            workbook.close()
+    return sheets
+
+
+def _readable(sheet):
+    try:
+        check_columns(sheet.columns)
+    except ValueError:
+        return False
+    return True
+
+
+def common_columns(sheets):
+    """أعمدة الموظفين الموجودة في كل الأوراق؛ عمود غائب عن إحداها لا يُعدَّل في الموظفين الحاليين"""
+    supplied = [supplied_columns(sheet.columns) for sheet in sheets if _readable(sheet)]
+    if not supplied:
+        return []
+    return [column for column in supplied[0] if all(column in other for other in supplied)]
+
+
+def _iter_chunks(path, name, columns):
+    """(رقم أول سطر، إطار بيانات) لكل دفعة من الورقة"""
+    if _is_xls(path):
+        df = pd.read_excel(path, sheet_name=name)
+        df.columns = columns
+        for start in range(0, len(df), CHUNK_ROWS):
+            yield start + 2, df.iloc[start:start + CHUNK_ROWS]
+        return
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[name].iter_rows(min_row=2, values_only=True)
+        line = 2
+        while True:
+            chunk = list(islice(rows, CHUNK_ROWS))
+            if not chunk:
+                break
+            yield line, pd.DataFrame(chunk, columns=columns)
+            line += len(chunk)
+    finally:
+        workbook.close()
+
+
+def _read_sheet(path, name, columns):
+    """(الصفوف السليمة أو None، الأخطاء، عدد الصفوف المقروءة) لكل دفعة من الورقة"""
+    source = _source(path, name)
+    try:
+        for first_line, df in _iter_chunks(path, name, columns):
+            rows, errors = prepare_employees(df, first_line, source)
+            yield rows, errors, len(df)
+    except Exception as e:
+        yield None, [f"{source}{str(e)}"], 0
+
+
+def _parse_sheet(task, path, name, columns, queue, cancelled):
+    """يُنفَّذ في عملية مستقلة: قراءة الورقة وإرسال دفعاتها المتحقق منها بترتيبها"""
+    count = 0
+    try:
+        for rows, errors, read in _read_sheet(path, name, columns):
+            if cancelled.is_set():
+                break
+            queue.put((_CHUNK, task, count, rows, errors, read))
+            count += 1
+    finally:
+        queue.put((_DONE, task, count, None, None, 0))
+
+
+def _next(queue, futures):
+    """الرسالة التالية؛ وإذا توقفت عملية قبل إرسال _DONE (انهيار) يُرفع خطؤها"""
+    while True:
+        try:
+            return queue.get(timeout=POLL_SECONDS)
+        except Empty:
+            for future in futures:
+                if future.done() and future.exception() is not None:
+                    raise future.exception()
+
+
+def _read_here(tasks):
+    for task in tasks:
+        if isinstance(task, str):
+            yield None, [task], 0
+        else:
+            yield from _read_sheet(*task)
+
+
+def _read_in_pool(tasks, workers):
+    """نفس دفعات _read_here بترتيبها، والأوراق تُقرأ في مجموعة عمليات"""
+    with Manager() as manager, ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        queue = manager.Queue(maxsize=QUEUE_CHUNKS)
+        cancelled = manager.Event()
+        futures = []
+        submitted = running = 0
+        current = sequence = 0
+        # دفعات وصلت قبل أوانها {(المهمة، ترتيب الدفعة): (الصفوف، الأخطاء، العدد)}
+        arrived = {}
+        # عدد دفعات كل مهمة انتهت
+        finished = {}
+        try:
+            while current < len(tasks):
+                while submitted < len(tasks) and submitted <= current + workers:
+                    if not isinstance(tasks[submitted], str):
+                        futures.append(pool.submit(_parse_sheet, submitted, *tasks[submitted], queue, cancelled))
+                        running += 1
+                    submitted += 1
+                if isinstance(tasks[current], str):
+                    yield None, [tasks[current]], 0
+                    current += 1
+                    continue
+                if (current, sequence) in arrived:
+                    yield arrived.pop((current, sequence))
+                    sequence += 1
+                    continue
+                if finished.get(current) == sequence:
+                    current, sequence = current + 1, 0
+                    continue
+                kind, task, position, rows, errors, count = _next(queue, futures)
+                if kind == _DONE:
+                    finished[task] = position
+                    running -= 1
+                else:
+                    arrived[(task, position)] = (rows, errors, count)
+        except BaseException:
+            # إيقاف العمليات وتفريغ الطابور حتى لا تبقى محجوبة عند put
+            cancelled.set()
+            while running:
+                try:
+                    if _next(queue, futures)[0] == _DONE:
+                        running -= 1
+                except Exception:
+                    # عملية انهارت: لن يصل منها _DONE
+                    break
+            raise
+
+
+def read_employees(sheets, progress=None, workers=None):
+    """دفعات (الصفوف السليمة أو None، الأخطاء) لكل الأوراق بترتيب الملفات
+
+    مولّد: كل دفعة تُعاد فور وصول ما قبلها. progress(done, total) يُستدعى
+    قبل كل دفعة بعدد الصفوف المقروءة، ويمكنه إيقاف القراءة برفع استثناء،
+    وكذلك إغلاق المولّد قبل نهايته.
+    """
+    workers = workers or os.cpu_count() or 1
+    # المهمة: ورقة، أو رسالة خطأ لورقة بلا الأعمدة المطلوبة
+    tasks = []
+    for sheet in sheets:
+        try:
+            check_columns(sheet.columns)
+        except ValueError as e:
+            tasks.append(f"{_source(sheet.path, sheet.name)}{str(e)}")
+            continue
+        tasks.append((sheet.path, sheet.name, sheet.columns))
+    total = sum(sheet.rows - 1 for sheet in sheets if sheet.rows and _readable(sheet))
+    if workers > 1 and total >= POOL_ROWS:
+        chunks = _read_in_pool(tasks, workers)
+    else:
+        chunks = _read_here(tasks)
+    done = 0
+    seen_serials, seen_national_ids = set(), set()
+    try:
+        for rows, errors, count in chunks:
+            done += count
+            if progress and count:
+                progress(done, max(total, done))
+            if rows is not None:
+                rows, duplicate_errors = reject_duplicates(rows, seen_serials, seen_national_ids)
+                errors = errors + duplicate_errors
+            yield rows, errors
+    finally:
+        chunks.close()
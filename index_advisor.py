@@ -0,0 +1,322 @@
+"""مستشار الفهارس المبني على الاستعلامات المسجلة
+
+يقرأ عينات الاستعلامات التي يحفظها query_profiler في query_workload.json
+ويعيد تشغيلها على نسخة من قاعدة البيانات (لا تُلمس القاعدة الأصلية).
+إذا لم تُحفظ قيم المعاملات (الافتراضي) تُستبدل بقيم فارغة من نفس النوع،
+فتبقى الخطة صحيحة لكن الأزمنة تقريبية.
+لكل استعلام يُستخرج EXPLAIN QUERY PLAN ويُعلَّم:
+    - المسح الكامل للجدول (SCAN بدون فهرس أو بفهرس غير جزئي)
+    - الترتيب المؤقت (USE TEMP B-TREE)
+ثم يُقترح فهرس مركب (أعمدة المساواة ثم عمود المدى أو أعمدة الترتيب)،
+جزئي إذا كان الشرط مقارنة بقيم ثابتة، وشامل (covering) إذا كانت الأعمدة
+المختارة قليلة. تُنشأ الفهارس المقترحة على النسخة ويُقارن زمن كل
+استعلام قبلها وبعدها، ولا يُوصى إلا بالفهارس التي استخدمها المخطط فعلاً.
+
+الاستخدام:
+    python index_advisor.py [query_workload.json]
+"""
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+from backup import backup_to_file
+from database import DB_PATH
+from query_profiler import WORKLOAD_PATH
+
+# عدد مرات تنفيذ كل استعلام عند القياس (يؤخذ أقل زمن)
+REPEAT = 5
+
+# أقصى عدد أعمدة في الفهرس الشامل المقترح
+MAX_COVERING_COLUMNS = 6
+
+_KEYWORDS = {
+    'WHERE', 'JOIN', 'ON', 'LEFT', 'INNER', 'CROSS', 'ORDER', 'GROUP',
+    'LIMIT', 'SET', 'VALUES', 'USING', 'NATURAL', 'OUTER',
+}
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN|UPDATE)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.I)
+_PLAN_SCAN = re.compile(r"^SCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?")
+_COLUMN = r"(?:(\w+)\.)?(\w+)"
+_LITERAL = r"('(?:[^']|'')*'|-?\d+(?:\.\d+)?)"
+_EQ_LITERAL = re.compile(rf"^{_COLUMN}\s*=\s*{_LITERAL}$")
+_EQ_PARAM = re.compile(rf"^{_COLUMN}\s*(?:=\s*\?|IN\s*\(.*\))$", re.I | re.S)
+_RANGE = re.compile(rf"^{_COLUMN}\s*(?:<=|>=|<|>|BETWEEN\b)", re.I)
+
+
+# قيم بديلة لكل نوع معامل عند غياب القيم المسجلة
+_PLACEHOLDERS = {'int': 0, 'float': 0.0, 'str': '', 'bytes': b''}
+
+
+def replay_params(entry):
+    """معاملات إعادة تشغيل العينة: القيم المسجلة أو بدائل بحسب الأنواع"""
+    if entry.get('params') is not None:
+        return entry['params']
+    return [_PLACEHOLDERS.get(name) for name in entry.get('param_types') or []]
+
+
+def query_plan(conn, query, params=()):
+    return [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+
+def _partial_indexes(conn):
+    return {
+        name for name, sql in conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        )
+        if re.search(r"\)\s*WHERE\b", sql, re.I)
+    }
+
+
+def plan_problems(conn, plan):
+    """إرجاع (أسماء الجداول المقروءة كاملة، هل يوجد ترتيب مؤقت) من خطة التنفيذ"""
+    partial = _partial_indexes(conn)
+    scanned = []
+    temp_sort = False
+    for detail in plan:
+        match = _PLAN_SCAN.match(detail)
+        # الجداول الافتراضية (مثل R*Tree) تستخدم فهرسها الخاص
+        if match and 'VIRTUAL TABLE' not in detail and (match.group(2) is None or match.group(2) not in partial):
+            scanned.append(match.group(1))
+        if 'USE TEMP B-TREE' in detail:
+            temp_sort = True
+    return scanned, temp_sort
+
+
+def unsargable_terms(query):
+    """شروط WHERE التي تطبق دالة على العمود فلا يستطيع أي فهرس خدمتها"""
+    where = _clause(query, 'WHERE', ['GROUP', 'ORDER', 'LIMIT'])
+    return [
+        term for term in _split_top_level(where, 'AND')
+        if re.match(r"^\w+\s*\(", _strip_parens(term))
+    ] if where else []
+
+
+def _table_refs(query):
+    """ربط الأسماء المستعارة بأسماء الجداول: {alias: table}"""
+    refs = {}
+    for table, alias in _TABLE_REF.findall(query):
+        refs[table] = table
+        if alias and alias.upper() not in _KEYWORDS:
+            refs[alias] = table
+    return refs
+
+
+def _clause(query, start, stops):
+    """نص الجزء من الاستعلام بين الكلمة start وأول كلمة من stops"""
+    match = re.search(rf"\b{start}\b(.*?)(?:\b(?:{'|'.join(stops)})\b|$)", query, re.I | re.S)
+    return match.group(1).strip() if match else ""
+
+
+def _split_top_level(text, separator):
+    """تقسيم النص على separator خارج الأقواس فقط"""
+    parts, depth, current = [], 0, []
+    tokens = re.split(rf"(\(|\)|\s+{separator}\s+)", text, flags=re.I)
+    for token in tokens:
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        if depth == 0 and token.strip().upper() == separator:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(token)
+    parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+def _strip_parens(text):
+    while text.startswith('(') and text.endswith(')'):
+        text = text[1:-1].strip()
+    return text
+
+
+class _TableColumns:
+    """أعمدة جدول واحد في الاستعلام مع مطابقة المراجع المؤهلة وغير المؤهلة"""
+
+    def __init__(self, conn, alias, table, single_table):
+        self.alias = alias
+        self.table = table
+        self.single_table = single_table
+        self.columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+    def resolve(self, qualifier, column):
+        if column not in self.columns:
+            return None
+        if qualifier:
+            return column if qualifier == self.alias else None
+        return column if self.single_table else None
+
+
+def propose_index(conn, query, alias):
+    """اقتراح CREATE INDEX للجدول alias في الاستعلام، أو None
+
+    الأعمدة: المساواة بمعامل أولاً، ثم عمود مدى واحد أو أعمدة ORDER BY.
+    الشروط المقارنة بقيم ثابتة تصبح شرط الفهرس الجزئي.
+    """
+    refs = _table_refs(query)
+    if alias not in refs:
+        return None
+    table = refs[alias]
+    info = _TableColumns(conn, alias, table, len(set(refs.values())) == 1)
+
+    where = _clause(query, 'WHERE', ['GROUP', 'ORDER', 'LIMIT'])
+    where = re.sub(r"\bBETWEEN\s+(\S+)\s+AND\s+", r"BETWEEN \1 __AND__ ", where, flags=re.I)
+    equality, ranges, partial = [], [], []
+    for term in _split_top_level(where, 'AND') if where else []:
+        term = _strip_parens(term.replace('__AND__', 'AND'))
+        branches = [_strip_parens(branch) for branch in _split_top_level(term, 'OR')]
+        literal = [_EQ_LITERAL.match(branch) for branch in branches]
+        if all(literal) and all(info.resolve(m.group(1), m.group(2)) for m in literal):
+            partial.append(" OR ".join(f"{m.group(2)} = {m.group(3)}" for m in literal))
+            continue
+        if len(branches) > 1:
+            continue
+        match = _EQ_PARAM.match(term)
+        if match and info.resolve(match.group(1), match.group(2)):
+            equality.append(match.group(2))
+            continue
+        match = _RANGE.match(term)
+        if match and info.resolve(match.group(1), match.group(2)):
+            ranges.append(match.group(2))
+
+    ordering = []
+    for item in _split_top_level(_clause(query, r'ORDER\s+BY', ['LIMIT']), ','):
+        match = re.match(rf"^{_COLUMN}(?:\s+(ASC|DESC))?$", item.strip(), re.I)
+        if not match or not info.resolve(match.group(1), match.group(2)):
+            # الترتيب على أكثر من جدول أو على تعبير لا يخدمه فهرس هذا الجدول
+            ordering = []
+            break
+        ordering.append(match.group(2) + (" DESC" if (match.group(3) or "").upper() == "DESC" else ""))
+
+    key = list(dict.fromkeys(equality))
+    key += ranges[:1] if ranges else [col for col in ordering if col.split()[0] not in key]
+    if not key and partial and not any(" OR " in clause for clause in partial):
+        # لا أعمدة غير الشروط الثابتة: فهرس عادي على أعمدتها يخدم كل القيم لا قيمة واحدة
+        key = [clause.split(" = ")[0] for clause in partial]
+        partial = []
+    if not key:
+        return None
+
+    select_list = _clause(query, 'SELECT', ['FROM'])
+    if '*' not in select_list and len(partial) == 0:
+        used = [col for col in (info.resolve(q, c) for q, c in re.findall(_COLUMN, select_list)) if col]
+        key_columns = {col.split()[0] for col in key}
+        extra = [col for col in dict.fromkeys(used) if col not in key_columns]
+        if extra and len(key) + len(extra) <= MAX_COVERING_COLUMNS:
+            key += extra
+
+    name = "idx_" + table + "_" + "_".join(col.split()[0] for col in key)
+    if partial:
+        name += "_partial"
+    statement = f"CREATE INDEX IF NOT EXISTS {name} ON {table}({', '.join(key)})"
+    if partial:
+        statement += " WHERE " + " AND ".join(f"({clause})" if " OR " in clause else clause for clause in partial)
+    return name, statement
+
+
+def time_query(conn, query, params=(), repeat=REPEAT):
+    """أقل زمن (ملي ثانية) لتنفيذ الاستعلام وجلب كل نتائجه"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        conn.execute(query, params).fetchall()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _is_select(query):
+    return query.lstrip().split(None, 1)[0].upper() == 'SELECT'
+
+
+def analyse(workload, db_path=DB_PATH):
+    """تحليل الاستعلامات على نسخة من قاعدة البيانات وإرجاع (النتائج، الفهارس الموصى بها)"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        copy_path = backup_to_file(db_path, os.path.join(temp_dir, 'advisor.db'))
+        conn = sqlite3.connect(copy_path)
+        try:
+            findings = []
+            proposals = {}
+            for entry in workload:
+                query, params = entry['query'], replay_params(entry)
+                try:
+                    plan = query_plan(conn, query, params)
+                except sqlite3.Error as e:
+                    print(f"تعذر تحليل الاستعلام: {entry['shape']}: {e}")
+                    continue
+                scanned, temp_sort = plan_problems(conn, plan)
+                unsargable = unsargable_terms(query)
+                if not scanned and not temp_sort and not unsargable:
+                    continue
+                finding = {
+                    'entry': entry,
+                    'plan_before': plan,
+                    'scanned': scanned,
+                    'temp_sort': temp_sort,
+                    'unsargable': unsargable,
+                    'before_ms': time_query(conn, query, params) if _is_select(query) else None,
+                }
+                aliases = scanned or list(_table_refs(query))[:1]
+                for alias in aliases:
+                    proposal = propose_index(conn, query, alias)
+                    if proposal:
+                        proposals[proposal[0]] = proposal[1]
+                findings.append(finding)
+
+            for statement in proposals.values():
+                conn.execute(statement)
+
+            used = set()
+            for finding in findings:
+                entry = finding['entry']
+                query, params = entry['query'], replay_params(entry)
+                finding['plan_after'] = query_plan(conn, query, params)
+                finding['after_ms'] = time_query(conn, query, params) if _is_select(query) else None
+                for detail in finding['plan_after']:
+                    used.update(name for name in proposals if re.search(rf"\b{name}\b", detail))
+        finally:
+            conn.close()
+    recommended = {name: statement for name, statement in proposals.items() if name in used}
+    return findings, recommended
+
+
+def format_report(findings, recommended):
+    lines = []
+    for finding in sorted(findings, key=lambda f: f['entry'].get('total_ms', 0), reverse=True):
+        entry = finding['entry']
+        problems = []
+        if finding['scanned']:
+            problems.append("مسح كامل: " + ", ".join(finding['scanned']))
+        if finding['temp_sort']:
+            problems.append("ترتيب مؤقت")
+        if finding['unsargable']:
+            problems.append("شرط على دالة للعمود: " + ", ".join(finding['unsargable']))
+        lines.append(f"{entry['shape']}\n  عدد={entry.get('count', 0)}  {'  '.join(problems)}")
+        lines.append("  قبل: " + " | ".join(finding['plan_before']))
+        lines.append("  بعد: " + " | ".join(finding['plan_after']))
+        if finding['before_ms'] is not None:
+            lines.append(f"  الزمن: {finding['before_ms']:.2f}ms -> {finding['after_ms']:.2f}ms")
+        lines.append("")
+    lines.append("الفهارس الموصى بها:" if recommended else "لا توجد فهارس موصى بها")
+    lines.extend(f"  {statement};" for statement in recommended.values())
+    return "\n".join(lines)
+
+
+def main(argv):
+    path = argv[1] if len(argv) > 1 else WORKLOAD_PATH
+    if not os.path.exists(path):
+        print(f"لا يوجد ملف استعلامات مسجلة: {path}")
+        return 2
+    with open(path, encoding='utf-8') as f:
+        workload = json.load(f)
+    findings, recommended = analyse(workload)
+    print(format_report(findings, recommended))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
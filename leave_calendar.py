@@ -0,0 +1,194 @@
+"""حساب أيام الإجازة المحتسبة حسب أيام عمل الموظف والعطلات الرسمية
+
+الإجازة السنوية والطارئة تُحتسب بأيام العمل فقط: الأيام التي يعمل فيها
+الموظف حسب work_days_mask (work_schedule.py) وليست عطلة رسمية (جدول
+holidays). بقية الأنواع (حج، زواج، وضع، وفاة، مرضية) بأيام التقويم.
+
+لكل نمط أسبوعي (7 بتات: هل يعمل الموظف في كل يوم من السبت إلى الجمعة)
+تُبنى مرة واحدة مصفوفة تراكمية لأيام العمل على كامل المدى المدعوم، فيصبح:
+    أيام العمل في [start, end] = cum[end] - cum[start - 1]
+    تاريخ النهاية لعدد n من أيام العمل = searchsorted(cum, cum[start - 1] + n)
+وكلاهما عملية numpy على مصفوفات كاملة عند إعادة الحساب الجماعي.
+"""
+import numpy as np
+
+from day_numbers import from_day, to_day
+from work_schedule import DAY_NAMES, STATUS_REGULAR
+
+# الأنواع المحتسبة بأيام العمل
+WORKING_DAY_TYPES = {"سنوية", "طارئة"}
+
+# مدى التواريخ المدعوم
+FIRST_DAY = to_day("1990-01-01")
+END_DAY = to_day("2101-01-01")
+
+# يوم الراحة الأسبوعية لمن ليس له جدول أيام عمل (الندب، التفرغ، أو بدون أيام محددة)
+DEFAULT_REST_DAYS = {DAY_NAMES.index("الجمعة")}
+DEFAULT_WEEK_PATTERN = sum(1 << day for day in range(7) if day not in DEFAULT_REST_DAYS)
+
+
+def weekday_index(days):
+    """ترتيب اليوم في الأسبوع بدءاً من السبت (0) لرقم يوم أو مصفوفة أرقام
+
+    1970-01-01 (اليوم 0) كان خميساً وترتيبه 5.
+    """
+    return (days + 5) % 7
+
+
+def week_patterns(work_days_masks, work_statuses):
+    """الأنماط الأسبوعية (7 بتات لكل موظف) من أقنعة أيام العمل ذات الـ 21 بتاً"""
+    masks = np.asarray(work_days_masks, dtype=np.int64)
+    statuses = np.asarray(work_statuses, dtype=np.int64)
+    patterns = np.zeros(len(masks), dtype=np.int64)
+    for day in range(7):
+        patterns |= (((masks >> (day * 3)) & 0b111) != 0).astype(np.int64) << day
+    patterns[(statuses != STATUS_REGULAR) | (masks == 0)] = DEFAULT_WEEK_PATTERN
+    return patterns
+
+
+def week_pattern(work_days_mask, work_status=STATUS_REGULAR):
+    return int(week_patterns([work_days_mask], [work_status])[0])
+
+
+class LeaveCalendar:
+    def __init__(self, db):
+        self.db = db
+        self._holidays_version = None
+        self._holidays = None
+        self._cumulative = {}
+
+    # ---------- العطلات ----------
+
+    def _refresh_holidays(self):
+        """إعادة تحميل العطلات إذا تغير الجدول (فحص رخيص بالعدد وآخر rowid ومجموع الأيام)"""
+        version = tuple(self.db.fetch_one("SELECT COUNT(*), MAX(rowid), TOTAL(day) FROM holidays"))
+        if version == self._holidays_version:
+            return
+        holidays = np.zeros(END_DAY - FIRST_DAY, dtype=bool)
+        days = np.array(
+            [row[0] for row in self.db.fetch_all(
+                "SELECT day FROM holidays WHERE day >= ? AND day < ?", (FIRST_DAY, END_DAY)
+            )],
+            dtype=np.int64
+        )
+        holidays[days - FIRST_DAY] = True
+        self._holidays = holidays
+        self._holidays_version = version
+        self._cumulative.clear()
+
+    def add_holiday(self, date, name):
+        self.db.execute_query(
+            "INSERT OR REPLACE INTO holidays (date, name) VALUES (?, ?)", (date, name)
+        )
+
+    def remove_holiday(self, date):
+        self.db.execute_query("DELETE FROM holidays WHERE date = ?", (date,))
+
+    def holidays_between(self, start, end):
+        return self.db.fetch_all(
+            "SELECT date, name FROM holidays WHERE day BETWEEN ? AND ? ORDER BY day",
+            (to_day(start), to_day(end))
+        )
+
+    # ---------- المصفوفات التراكمية ----------
+
+    def cumulative(self, pattern):
+        """cum[i] = عدد أيام العمل من FIRST_DAY حتى FIRST_DAY + i - 1 (cum[0] = 0)"""
+        self._refresh_holidays()
+        cum = self._cumulative.get(pattern)
+        if cum is None:
+            works = np.array([(pattern >> day) & 1 for day in range(7)], dtype=bool)
+            days = np.arange(FIRST_DAY, END_DAY)
+            working = works[weekday_index(days)] & ~self._holidays
+            cum = np.zeros(len(days) + 1, dtype=np.int32)
+            np.cumsum(working, out=cum[1:])
+            self._cumulative[pattern] = cum
+        return cum
+
+    def employee_pattern(self, employee_id):
+        row = self.db.fetch_one(
+            "SELECT work_days_mask, work_status FROM employees WHERE id = ?", (employee_id,)
+        )
+        return week_pattern(*row) if row else DEFAULT_WEEK_PATTERN
+
+    # ---------- الحساب ----------
+
+    @staticmethod
+    def _check_range(*days):
+        for day in days:
+            if not FIRST_DAY <= day < END_DAY:
+                raise ValueError(f"التاريخ {from_day(day)} خارج المدى المدعوم")
+
+    def working_days(self, employee_id, start, end):
+        """عدد أيام العمل للموظف في [start, end] شاملة الطرفين"""
+        start_day, end_day = to_day(start), to_day(end)
+        if end_day < start_day:
+            return 0
+        self._check_range(start_day, end_day)
+        cum = self.cumulative(self.employee_pattern(employee_id))
+        return int(cum[end_day - FIRST_DAY + 1] - cum[start_day - FIRST_DAY])
+
+    def duration_for(self, employee_id, vacation_type, start, end):
+        """المدة المحتسبة للإجازة حسب نوعها"""
+        if vacation_type in WORKING_DAY_TYPES:
+            return self.working_days(employee_id, start, end)
+        return max(0, to_day(end) - to_day(start) + 1)
+
+    def end_date_for(self, employee_id, vacation_type, start, duration):
+        """تاريخ نهاية إجازة تبدأ في start ومدتها المحتسبة duration"""
+        start_day = to_day(start)
+        if vacation_type not in WORKING_DAY_TYPES:
+            return from_day(start_day + duration - 1)
+        self._check_range(start_day)
+        cum = self.cumulative(self.employee_pattern(employee_id))
+        target = cum[start_day - FIRST_DAY] + duration
+        # أول موضع يصل فيه المجموع التراكمي إلى target هو اليوم التالي لآخر يوم عمل
+        index = int(np.searchsorted(cum, target, side='left'))
+        if index >= len(cum):
+            raise ValueError("تاريخ النهاية خارج المدى المدعوم")
+        return from_day(FIRST_DAY + index - 1)
+
+    def working_days_bulk(self, patterns, start_days, end_days):
+        """أيام العمل لعدة فترات دفعة واحدة (مصفوفات numpy بنفس الطول)"""
+        patterns = np.asarray(patterns)
+        start_days = np.clip(np.asarray(start_days), FIRST_DAY, END_DAY - 1) - FIRST_DAY
+        end_days = np.clip(np.asarray(end_days), FIRST_DAY, END_DAY - 1) - FIRST_DAY
+        result = np.zeros(len(patterns), dtype=np.int64)
+        for pattern in np.unique(patterns):
+            selected = patterns == pattern
+            cum = self.cumulative(int(pattern))
+            result[selected] = cum[end_days[selected] + 1] - cum[start_days[selected]]
+        return np.maximum(result, 0)
+
+    def recalculate_durations(self, apply=False, statuses=("تحت الإجراء",)):
+        """إعادة حساب مدد الإجازات المحتسبة بأيام العمل
+
+        يرجع قائمة (id, المدة الحالية، المدة المحسوبة) للإجازات المختلفة.
+        افتراضياً الطلبات تحت الإجراء فقط، لأن الإجازات الموافق عليها خُصمت
+        من الرصيد بمدتها المسجلة. statuses=None لكل الإجازات.
+        """
+        query = """
+            SELECT v.id, v.duration, v.start_day, v.end_day, e.work_days_mask, e.work_status
+            FROM vacations v JOIN employees e ON e.id = v.employee_id
+            WHERE v.type IN ({types}) AND v.start_day IS NOT NULL AND v.end_day IS NOT NULL
+        """.format(types=", ".join("?" * len(WORKING_DAY_TYPES)))
+        params = list(WORKING_DAY_TYPES)
+        if statuses is not None:
+            query += f" AND v.status IN ({', '.join('?' * len(statuses))})"
+            params += list(statuses)
+        rows = self.db.fetch_all(query, params)
+        if not rows:
+            return []
+        ids, durations, starts, ends, masks, work_statuses = (
+            np.array(column, dtype=np.int64) for column in zip(*rows)
+        )
+        patterns = week_patterns(masks, work_statuses)
+        computed = self.working_days_bulk(patterns, starts, ends)
+        changed = np.flatnonzero(computed != durations)
+        changes = [(int(ids[i]), int(durations[i]), int(computed[i])) for i in changed]
+        if apply and changes:
+            self.db.execute_many(
+                "UPDATE vacations SET duration = ? WHERE id = ?",
+                [(new, vac_id) for vac_id, _, new in changes]
+            )
+        return changes
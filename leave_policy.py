@@ -0,0 +1,106 @@
+"""قواعد مدد الإجازات من جدول leave_policies
+
+القواعد تُحمَّل مرة واحدة في ذاكرة المحرك: قاموس (النوع، الصنف) -> قاعدة
+للطلبات المفردة، ومصفوفات numpy (الحد الأدنى، الأقصى، الثابت) للتقييم
+الجماعي. قبل كل استخدام يُقرأ رقم الإصدار من leave_policy_version (صف
+واحد بالمفتاح الأساسي)، ولا يُعاد التحميل إلا إذا غيّرته المشغلات بعد
+تعديل الجدول. الواجهة والبوت يستخدمان نفس المحرك فلا تتكرر الأرقام في
+الكود.
+
+الصنف (variant) يميز قواعد النوع الواحد: نوع الوضع، درجة الوفاة، أو صلة
+القرابة (زوج). عند البحث تُجرَّب الأصناف المعطاة بالترتيب ثم قاعدة النوع
+العامة ''.
+"""
+import numpy as np
+
+from database import row_type
+
+LeaveRule = row_type('leave_type', 'variant', 'min_days', 'max_days', 'fixed_days')
+
+
+def describe_range(rule):
+    if rule.fixed_days is not None:
+        return f"{rule.fixed_days} يوم"
+    return f"من {rule.min_days} إلى {rule.max_days} يوم"
+
+
+class LeavePolicyEngine:
+    def __init__(self, db):
+        self.db = db
+        self._version = None
+        self._rules = {}
+        self._index = {}
+        self._min_days = self._max_days = self._fixed_days = np.zeros(0, dtype=np.int64)
+
+    def _ensure_loaded(self):
+        version = self.db.fetch_scalar("SELECT version FROM leave_policy_version WHERE id = 1")
+        if version == self._version:
+            return
+        rules = self.db.fetch_all(
+            "SELECT leave_type, variant, min_days, max_days, fixed_days FROM leave_policies",
+            row_type=LeaveRule
+        )
+        self._rules = {(rule.leave_type, rule.variant): rule for rule in rules}
+        self._index = {key: position for position, key in enumerate(self._rules)}
+        values = list(self._rules.values())
+        self._min_days = np.array([rule.min_days for rule in values], dtype=np.int64)
+        self._max_days = np.array([rule.max_days for rule in values], dtype=np.int64)
+        # -1 للمدد غير الثابتة
+        self._fixed_days = np.array(
+            [-1 if rule.fixed_days is None else rule.fixed_days for rule in values], dtype=np.int64
+        )
+        self._version = version
+
+    def _key(self, leave_type, variants):
+        for variant in (*variants, ""):
+            if variant is not None and (leave_type, variant) in self._rules:
+                return leave_type, variant
+        return None
+
+    # ---------- الطلبات المفردة ----------
+
+    def rule(self, leave_type, *variants):
+        """القاعدة المطبقة على النوع والأصناف المعطاة، أو None"""
+        self._ensure_loaded()
+        key = self._key(leave_type, variants)
+        return self._rules[key] if key else None
+
+    def fixed_duration(self, leave_type, *variants):
+        """المدة الثابتة للنوع (حج، زواج، وضع، وفاة) أو None إذا كانت المدة يختارها الموظف"""
+        rule = self.rule(leave_type, *variants)
+        return rule.fixed_days if rule else None
+
+    def validate(self, leave_type, duration, *variants):
+        """رسالة الخطأ إذا كانت المدة مخالفة للقاعدة، أو None"""
+        rule = self.rule(leave_type, *variants)
+        if rule is None:
+            return f"نوع الإجازة غير معروف: {leave_type}"
+        if not rule.min_days <= duration <= rule.max_days:
+            return f"مدة إجازة {leave_type} يجب أن تكون {describe_range(rule)}"
+        return None
+
+    # ---------- التقييم الجماعي ----------
+
+    def evaluate_many(self, leave_types, durations, variants=None):
+        """تقييم عدة طلبات دفعة واحدة
+
+        يرجع (valid, effective): مصفوفتان بطول الطلبات؛ effective هي المدة
+        الثابتة للقاعدة إن وُجدت وإلا المدة المطلوبة. النوع غير المعروف
+        غير صالح.
+        """
+        self._ensure_loaded()
+        durations = np.asarray(durations, dtype=np.int64)
+        if variants is None:
+            variants = [""] * len(durations)
+        # البحث في القاموس لكل زوج مختلف مرة واحدة فقط
+        keys = list(zip(leave_types, variants))
+        lookup = {key: self._index.get(self._key(key[0], (key[1],)), -1) for key in set(keys)}
+        positions = np.fromiter((lookup[key] for key in keys), dtype=np.int64, count=len(keys))
+        known = positions >= 0
+        safe = np.where(known, positions, 0)
+        if len(self._index) == 0:
+            return np.zeros(len(durations), dtype=bool), durations.copy()
+        fixed = self._fixed_days[safe]
+        valid = known & (durations >= self._min_days[safe]) & (durations <= self._max_days[safe])
+        effective = np.where(known & (fixed >= 0), fixed, durations)
+        return valid, effective
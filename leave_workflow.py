@@ -0,0 +1,120 @@
+"""انتقالات حالة طلب الإجازة: الموافقة والرفض والإلغاء
+
+الواجهة الرسومية (VacationsTab و ApprovalTab) والبوت يستدعون نفس الخدمة،
+فتُطبَّق نفس القواعد في كل مكان:
+
+    رئيس القسم: dept_approval تحت الإجراء -> موافق / مرفوض
+    المدير:     status تحت الإجراء (بعد موافقة القسم) -> موافق / مرفوض
+                والموافقة تخصم المدة من الرصيد
+    الإلغاء:    طلب تحت الإجراء أو موافق عليه لم يُرفض -> ملغاة
+                ويُسترجع الرصيد فقط إذا كان قد خُصم (status موافق)
+
+كل انتقال وحدة كتابة واحدة (execute_unit): قيد الرصيد ثم تحديث الحالة،
+وكلاهما مشروط بالحالة السابقة في جملة WHERE نفسها. إذا تغيرت الحالة قبل
+التنفيذ (موافقة مزدوجة، أو إلغاء من البوت أثناء الموافقة في الواجهة) لا
+يتغير شيء ويُرفع LeaveWorkflowError. نصوص الاستعلامات ثابتة فيعيد
+sqlite3 استخدام الجمل المُعدّة (prepared statements) من ذاكرته.
+
+version (اختياري) هو إصدار الصف كما عرضته الواجهة؛ إذا تغيّر الصف بعد
+عرضه يُرفع ConcurrentUpdateError بدل تطبيق الانتقال على بيانات لم يرها
+المستخدم.
+"""
+from balance_ledger import REASON_APPROVAL, REASON_CANCELLATION, vacation_entry
+from database import ConcurrentUpdateError
+
+PENDING = "تحت الإجراء"
+APPROVED = "موافق"
+REJECTED = "مرفوض"
+CANCELLED = "ملغاة"
+
+ROLE_DEPARTMENT_HEAD = "department_head"
+ROLE_MANAGER = "manager"
+
+# شرط الحالة السابقة لكل انتقال، على عمودي vacations بالبادئة v.
+_DEPARTMENT_PENDING = f"v.status = '{PENDING}' AND v.dept_approval = '{PENDING}'"
+_MANAGER_PENDING = f"v.status = '{PENDING}' AND v.dept_approval = '{APPROVED}'"
+_CANCELLABLE = (
+    f"v.status IN ('{PENDING}', '{APPROVED}') "
+    f"AND v.dept_approval NOT IN ('{REJECTED}', '{CANCELLED}')"
+)
+
+
+class LeaveWorkflowError(Exception):
+    """انتقال غير مسموح من حالة الطلب الحالية"""
+
+
+class LeaveWorkflowService:
+    def __init__(self, db):
+        self.db = db
+
+    def approve(self, vacation_id, role, actor=None, version=None):
+        if role == ROLE_DEPARTMENT_HEAD:
+            return self._transition("الموافقة على", vacation_id, version, _DEPARTMENT_PENDING, (
+                "dept_approval = ?, dept_approver = COALESCE(?, dept_approver)", (APPROVED, actor)
+            ))
+        # الخصم مشروط بنفس حالة الانتقال فلا يُخصم مرتين
+        return self._transition("الموافقة على", vacation_id, version, _MANAGER_PENDING, (
+            "status = ?, approved_by = COALESCE(?, approved_by)", (APPROVED, actor)
+        ), entry=(-1, REASON_APPROVAL, ""))
+
+    def reject(self, vacation_id, role, actor=None, version=None):
+        if role == ROLE_DEPARTMENT_HEAD:
+            return self._transition("رفض", vacation_id, version, _DEPARTMENT_PENDING, (
+                "dept_approval = ?, dept_approver = COALESCE(?, dept_approver)", (REJECTED, actor)
+            ))
+        return self._transition("رفض", vacation_id, version, _MANAGER_PENDING, (
+            "status = ?, approved_by = COALESCE(?, approved_by)", (REJECTED, actor)
+        ))
+
+    def cancel(self, vacation_id, employee_id=None, version=None):
+        """إلغاء الطلب؛ employee_id يقصر الإلغاء على صاحب الطلب (البوت)"""
+        condition, params = _CANCELLABLE, ()
+        if employee_id is not None:
+            condition, params = f"{condition} AND v.employee_id = ?", (employee_id,)
+        # الاسترجاع فقط لما خُصم فعلاً
+        return self._transition("إلغاء", vacation_id, version, condition, (
+            "status = ?, dept_approval = ?", (CANCELLED, CANCELLED)
+        ), entry=(1, REASON_CANCELLATION, f"AND v.status = '{APPROVED}'"), params=params,
+            employee_id=employee_id)
+
+    def _transition(self, action, vacation_id, version, condition, assignment, entry=None,
+                    params=(), employee_id=None):
+        if version is not None:
+            condition, params = f"{condition} AND v.version = ?", (*params, version)
+        statements = []
+        if entry is not None:
+            # قيد الرصيد مشروط بنفس شرط الانتقال
+            sign, reason, extra = entry
+            statements.append(
+                vacation_entry(vacation_id, sign, reason, f"AND {condition} {extra}", params)
+            )
+        assignments, values = assignment
+        statements.append((
+            f"UPDATE vacations AS v SET {assignments}, version = version + 1 "
+            f"WHERE v.id = ? AND {condition}",
+            (*values, vacation_id, *params)
+        ))
+        result = self.db.execute_unit(statements)
+        # None: داخل معاملة مع خدمة الكتابة، والشرط في WHERE يحمي الحالة
+        if result is not None and result.rowcount == 0:
+            self._raise_rejection(action, vacation_id, version, employee_id)
+        return True
+
+    def _raise_rejection(self, action, vacation_id, version, employee_id=None):
+        row = self.db.fetch_one(
+            "SELECT status, dept_approval, version FROM vacations "
+            "WHERE id = ? AND employee_id = COALESCE(?, employee_id)",
+            (vacation_id, employee_id)
+        )
+        if row is None:
+            raise LeaveWorkflowError("تعذر العثور على الإجازة.")
+        status, dept_approval, current_version = row
+        if version is not None and current_version != version:
+            raise ConcurrentUpdateError(
+                f"تم تعديل هذه الإجازة من مكان آخر (الحالة الآن: {status}، "
+                f"موافقة القسم: {dept_approval}). أعد التحميل وحاول مرة أخرى."
+            )
+        raise LeaveWorkflowError(
+            f"لا يمكن {action} هذه الإجازة في حالتها الحالية "
+            f"(الحالة: {status}، موافقة القسم: {dept_approval})."
+        )
@@ -1,29 +1,37 @@
 from multiprocessing import Process
-from database import DatabaseManager
+from database import DatabaseManager, DB_PATH
+from write_service import GroupCommitWriter
 from telegram_bot import EmployeeQueryBot
 from main_window import MainWindow
 from PyQt6.QtWidgets import QApplication
 import sys
 
-def run_bot():
-    db = DatabaseManager()
+def run_bot(write_client):
+    db = DatabaseManager(write_client=write_client)
     # استخدم التوكن الخاص بك هنا أو من ملف إعدادات
     bot = EmployeeQueryBot("7798615366:AAGhr928M-PZ19usrx6yr2nG0mLBXvP3r0E", db)
     bot.run()
 
-def run_gui():
+def run_gui(write_client):
     app = QApplication(sys.argv)
-    db = DatabaseManager()
+    db = DatabaseManager(write_client=write_client)
     window = MainWindow(db)
     window.show()
-    sys.exit(app.exec())
+    return app.exec()
 
 if __name__ == "__main__":
+    # خيط كتابة واحد يجمع كتابات الواجهة والبوت في تثبيتات جماعية
+    writer = GroupCommitWriter(DB_PATH)
+    gui_client = writer.register_client()
+    bot_client = writer.register_client()
+    writer.start()
     # شغل البوت في عملية منفصلة
-    bot_process = Process(target=run_bot)
+    bot_process = Process(target=run_bot, args=(bot_client,))
     bot_process.start()
     # شغل الواجهة الرسومية في العملية الرئيسية
-    run_gui()
+    exit_code = run_gui(gui_client)
     # عندما تغلق الواجهة، تأكد من إغلاق البوت أيضًا
     bot_process.terminate()
-    bot_process.join()
\ No newline at end of file
+    bot_process.join()
+    writer.stop()
+    sys.exit(exit_code)
\ No newline at end of file
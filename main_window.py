@@ -2,13 +2,18 @@ from PyQt6.QtWidgets import (
     QMainWindow, QTabWidget, QStatusBar, QLabel, QVBoxLayout,
     QWidget, QMessageBox
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer
 from tabs.employee_view import EmployeeViewTab
 from tabs.employee_management import EmployeeManagementTab
 from tabs.vacations import VacationsTab
 from tabs.absences import AbsencesTab
 from tabs.import_export import ImportExportTab
 from tabs.approval_tab import ApprovalTab
+from balance_ledger import BalanceLedger
+from annual_reset import run_rollover
+
+# فحص التجديد السنوي للأرصدة مرة يومياً لمن يترك البرنامج مفتوحاً
+ROLLOVER_CHECK_MS = 24 * 60 * 60 * 1000
 
 class MainWindow(QMainWindow):
     def __init__(self, db_manager, user_role="manager"):
@@ -19,6 +24,10 @@ class MainWindow(QMainWindow):
         self.setup_notifications()
         self.load_initial_data()
         self.setup_connections()
+        self.periodic_backup = self.db.start_periodic_backup()
+        self.rollover_timer = QTimer(self)
+        self.rollover_timer.timeout.connect(self.apply_annual_rollover)
+        self.rollover_timer.start(ROLLOVER_CHECK_MS)
 
     def setup_ui(self):
         """تهيئة الواجهة الرئيسية"""
@@ -90,10 +99,9 @@ class MainWindow(QMainWindow):
         """تحديث الإشعارات"""
         try:
             # تم تعديل الاستعلام ليظهر فقط الطلبات التي وافق عليها رئيس القسم
-            self.db.execute_query("""
+            count = self.db.fetch_scalar("""
                 SELECT COUNT(*) FROM vacations WHERE status='تحت الإجراء' AND dept_approval='موافق'
-            """, commit=False)
-            count = self.db.cursor.fetchone()[0]
+            """, default=0)
         
             if count > 0:
                 self.notification_bar.setText(f"لديك {count} طلبات إجازة بانتظار موافقة المدير")
@@ -115,9 +123,23 @@ class MainWindow(QMainWindow):
             self.check_pending_requests()
             if hasattr(self, "approval_tab"):
                 self.approval_tab.load_pending_vacations()
+            self.apply_annual_rollover()
+            # لقطة الأرصدة الشهرية إذا لم تؤخذ بعد
+            BalanceLedger(self.db).ensure_snapshots()
         except Exception as e:
             self.show_error_message(f"خطأ في تحميل البيانات الأولية: {str(e)}")
 
+    def apply_annual_rollover(self):
+        """تطبيق التجديد السنوي للأرصدة إذا فاتت سنة أو أكثر"""
+        try:
+            years = run_rollover(self.db)
+            if years:
+                self.status_bar.showMessage(
+                    "تم تجديد أرصدة الإجازات للسنة: " + "، ".join(map(str, years))
+                )
+        except Exception as e:
+            self.show_error_message(f"خطأ في التجديد السنوي للأرصدة: {str(e)}")
+
     def on_tab_changed(self, index):
         """معالجة تغيير التبويب"""
         current_tab = self.tabs.widget(index)
@@ -129,11 +151,10 @@ class MainWindow(QMainWindow):
         """التحقق من طلبات الإجازة المعلقة عند بدء التشغيل"""
         try:
             # يشمل فقط ما بعد موافقة رئيس القسم
-            self.db.execute_query(
+            count = self.db.fetch_scalar(
                 "SELECT COUNT(*) FROM vacations WHERE status='تحت الإجراء' AND dept_approval='موافق'",
-                commit=False
+                default=0
             )
-            count = self.db.cursor.fetchone()[0]
             if count > 0:
                 self.show_notification(f"لديك {count} طلبات إجازة بانتظار موافقة المدير")
         except Exception as e:
@@ -159,5 +180,8 @@ class MainWindow(QMainWindow):
 
     def closeEvent(self, event):
         """معالجة حدث إغلاق النافذة"""
+        # النسخة تكتمل في الخلفية بعد اختفاء النافذة
+        self.periodic_backup.stop()
         self.db.create_backup()
+        self.db.dump_query_profile()
         super().closeEvent(event)
\ No newline at end of file
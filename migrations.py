@@ -0,0 +1,434 @@
+"""ترحيلات مخطط قاعدة البيانات
+
+رقم إصدار المخطط محفوظ في PRAGMA user_version. كل ترحيل خطوة مرقمة
+تُطبَّق مرة واحدة فقط وبالترتيب، فيصبح بدء التشغيل مجرد قراءة لرقم
+الإصدار عندما يكون المخطط محدثاً.
+
+لإضافة تعديل على المخطط: اكتب دالة جديدة تستقبل الاتصال وأضفها في
+آخر MIGRATIONS برقم أكبر من آخر رقم. لا تعدّل ترحيلاً سبق نشره.
+"""
+from day_numbers import DAY_SQL
+import work_schedule
+
+
+def _column_exists(conn, table, column):
+    # table_xinfo تشمل الأعمدة المولّدة أيضاً
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_xinfo({table})"))
+
+
+def _baseline_schema(conn):
+    """المخطط الأساسي: الجداول والأقسام الافتراضية والفهارس"""
+    tables = [
+        """CREATE TABLE IF NOT EXISTS employees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            serial_number TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            national_id TEXT UNIQUE NOT NULL,
+            department TEXT,
+            job_grade TEXT,
+            hiring_date TEXT,
+            grade_date TEXT,
+            bonus INTEGER DEFAULT 0,
+            vacation_balance INTEGER DEFAULT 30,
+            emergency_vacation_balance INTEGER DEFAULT 12,
+            work_days TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS departments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            head_id INTEGER,
+            head_password TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )""",
+        """CREATE TABLE IF NOT EXISTS vacations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            subtype TEXT,
+            relation TEXT,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            duration INTEGER NOT NULL,
+            notes TEXT,
+            status TEXT DEFAULT 'تحت الإجراء',
+            dept_approval TEXT DEFAULT 'تحت الإجراء',
+            dept_approver TEXT,
+            approved_by TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
+        )""",
+        """CREATE TABLE IF NOT EXISTS absences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            type TEXT NOT NULL,
+            duration INTEGER DEFAULT 1,
+            notes TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE,
+            UNIQUE(employee_id, date)
+        )""",
+        """CREATE TABLE IF NOT EXISTS audit_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            action TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            record_id INTEGER,
+            changes TEXT,
+            user TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )"""
+    ]
+    for table in tables:
+        conn.execute(table)
+
+    # قواعد بيانات قديمة أُنشئت قبل إضافة الرصيد الطارئ
+    if not _column_exists(conn, 'employees', 'emergency_vacation_balance'):
+        conn.execute("ALTER TABLE employees ADD COLUMN emergency_vacation_balance INTEGER DEFAULT 12")
+
+    # إضافة أقسام افتراضية (حسب ما لديك)
+    default_depts = ['الإدارة', 'التمريض', 'المحاسبة', 'المختبر', 'الصيدلة']
+    conn.executemany(
+        "INSERT OR IGNORE INTO departments (name) VALUES (?)",
+        [(dept,) for dept in default_depts]
+    )
+
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_emp_national_id ON employees(national_id)",
+        "CREATE INDEX IF NOT EXISTS idx_emp_department ON employees(department)",
+        "CREATE INDEX IF NOT EXISTS idx_vacations_employee ON vacations(employee_id)",
+        "CREATE INDEX IF NOT EXISTS idx_vacations_date ON vacations(start_date, end_date)",
+        "CREATE INDEX IF NOT EXISTS idx_absences_employee_date ON absences(employee_id, date)"
+    ]
+    for index in indexes:
+        conn.execute(index)
+
+
+def _workload_indexes(conn):
+    """فهارس اقترحها index_advisor.py من الاستعلامات المسجلة
+
+    - طابور الموافقات: فهرس جزئي على الطلبات تحت الإجراء فقط بترتيب العرض
+    - عداد الإشعارات: (status, dept_approval) شامل لـ COUNT
+    - سجل إجازات الموظف في البوت: (employee_id, start_date DESC) بدل
+      idx_vacations_employee الذي أصبح جزءاً منه
+    - سجل التدقيق لسجل معين
+    """
+    indexes = [
+        """CREATE INDEX IF NOT EXISTS idx_vacations_pending ON vacations(start_date DESC)
+           WHERE status = 'تحت الإجراء' OR dept_approval = 'تحت الإجراء'""",
+        "CREATE INDEX IF NOT EXISTS idx_vacations_status ON vacations(status, dept_approval)",
+        "CREATE INDEX IF NOT EXISTS idx_vacations_employee_start ON vacations(employee_id, start_date DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_audit_log_record ON audit_log(table_name, record_id, created_at)",
+    ]
+    for index in indexes:
+        conn.execute(index)
+    conn.execute("DROP INDEX IF EXISTS idx_vacations_employee")
+
+
+def _day_number_columns(conn):
+    """أعمدة مولّدة برقم اليوم (day_numbers.DAY_SQL) وفهارسها لفلاتر المدى
+
+    VIRTUAL: لا تأخذ مساحة في الجدول، وقيمها مخزنة في الفهارس فقط.
+    """
+    columns = [
+        ('absences', 'day', 'date'),
+        ('vacations', 'start_day', 'start_date'),
+        ('vacations', 'end_day', 'end_date'),
+    ]
+    for table, column, source in columns:
+        if not _column_exists(conn, table, column):
+            expression = DAY_SQL.format(column=source)
+            conn.execute(
+                f"ALTER TABLE {table} ADD COLUMN {column} INTEGER "
+                f"GENERATED ALWAYS AS ({expression}) VIRTUAL"
+            )
+    indexes = [
+        "CREATE INDEX IF NOT EXISTS idx_absences_day ON absences(day)",
+        "CREATE INDEX IF NOT EXISTS idx_absences_employee_day ON absences(employee_id, day)",
+        "CREATE INDEX IF NOT EXISTS idx_vacations_employee_days ON vacations(employee_id, start_day, end_day)",
+    ]
+    for index in indexes:
+        conn.execute(index)
+
+
+def _vacation_interval_index(conn):
+    """فهرس R*Tree لفترات الإجازات النشطة (overlap_index.py)
+
+    كل إجازة نشطة صندوق (الموظف × [start_day, end_day]). المشغلات تُبقي
+    الفهرس متزامناً مع جدول vacations عند الإضافة والتعديل والحذف.
+    """
+    active = (
+        "{row}.status NOT IN ('مرفوض', 'ملغاة') "
+        "AND {row}.dept_approval NOT IN ('مرفوض', 'ملغاة') "
+        "AND {row}.end_day >= {row}.start_day"
+    )
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS vacation_intervals USING rtree_i32("
+        "id, min_employee, max_employee, start_day, end_day)"
+    )
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_vacation_intervals_insert
+        AFTER INSERT ON vacations WHEN {active.format(row='NEW')}
+        BEGIN
+            INSERT INTO vacation_intervals
+            VALUES (NEW.id, NEW.employee_id, NEW.employee_id, NEW.start_day, NEW.end_day);
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_vacation_intervals_update
+        AFTER UPDATE OF employee_id, start_date, end_date, status, dept_approval ON vacations
+        BEGIN
+            DELETE FROM vacation_intervals WHERE id = OLD.id;
+            INSERT INTO vacation_intervals
+            SELECT NEW.id, NEW.employee_id, NEW.employee_id, NEW.start_day, NEW.end_day
+            WHERE {active.format(row='NEW')};
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_vacation_intervals_delete
+        AFTER DELETE ON vacations
+        BEGIN
+            DELETE FROM vacation_intervals WHERE id = OLD.id;
+        END
+    """)
+    conn.execute("DELETE FROM vacation_intervals")
+    conn.execute(f"""
+        INSERT INTO vacation_intervals
+        SELECT id, employee_id, employee_id, start_day, end_day
+        FROM vacations v WHERE {active.format(row='v')}
+    """)
+
+
+def _department_min_staff(conn):
+    """الحد الأدنى لعدد الحاضرين في القسم (staffing_coverage.py)، NULL = بدون حد"""
+    if not _column_exists(conn, 'departments', 'min_staff'):
+        conn.execute("ALTER TABLE departments ADD COLUMN min_staff INTEGER")
+
+
+def _work_days_mask(conn):
+    """قناع أيام العمل ورمز الحالة بجانب نص work_days (work_schedule.py)"""
+    if not _column_exists(conn, 'employees', 'work_days_mask'):
+        conn.execute("ALTER TABLE employees ADD COLUMN work_days_mask INTEGER NOT NULL DEFAULT 0")
+    if not _column_exists(conn, 'employees', 'work_status'):
+        conn.execute("ALTER TABLE employees ADD COLUMN work_status INTEGER NOT NULL DEFAULT 0")
+    rows = conn.execute("SELECT id, work_days FROM employees").fetchall()
+    conn.executemany(
+        "UPDATE employees SET work_days_mask = ?, work_status = ? WHERE id = ?",
+        [(*work_schedule.encode(work_days), emp_id) for emp_id, work_days in rows]
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_emp_work_schedule "
+        "ON employees(department, work_status, work_days_mask)"
+    )
+
+
+def _holidays(conn):
+    """العطلات الرسمية (leave_calendar.py)"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS holidays (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            day INTEGER GENERATED ALWAYS AS ({DAY_SQL.format(column='date')}) VIRTUAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_holidays_day ON holidays(day)")
+
+
+def _balance_ledger(conn):
+    """سجل حركات الأرصدة ولقطاتها (balance_ledger.py)
+
+    القيد الافتتاحي يسجّل الرصيد الموجود بتاريخ إضافة الموظف فلا يُطبَّق على
+    العمود، وكل قيد آخر يُطبَّق بالمشغّل في نفس المعاملة.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS balance_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER NOT NULL,
+            balance_type TEXT NOT NULL CHECK (balance_type IN ('سنوية', 'طارئة')),
+            delta INTEGER NOT NULL,
+            balance_after INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            vacation_id INTEGER,
+            entry_date TEXT NOT NULL,
+            note TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            entry_day INTEGER GENERATED ALWAYS AS ({DAY_SQL.format(column='entry_date')}) VIRTUAL,
+            FOREIGN KEY (employee_id) REFERENCES employees(id)
+        )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_balance_ledger_employee "
+        "ON balance_ledger(employee_id, balance_type, entry_day)"
+    )
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS balance_snapshots (
+            employee_id INTEGER NOT NULL,
+            balance_type TEXT NOT NULL,
+            snapshot_day INTEGER NOT NULL,
+            balance INTEGER NOT NULL,
+            PRIMARY KEY (employee_id, balance_type, snapshot_day)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_balance_ledger_apply
+        AFTER INSERT ON balance_ledger WHEN NEW.reason != 'رصيد افتتاحي'
+        BEGIN
+            UPDATE employees SET vacation_balance = COALESCE(vacation_balance, 0) + NEW.delta
+            WHERE id = NEW.employee_id AND NEW.balance_type = 'سنوية';
+            UPDATE employees SET emergency_vacation_balance = COALESCE(emergency_vacation_balance, 0) + NEW.delta
+            WHERE id = NEW.employee_id AND NEW.balance_type = 'طارئة';
+            UPDATE balance_snapshots SET balance = balance + NEW.delta
+            WHERE employee_id = NEW.employee_id AND balance_type = NEW.balance_type
+            AND snapshot_day >= NEW.entry_day;
+        END
+    """)
+    opening = """
+        INSERT INTO balance_ledger (employee_id, balance_type, delta, balance_after, reason, entry_date)
+        SELECT {row}.id, '{balance_type}', COALESCE({row}.{column}, 0), COALESCE({row}.{column}, 0),
+               'رصيد افتتاحي', COALESCE(date({row}.created_at), date('now', 'localtime'))
+        {source}
+    """
+    balances = [("سنوية", "vacation_balance"), ("طارئة", "emergency_vacation_balance")]
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_employees_opening_balance
+        AFTER INSERT ON employees
+        BEGIN
+            {entries}
+        END
+    """.format(entries="".join(
+        opening.format(row='NEW', balance_type=balance_type, column=column, source="") + ";"
+        for balance_type, column in balances
+    )))
+    for balance_type, column in balances:
+        conn.execute(opening.format(
+            row='e', balance_type=balance_type, column=column, source="FROM employees e"
+        ))
+
+
+def _balance_rollovers(conn):
+    """السنوات التي طُبّق فيها التجديد السنوي للأرصدة (annual_reset.py)"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS balance_rollovers (
+            year INTEGER PRIMARY KEY,
+            employees INTEGER NOT NULL,
+            processed_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _leave_policies(conn):
+    """قواعد مدد الإجازات (leave_policy.py)
+
+    variant يميز القواعد داخل النوع الواحد (نوع الوضع، درجة الوفاة، صلة
+    القرابة)، و'' هي قاعدة النوع العامة. fixed_days للمدد الثابتة. كل
+    تعديل على الجدول يزيد leave_policy_version فيعرف المحرك أن يعيد التحميل.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS leave_policies (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            leave_type TEXT NOT NULL,
+            variant TEXT NOT NULL DEFAULT '',
+            min_days INTEGER NOT NULL,
+            max_days INTEGER NOT NULL,
+            fixed_days INTEGER,
+            UNIQUE (leave_type, variant),
+            CHECK (min_days <= max_days)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS leave_policy_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO leave_policy_version (id, version) VALUES (1, 1)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_leave_policies_{event.lower()}
+            AFTER {event} ON leave_policies
+            BEGIN
+                UPDATE leave_policy_version SET version = version + 1 WHERE id = 1;
+            END
+        """)
+    conn.executemany(
+        "INSERT OR IGNORE INTO leave_policies (leave_type, variant, min_days, max_days, fixed_days) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [
+            ("سنوية", "", 1, 90, None),
+            ("طارئة", "", 1, 3, None),
+            ("مرضية", "", 1, 30, None),
+            ("حج", "", 20, 20, 20),
+            ("زواج", "", 14, 14, 14),
+            ("وضع", "وضع عادي", 98, 98, 98),
+            ("وضع", "وضع توأم", 112, 112, 112),
+            ("وفاة", "وفاة من الدرجة الأولى", 7, 7, 7),
+            ("وفاة", "وفاة من الدرجة الثانية", 3, 3, 3),
+            ("وفاة", "زوج", 130, 130, 130),
+        ]
+    )
+
+
+def _row_versions(conn):
+    """عمود version للتعديل المتفائل (DatabaseManager.compare_and_swap)
+
+    المشغّل يزيد الإصدار مع أي تعديل لم يزده بنفسه (الاستعلامات القديمة
+    ومشغلات سجل الأرصدة)، فيكتشف compare_and_swap كل تعديل لاحق للقراءة.
+    """
+    for table in ("vacations", "employees"):
+        if not _column_exists(conn, table, "version"):
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_version
+            AFTER UPDATE ON {table} WHEN NEW.version = OLD.version
+            BEGIN
+                UPDATE {table} SET version = OLD.version + 1 WHERE id = NEW.id;
+            END
+        """)
+
+
+# (رقم الإصدار، الوصف، الدالة) بترتيب تصاعدي
+MIGRATIONS = [
+    (1, "المخطط الأساسي", _baseline_schema),
+    (2, "فهارس طابور الموافقات وسجل الإجازات والتدقيق", _workload_indexes),
+    (3, "أعمدة رقم اليوم لفلاتر التواريخ", _day_number_columns),
+    (4, "فهرس فترات الإجازات النشطة", _vacation_interval_index),
+    (5, "الحد الأدنى للموظفين في القسم", _department_min_staff),
+    (6, "قناع أيام العمل", _work_days_mask),
+    (7, "جدول العطلات الرسمية", _holidays),
+    (8, "سجل حركات أرصدة الإجازات", _balance_ledger),
+    (9, "سنوات التجديد السنوي للأرصدة", _balance_rollovers),
+    (10, "جدول قواعد مدد الإجازات", _leave_policies),
+    (11, "إصدار الصفوف للتعديل المتفائل", _row_versions),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """تطبيق الترحيلات الناقصة حتى الإصدار target في معاملة واحدة
+
+    يرجع رقم الإصدار بعد التطبيق.
+    """
+    if schema_version(conn) >= target:
+        return schema_version(conn)
+    # IMMEDIATE يمنع عمليتين (الواجهة والبوت) من تطبيق نفس الترحيل معاً
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # إعادة الفحص بعد الحصول على القفل فقد تكون عملية أخرى سبقتنا
+        version = schema_version(conn)
+        for number, description, step in MIGRATIONS:
+            if version < number <= target:
+                step(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+                version = number
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
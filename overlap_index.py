@@ -0,0 +1,55 @@
+"""كشف تداخل الإجازات عبر فهرس R*Tree
+
+الجدول الافتراضي vacation_intervals (الترحيل 4) يحوي صندوقاً لكل إجازة
+نشطة: (الموظف، الموظف) × (start_day، end_day) بأرقام الأيام. الإجازة
+النشطة هي التي لم تُرفض ولم تُلغَ، وتُحدّث المشغلات الفهرس تلقائياً.
+البحث عن التداخل استعلام صندوق على الشجرة فلا يمر على كل إجازات الموظف.
+
+فترتان [a, b] و [c, d] تتداخلان إذا كان a <= d و c <= b.
+"""
+from day_numbers import to_day
+from database import row_type
+
+Overlap = row_type('id', 'employee_id', 'type', 'start_date', 'end_date', 'status')
+
+
+class VacationOverlapIndex:
+    def __init__(self, db):
+        self.db = db
+
+    def has_overlap(self, employee_id, start, end, exclude_id=None):
+        """هل تتداخل الفترة [start, end] مع أي إجازة نشطة للموظف؟"""
+        return self.db.fetch_one("""
+            SELECT 1 FROM vacation_intervals
+            WHERE min_employee <= ? AND max_employee >= ?
+            AND start_day <= ? AND end_day >= ?
+            AND id != ?
+            LIMIT 1
+        """, (employee_id, employee_id, to_day(end), to_day(start), exclude_id or 0)) is not None
+
+    def employee_overlaps(self, employee_id, start, end, exclude_id=None):
+        """الإجازات النشطة للموظف المتداخلة مع الفترة"""
+        return self.overlaps(start, end, [employee_id], exclude_id)
+
+    def overlaps(self, start, end, employee_ids=None, exclude_id=None):
+        """كل الإجازات النشطة المتداخلة مع الفترة (لموظفين محددين اختيارياً)"""
+        params = [to_day(end), to_day(start), exclude_id or 0]
+        employee_filter = ""
+        if employee_ids is not None:
+            employee_ids = list(employee_ids)
+            if not employee_ids:
+                return []
+            # حدود الصندوق تقلّص البحث، والتصفية الدقيقة بعد ذلك
+            employee_filter = "AND r.max_employee >= ? AND r.min_employee <= ?"
+            params += [min(employee_ids), max(employee_ids)]
+        rows = self.db.fetch_all(f"""
+            SELECT v.id, v.employee_id, v.type, v.start_date, v.end_date, v.status
+            FROM vacation_intervals r JOIN vacations v ON v.id = r.id
+            WHERE r.start_day <= ? AND r.end_day >= ? AND r.id != ?
+            {employee_filter}
+            ORDER BY v.start_date
+        """, params, row_type=Overlap)
+        if employee_ids is not None and len(employee_ids) > 1:
+            wanted = set(employee_ids)
+            rows = [row for row in rows if row.employee_id in wanted]
+        return rows
@@ -0,0 +1,217 @@
+"""قياس زمن الاستعلامات وسجل الاستعلامات البطيئة
+
+كل استعلام يمر عبر DatabaseManager يُقاس زمنه ويُجمَّع حسب "شكله"
+(نص الاستعلام بعد استبدال القيم الحرفية بـ ? وتوحيد المسافات)، مع
+عداد ومجموع وأقصى زمن ومدرج تكراري (histogram) للأزمنة.
+
+الاستعلامات التي تتجاوز SLOW_QUERY_MS تُسجَّل في slow_queries.log مع
+ناتج EXPLAIN QUERY PLAN. عينة من كل شكل تُحفظ في query_workload.json
+لإعادة تشغيلها لاحقاً (index_advisor.py).
+
+قيم المعاملات لا تُكتب على القرص: السجل وملف العينات يحفظان شكل الاستعلام
+وأنواع معاملاته وعددها فقط. حفظ القيم اختياري (capture_params) لإعادة
+التشغيل بقيم حقيقية، وحتى عندها تُمحى قيم الاستعلامات التي تمس أعمدة
+حساسة (SENSITIVE_COLUMNS) مثل كلمات مرور رؤساء الأقسام والأرقام الوطنية.
+"""
+import json
+import logging
+import os
+import re
+import threading
+
+from database import DB_PATH
+
+LOG_DIR = os.path.dirname(DB_PATH)
+REPORT_PATH = os.path.join(LOG_DIR, 'query_profile.txt')
+WORKLOAD_PATH = os.path.join(LOG_DIR, 'query_workload.json')
+SLOW_LOG_PATH = os.path.join(LOG_DIR, 'slow_queries.log')
+
+# الحد الذي يُعتبر بعده الاستعلام بطيئاً (بالملي ثانية)
+SLOW_QUERY_MS = 100
+
+# حدود خانات المدرج التكراري (بالملي ثانية)؛ الخانة الأخيرة لما فوق آخر حد
+HISTOGRAM_BOUNDS_MS = (1, 5, 10, 50, 100, 500, 1000)
+
+# حفظ قيم المعاملات في ملف العينات (معطل افتراضياً)
+CAPTURE_PARAMS = False
+
+# الاستعلام الذي يذكر أحد هذه الأعمدة تُمحى كل قيم معاملاته قبل حفظها
+SENSITIVE_COLUMNS = ('head_password', 'national_id', 'password')
+_SENSITIVE = re.compile(rf"\b(?:{'|'.join(SENSITIVE_COLUMNS)})\b", re.I)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+slow_logger = logging.getLogger("slow_queries")
+
+
+def statement_shape(query):
+    """توحيد نص الاستعلام بحيث تتجمع الاستعلامات المتشابهة تحت مفتاح واحد"""
+    shape = _STRING_LITERAL.sub("?", query)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    shape = _IN_LIST.sub("(?...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+
+def param_types(params):
+    """أسماء أنواع المعاملات (int، str، ...) بدل قيمها"""
+    return [type(value).__name__ for value in params]
+
+
+def redact_params(query, params):
+    """قيم المعاملات بعد محو قيم الاستعلامات التي تمس أعمدة حساسة"""
+    if _SENSITIVE.search(query):
+        return [None] * len(params)
+    return list(params)
+
+
+class QueryStats:
+    __slots__ = (
+        'count', 'total_ms', 'max_ms', 'slow_count', 'buckets',
+        'sample_query', 'sample_types', 'sample_params',
+        'saved_count', 'saved_ms',
+    )
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow_count = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.sample_query = None
+        self.sample_types = None
+        # None ما لم يكن capture_params مفعلاً
+        self.sample_params = None
+        # ما أُضيف إلى ملف العينات في آخر حفظ (save_workload يضيف الفرق فقط)
+        self.saved_count = 0
+        self.saved_ms = 0.0
+
+    def add(self, elapsed_ms):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if elapsed_ms <= bound:
+                self.buckets[index] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+
+class QueryProfiler:
+    def __init__(self, slow_ms=SLOW_QUERY_MS, capture_params=CAPTURE_PARAMS):
+        self.slow_ms = slow_ms
+        self.capture_params = capture_params
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._stats = {}
+        if not slow_logger.handlers:
+            handler = logging.FileHandler(SLOW_LOG_PATH, encoding='utf-8', delay=True)
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+            slow_logger.addHandler(handler)
+            slow_logger.setLevel(logging.WARNING)
+
+    def record(self, query, params, elapsed_ms, explain=None):
+        """تسجيل تنفيذ استعلام؛ explain دالة ترجع صفوف EXPLAIN QUERY PLAN عند الحاجة"""
+        if not self.enabled:
+            return
+        shape = statement_shape(query)
+        with self._lock:
+            stats = self._stats.get(shape)
+            if stats is None:
+                stats = self._stats[shape] = QueryStats()
+                stats.sample_query = query
+                stats.sample_types = param_types(params)
+                if self.capture_params:
+                    stats.sample_params = redact_params(query, params)
+            stats.add(elapsed_ms)
+            is_slow = elapsed_ms >= self.slow_ms
+            if is_slow:
+                stats.slow_count += 1
+        if is_slow:
+            plan = ""
+            if explain is not None:
+                try:
+                    plan = "\n".join(f"    {row[-1]}" for row in explain())
+                except Exception as e:
+                    plan = f"    (تعذر الحصول على الخطة: {e})"
+            slow_logger.warning(
+                "استعلام بطيء (%.1f ms): %s\nأنواع المعاملات: %s\n%s",
+                elapsed_ms, shape, ", ".join(param_types(params)) or "-", plan
+            )
+
+    def snapshot(self):
+        """نسخة من الإحصائيات الحالية مرتبة حسب مجموع الزمن"""
+        with self._lock:
+            items = list(self._stats.items())
+        return sorted(items, key=lambda item: item[1].total_ms, reverse=True)
+
+    def report(self, limit=50):
+        """تقرير نصي بأكثر أشكال الاستعلامات استهلاكاً للوقت"""
+        labels = [f"<={bound}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        lines = []
+        for shape, stats in self.snapshot()[:limit]:
+            average = stats.total_ms / stats.count if stats.count else 0
+            histogram = "  ".join(
+                f"{label}:{count}" for label, count in zip(labels, stats.buckets) if count
+            )
+            lines.append(
+                f"مجموع={stats.total_ms:.1f}ms  عدد={stats.count}  متوسط={average:.2f}ms  "
+                f"أقصى={stats.max_ms:.1f}ms  بطيء={stats.slow_count}\n"
+                f"  {shape}\n"
+                f"  {histogram}"
+            )
+        return "\n\n".join(lines)
+
+    def dump_report(self, path=REPORT_PATH):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.report())
+        return path
+
+    def save_workload(self, path=WORKLOAD_PATH):
+        """حفظ عينة من كل شكل استعلام (مع دمج ما سجّلته عمليات سابقة في نفس الملف)
+
+        تُحفظ أنواع المعاملات فقط، والقيم (بعد المحو) إذا كان capture_params مفعلاً.
+        يُضاف ما سُجّل منذ آخر حفظ فقط، فيمكن استدعاؤها دورياً.
+        """
+        with self._lock:
+            pending = [
+                (shape, stats, stats.count, stats.total_ms)
+                for shape, stats in self._stats.items()
+                if stats.count > stats.saved_count
+            ]
+        workload = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    workload = {entry['shape']: entry for entry in json.load(f)}
+            except (OSError, ValueError):
+                workload = {}
+        for entry in workload.values():
+            # ملفات أقدم قد تحتوي قيماً لم تُمحَ
+            if 'params' in entry:
+                params = entry.pop('params')
+                entry.setdefault('param_types', param_types(params))
+                if self.capture_params:
+                    entry['params'] = redact_params(entry['query'], params)
+        for shape, stats, count, total_ms in pending:
+            entry = workload.setdefault(shape, {
+                'shape': shape,
+                'query': stats.sample_query,
+                'param_types': stats.sample_types,
+                'count': 0,
+                'total_ms': 0.0,
+            })
+            if stats.sample_params is not None:
+                entry.setdefault('params', stats.sample_params)
+            entry['count'] += count - stats.saved_count
+            entry['total_ms'] += total_ms - stats.saved_ms
+        with open(path + '.part', 'w', encoding='utf-8') as f:
+            json.dump(list(workload.values()), f, ensure_ascii=False, indent=1, default=str)
+        os.replace(path + '.part', path)
+        with self._lock:
+            for _, stats, count, total_ms in pending:
+                stats.saved_count, stats.saved_ms = count, total_ms
+        return path
@@ -0,0 +1,162 @@
+"""تغطية الموظفين اليومية في القسم
+
+لكل قسم تُجمع فترات الغياب (الإجازات الموافق عليها وتحت الإجراء من
+vacation_intervals، والغياب المسجل في absences)، وتُدمج فترات كل موظف
+حتى لا يُحسب مرتين في اليوم نفسه، ثم تُبنى مصفوفة فروق: +1 في يوم بداية
+الفترة و -1 بعد نهايتها، ومجموعها التراكمي هو عدد الغائبين في كل يوم.
+سنة كاملة لقسم كامل عملية numpy واحدة بدل المرور على الأيام.
+
+الحد الأدنى لكل قسم في departments.min_staff (NULL = بدون حد).
+"""
+import numpy as np
+
+from day_numbers import from_day, to_day
+from database import row_type
+
+Shortage = row_type('date', 'available', 'min_staff')
+
+
+def merge_intervals(employee_ids, starts, ends):
+    """دمج الفترات المتداخلة أو المتلاصقة لكل موظف؛ يرجع (starts, ends) المدمجة"""
+    if len(starts) == 0:
+        return starts, ends
+    order = np.lexsort((starts, employee_ids))
+    employee_ids, starts, ends = employee_ids[order], starts[order], ends[order]
+    # إزاحة كل موظف بمسافة كبيرة تجعل الحد الأقصى التراكمي لا يعبر بين الموظفين
+    span = int(max(ends.max(), starts.max()) - min(ends.min(), starts.min())) + 2
+    offset = (employee_ids - employee_ids.min()) * span
+    shifted_starts = starts + offset
+    running_end = np.maximum.accumulate(ends + offset)
+    # فترة جديدة تبدأ حيث تكون البداية بعد نهاية كل ما سبقها (+1 للتلاصق)
+    new_segment = np.ones(len(starts), dtype=bool)
+    new_segment[1:] = shifted_starts[1:] > running_end[:-1] + 1
+    segment_starts = np.flatnonzero(new_segment)
+    segment_ends = np.append(segment_starts[1:], len(starts)) - 1
+    return starts[segment_starts], running_end[segment_ends] - offset[segment_ends]
+
+
+def daily_counts(starts, ends, first_day, end_day):
+    """عدد الفترات التي تغطي كل يوم في [first_day, end_day)"""
+    days = end_day - first_day
+    starts = np.clip(starts, first_day, end_day) - first_day
+    ends = np.clip(ends + 1, first_day, end_day) - first_day
+    diff = np.zeros(days + 1, dtype=np.int32)
+    np.add.at(diff, starts, 1)
+    np.add.at(diff, ends, -1)
+    return np.cumsum(diff[:-1])
+
+
+def format_shortages(shortages, limit=10):
+    """نص أيام النقص لعرضه في رسالة تنبيه"""
+    lines = [
+        f"{day.date}: {day.available} حاضر (الحد الأدنى {day.min_staff})"
+        for day in shortages[:limit]
+    ]
+    if len(shortages) > limit:
+        lines.append(f"... و{len(shortages) - limit} يوم آخر")
+    return "\n".join(lines)
+
+
+class StaffingCoverage:
+    def __init__(self, db):
+        self.db = db
+
+    def department_info(self, department):
+        """(عدد موظفي القسم، الحد الأدنى أو None)"""
+        headcount = self.db.fetch_scalar(
+            "SELECT COUNT(*) FROM employees WHERE department = ?", (department,), default=0
+        )
+        min_staff = self.db.fetch_scalar(
+            "SELECT min_staff FROM departments WHERE name = ?", (department,)
+        )
+        return headcount, min_staff
+
+    def _off_intervals(self, department, first_day, end_day, exclude_vacation_id=None):
+        """(employee_ids, starts, ends) لكل فترات غياب القسم المتقاطعة مع المدى"""
+        vacations = self.db.fetch_all("""
+            SELECT r.min_employee, r.start_day, r.end_day
+            FROM vacation_intervals r JOIN employees e ON e.id = r.min_employee
+            WHERE r.start_day < ? AND r.end_day >= ? AND r.id != ?
+            AND e.department = ?
+        """, (end_day, first_day, exclude_vacation_id or 0, department))
+        # الغياب الذي بدأ قبل المدى ويمتد داخله محسوب أيضاً
+        absences = self.db.fetch_all("""
+            SELECT a.employee_id, a.day, a.day + MAX(a.duration, 1) - 1
+            FROM absences a JOIN employees e ON e.id = a.employee_id
+            WHERE a.day < ? AND a.day + MAX(a.duration, 1) > ? AND e.department = ?
+        """, (end_day, first_day, department))
+        rows = np.array(vacations + absences, dtype=np.int64).reshape(-1, 3)
+        return rows[:, 0], rows[:, 1], rows[:, 2]
+
+    def off_per_day(self, department, first_day, end_day, extra=None, exclude_vacation_id=None):
+        """عدد الغائبين في كل يوم من [first_day, end_day)
+
+        extra: فترات إضافية [(employee_id, start_day, end_day)] لمحاكاة طلب
+        لم يُحفظ بعد.
+        """
+        employee_ids, starts, ends = self._off_intervals(department, first_day, end_day, exclude_vacation_id)
+        if extra:
+            extra = np.array(extra, dtype=np.int64).reshape(-1, 3)
+            employee_ids = np.concatenate([employee_ids, extra[:, 0]])
+            starts = np.concatenate([starts, extra[:, 1]])
+            ends = np.concatenate([ends, extra[:, 2]])
+        starts, ends = merge_intervals(employee_ids, starts, ends)
+        return daily_counts(starts, ends, first_day, end_day)
+
+    def available_per_day(self, department, first_day, end_day, **kwargs):
+        headcount, _ = self.department_info(department)
+        return headcount - self.off_per_day(department, first_day, end_day, **kwargs)
+
+    def vacation_shortages(self, vacation_id):
+        """أيام النقص لإجازة محفوظة في قسم صاحبها"""
+        row = self.db.fetch_one("""
+            SELECT e.department, v.start_date, v.end_date
+            FROM vacations v JOIN employees e ON v.employee_id = e.id
+            WHERE v.id = ?
+        """, (vacation_id,))
+        if row is None:
+            return []
+        department, start_date, end_date = row
+        return self.shortages(department, start_date, end_date, vacation_id=vacation_id)
+
+    def shortages(self, department, start, end, employee_id=None, vacation_id=None):
+        """الأيام التي يقل فيها عدد الحاضرين عن الحد الأدنى إذا تمت الإجازة
+
+        إذا كانت الإجازة محفوظة (vacation_id) فهي محسوبة أصلاً ضمن الفترات
+        النشطة؛ وإلا تُضاف كفترة إضافية للموظف employee_id.
+        """
+        headcount, min_staff = self.department_info(department)
+        if not min_staff:
+            return []
+        first_day, last_day = to_day(start), to_day(end)
+        extra = None
+        if vacation_id is None and employee_id is not None:
+            extra = [(employee_id, first_day, last_day)]
+        off = self.off_per_day(department, first_day, last_day + 1, extra=extra)
+        available = headcount - off
+        return [
+            Shortage(from_day(first_day + int(index)), int(available[index]), min_staff)
+            for index in np.flatnonzero(available < min_staff)
+        ]
+
+    def confirm_approval(self, parent, vacation_id):
+        """سؤال رئيس القسم قبل موافقة ستُنزل الحاضرين عن الحد الأدنى
+
+        يرجع True إذا لم يوجد نقص أو وافق رغم النقص.
+        """
+        shortages = self.vacation_shortages(vacation_id)
+        if not shortages:
+            return True
+        from PyQt6.QtWidgets import QMessageBox
+        reply = QMessageBox.question(
+            parent, "نقص في عدد الموظفين",
+            "عدد الحاضرين في القسم سيقل عن الحد الأدنى في الأيام التالية:\n"
+            f"{format_shortages(shortages)}\n\n"
+            "هل تريد الموافقة على الإجازة رغم ذلك؟",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+        )
+        return reply == QMessageBox.StandardButton.Yes
+
+    def year_available(self, department, year):
+        """عدد الحاضرين المتوقع في كل يوم من السنة"""
+        return self.available_per_day(department, to_day(f"{year}-01-01"), to_day(f"{year + 1}-01-01"))
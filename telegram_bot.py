@@ -8,8 +8,14 @@ from telegram.ext import (
     ConversationHandler
 )
 import logging
-from datetime import datetime, timedelta
+import os
 from PyQt6.QtCore import QDate
+from query_profiler import LOG_DIR
+from overlap_index import VacationOverlapIndex
+from work_schedule import describe as describe_work_days
+from leave_calendar import LeaveCalendar
+from leave_workflow import LeaveWorkflowService, LeaveWorkflowError
+from leave_policy import LeavePolicyEngine
 
 # Conversation states
 (
@@ -20,6 +26,9 @@ from PyQt6.QtCore import QDate
 
 BOT_PASSWORD = "adw2025"
 
+# تقرير زمن استعلامات البوت منفصل عن تقرير الواجهة
+BOT_QUERY_REPORT_PATH = os.path.join(LOG_DIR, 'query_profile_bot.txt')
+
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     level=logging.INFO
@@ -30,6 +39,10 @@ class EmployeeQueryBot:
     def __init__(self, token, db_manager):
         self.token = token
         self.db = db_manager
+        self.overlap_index = VacationOverlapIndex(self.db)
+        self.calendar = LeaveCalendar(self.db)
+        self.workflow = LeaveWorkflowService(self.db)
+        self.policies = LeavePolicyEngine(self.db)
         self.setup_handlers()
 
     def setup_handlers(self):
@@ -117,27 +130,12 @@ class EmployeeQueryBot:
         if text.startswith("❌ إلغاء الإجازة"):
             try:
                 vac_id = int(text.replace("❌ إلغاء الإجازة", "").strip())
-                self.db.execute_query("SELECT type, duration, status, dept_approval FROM vacations WHERE id=? AND employee_id=?", (vac_id, context.user_data['employee']['id']))
-                row = self.db.cursor.fetchone()
-                if not row:
-                    await update.message.reply_text("تعذر العثور على الإجازة.")
-                    return MAIN_MENU
-                vac_type, duration, status, dept_approval = row
-                if status not in ("تحت الإجراء", "موافق") or dept_approval in ("مرفوض", "ملغاة"):
-                    await update.message.reply_text("لا يمكن إلغاء إلا الإجازات التي لم تُنفذ أو لم تُرفض أو تُلغى بالفعل.")
+                try:
+                    self.workflow.cancel(vac_id, employee_id=context.user_data['employee']['id'])
+                except LeaveWorkflowError as e:
+                    await update.message.reply_text(str(e))
                     return MAIN_MENU
-                self.db.execute_query("UPDATE vacations SET status='ملغاة', dept_approval='ملغاة' WHERE id=?", (vac_id,))
-                if vac_type == "سنوية":
-                    self.db.execute_query(
-                        "UPDATE employees SET vacation_balance = vacation_balance + ? WHERE id = ?",
-                        (duration, context.user_data['employee']['id'])
-                    )
-                if vac_type == "طارئة":
-                    self.db.execute_query(
-                        "UPDATE employees SET emergency_vacation_balance = emergency_vacation_balance + ? WHERE id = ?",
-                        (duration, context.user_data['employee']['id'])
-                    )
-                await update.message.reply_text("تم إلغاء الإجازة بنجاح وتم استرجاع الأيام للرصيد.")
+                await update.message.reply_text("تم إلغاء الإجازة بنجاح، وتُسترجع أيامها للرصيد إذا كانت قد خُصمت.")
                 await self.show_vacation_history(update, context)
                 return MAIN_MENU
             except Exception as e:
@@ -238,26 +236,15 @@ class EmployeeQueryBot:
             await update.message.reply_text("لم أستطع تحديد الموظف. يرجى التأكد من اختيار الموظف أولاً.")
             return
 
-        self.db.execute_query("SELECT work_days FROM employees WHERE id = ?", (emp_id,))
-        result = self.db.cursor.fetchone()
+        result = self.db.fetch_one(
+            "SELECT work_days_mask, work_status FROM employees WHERE id = ?", (emp_id,)
+        )
         if not result:
             await update.message.reply_text("لم يتم العثور على بيانات هذا الموظف.")
             return
 
-        work_days = result[0] or ""
-        if work_days == "الندب" or work_days == "تفرغ":
-            await update.message.reply_text(f"حالة الموظف: {work_days}")
-        elif work_days:
-            days_map = {
-                "0": "السبت", "1": "الأحد", "2": "الإثنين",
-                "3": "الثلاثاء", "4": "الأربعاء", "5": "الخميس", "6": "الجمعة"
-            }
-            periods_map = {"M": "صباحية", "E": "مسائية", "F": "كامل اليوم"}
-            msg = "أيام العمل:\n"
-            for wd in work_days.split(","):
-                if ":" in wd:
-                    day, period = wd.split(":")
-                    msg += f"- {days_map.get(day, day)}: {periods_map.get(period, period)}\n"
+        msg = describe_work_days(*result)
+        if msg:
             await update.message.reply_text(msg)
         else:
             await update.message.reply_text("لا توجد بيانات أيام عمل لهذا الموظف.")
@@ -285,7 +272,7 @@ class EmployeeQueryBot:
             return VACATION_DEATH_RELATION
         else:
             context.user_data['vacation']['relation'] = "أقارب آخرون"
-            context.user_data['vacation']['duration'] = 3
+            context.user_data['vacation']['duration'] = self.policies.fixed_duration("وفاة", death_type)
             context.user_data['date_step'] = 'year'
             await update.message.reply_text(
                 "الرجاء إدخال سنة الوفاة (مثال: 2025):",
@@ -305,10 +292,9 @@ class EmployeeQueryBot:
             )
             return VACATION_DEATH_TYPE
         context.user_data['vacation']['relation'] = relation
-        if relation == "زوج":
-            context.user_data['vacation']['duration'] = 130
-        else:
-            context.user_data['vacation']['duration'] = 7
+        context.user_data['vacation']['duration'] = self.policies.fixed_duration(
+            "وفاة", relation, context.user_data['vacation'].get('death_type')
+        )
         context.user_data['date_step'] = 'year'
         await update.message.reply_text(
             "الرجاء إدخال سنة الوفاة (مثال: 2025):",
@@ -385,40 +371,29 @@ class EmployeeQueryBot:
                 context.user_data['vacation']['start_date'] = start_date
                 vac_type = context.user_data['vacation']['type']
 
-                if vac_type == "سنوية":
-                    await update.message.reply_text(
-                        "أدخل عدد أيام الإجازة السنوية (1-90):",
-                        reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
-                    )
-                    return VACATION_DURATION
-                elif vac_type == "مرضية":
-                    await update.message.reply_text(
-                        "أدخل عدد أيام الإجازة المرضية:",
-                        reply_markup=ReplyKeyboardMarkup([["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
-                    )
-                    return VACATION_DURATION
-                elif vac_type == "طارئة":
+                vacation = context.user_data['vacation']
+                rule = self.policies.rule(
+                    vac_type, vacation.get('relation'), vacation.get('death_type'),
+                    vacation.get('subtype', 'وضع عادي')
+                )
+                if rule is not None and rule.fixed_days is None:
+                    # مدة يختارها الموظف ضمن حدود القاعدة
+                    keyboard = [["↩️ رجوع", "إلغاء"]]
+                    if rule.max_days - rule.min_days < 5:
+                        keyboard.insert(0, [str(days) for days in range(rule.min_days, rule.max_days + 1)])
                     await update.message.reply_text(
-                        "أدخل عدد أيام الإجازة الطارئة (1-3):",
-                        reply_markup=ReplyKeyboardMarkup([["1", "2", "3"], ["↩️ رجوع", "إلغاء"]], resize_keyboard=True)
+                        f"أدخل عدد أيام إجازة {vac_type} ({rule.min_days}-{rule.max_days}):",
+                        reply_markup=ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
                     )
                     return VACATION_DURATION
-                elif vac_type == "وضع":
-                    subtype = context.user_data['vacation'].get('subtype', 'وضع عادي')
-                    if subtype == "وضع توأم":
-                        context.user_data['vacation']['duration'] = 112
-                    else:
-                        context.user_data['vacation']['duration'] = 98
-                else:
-                    if vac_type == "حج":
-                        context.user_data['vacation']['duration'] = 20
-                    elif vac_type == "زواج":
-                        context.user_data['vacation']['duration'] = 14
+                if rule is not None and 'duration' not in vacation:
+                    vacation['duration'] = rule.fixed_days
 
                 if 'duration' in context.user_data['vacation']:
                     duration = context.user_data['vacation']['duration']
-                    end_date = (QDate(year, month, day).addDays(duration - 1)).toString("yyyy-MM-dd")
-                    context.user_data['vacation']['end_date'] = end_date
+                    context.user_data['vacation']['end_date'] = self.calendar.end_date_for(
+                        context.user_data['employee']['id'], vac_type, start_date, duration
+                    )
                     if 'date_step' in context.user_data:
                         del context.user_data['date_step']
                     return await self.show_vacation_summary(update, context)
@@ -443,25 +418,21 @@ class EmployeeQueryBot:
         try:
             duration = int(update.message.text)
             vac_type = context.user_data['vacation']['type']
-            if vac_type == "سنوية":
-                if not 1 <= duration <= 90:
-                    raise ValueError("مدة الإجازة السنوية يجب أن تكون بين 1 و 90 يوم")
-            elif vac_type == "مرضية":
-                if duration < 1:
-                    raise ValueError("مدة الإجازة المرضية يجب أن تكون يوم واحد على الأقل")
-            elif vac_type == "طارئة":
-                if not 1 <= duration <= 3:
-                    raise ValueError("مدة الإجازة الطارئة يجب أن تكون من 1 إلى 3 أيام")
-                self.db.execute_query("SELECT emergency_vacation_balance FROM employees WHERE id=?", (context.user_data['employee']['id'],))
-                balance = self.db.cursor.fetchone()[0]
+            policy_error = self.policies.validate(vac_type, duration)
+            if policy_error:
+                raise ValueError(policy_error)
+            if vac_type == "طارئة":
+                balance = self.db.fetch_scalar("SELECT emergency_vacation_balance FROM employees WHERE id=?", (context.user_data['employee']['id'],), default=0)
                 if duration > balance:
                     await update.message.reply_text("رصيد الإجازة الطارئة غير كافٍ (يتبقى لك أقل من المطلوب).")
                     return MAIN_MENU
             context.user_data['vacation']['duration'] = duration
             if 'start_date' in context.user_data['vacation']:
-                start_date = QDate.fromString(context.user_data['vacation']['start_date'], "yyyy-MM-dd")
-                end_date = start_date.addDays(duration - 1)
-                context.user_data['vacation']['end_date'] = end_date.toString("yyyy-MM-dd")
+                # السنوية والطارئة بأيام العمل: النهاية بعد تخطي أيام الراحة والعطلات
+                context.user_data['vacation']['end_date'] = self.calendar.end_date_for(
+                    context.user_data['employee']['id'], vac_type,
+                    context.user_data['vacation']['start_date'], duration
+                )
                 return await self.show_vacation_summary(update, context)
             else:
                 await update.message.reply_text(
@@ -520,9 +491,9 @@ class EmployeeQueryBot:
                 else:
                     raise ValueError("بيانات التاريخ غير مكتملة، الرجاء إعادة إدخال التاريخ")
             if 'end_date' not in vacation:
-                start_dt = datetime.strptime(vacation['start_date'], "%Y-%m-%d")
-                end_dt = start_dt + timedelta(days=vacation['duration'] - 1)
-                vacation['end_date'] = end_dt.strftime("%Y-%m-%d")
+                vacation['end_date'] = self.calendar.end_date_for(
+                    emp_id, vacation['type'], vacation['start_date'], vacation['duration']
+                )
 
             status = 'تحت الإجراء'
             dept_approval = 'تحت الإجراء'
@@ -539,18 +510,25 @@ class EmployeeQueryBot:
 
             # تحقق من الرصيد مرة أخرى للطوارئ والسنوية
             if vacation['type'] == "طارئة":
-                self.db.execute_query("SELECT emergency_vacation_balance FROM employees WHERE id=?", (emp_id,))
-                balance = self.db.cursor.fetchone()[0]
+                balance = self.db.fetch_scalar("SELECT emergency_vacation_balance FROM employees WHERE id=?", (emp_id,), default=0)
                 if vacation['duration'] > balance:
                     await update.message.reply_text("رصيد الإجازة الطارئة غير كافٍ (يتبقى لك أقل من المطلوب).")
                     return MAIN_MENU
             if vacation['type'] == "سنوية":
-                self.db.execute_query("SELECT vacation_balance FROM employees WHERE id=?", (emp_id,))
-                balance = self.db.cursor.fetchone()[0]
+                balance = self.db.fetch_scalar("SELECT vacation_balance FROM employees WHERE id=?", (emp_id,), default=0)
                 if vacation['duration'] > balance:
                     await update.message.reply_text("رصيد الإجازة السنوية غير كافٍ.")
                     return MAIN_MENU
 
+            overlaps = self.overlap_index.employee_overlaps(emp_id, vacation['start_date'], vacation['end_date'])
+            if overlaps:
+                conflict = overlaps[0]
+                await update.message.reply_text(
+                    f"لا يمكن تقديم الطلب: لديك إجازة {conflict.type} "
+                    f"من {conflict.start_date} إلى {conflict.end_date} في نفس الفترة."
+                )
+                return MAIN_MENU
+
             self.db.execute_query(
                 "INSERT INTO vacations (employee_id, type, relation, start_date, end_date, duration, notes, status, dept_approval, dept_approver) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
                 (emp_id, vacation['type'], vacation.get('relation'), vacation['start_date'], vacation['end_date'], vacation['duration'], notes, status, dept_approval, dept_approver)
@@ -576,14 +554,13 @@ class EmployeeQueryBot:
 
     async def show_vacation_history(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         try:
-            self.db.execute_query("""
+            records = self.db.fetch_all("""
                 SELECT id, type, start_date, end_date, duration, status, dept_approval
                 FROM vacations
                 WHERE employee_id = ?
                 ORDER BY start_date DESC
                 LIMIT 10
             """, (context.user_data['employee']['id'],))
-            records = self.db.cursor.fetchall()
             if not records:
                 await update.message.reply_text(
                     "لا يوجد سجل إجازات",
@@ -629,14 +606,13 @@ class EmployeeQueryBot:
             await self.show_main_menu(update)
             return MAIN_MENU
         try:
-            self.db.execute_query("""
+            records = self.db.fetch_all("""
                 SELECT date, type, duration
                 FROM absences
                 WHERE employee_id = ?
                 ORDER BY date DESC
                 LIMIT 30
             """, (context.user_data['employee']['id'],))
-            records = self.db.cursor.fetchall()
             if not records:
                 await update.message.reply_text(
                     "لا يوجد سجل غياب لك",
@@ -660,12 +636,11 @@ class EmployeeQueryBot:
             await self.show_main_menu(update)
             return MAIN_MENU
         try:
-            self.db.execute_query("""
+            grade, grade_date, bonus = self.db.fetch_one("""
                 SELECT job_grade, grade_date, bonus
                 FROM employees
                 WHERE id = ?
             """, (context.user_data['employee']['id'],))
-            grade, grade_date, bonus = self.db.cursor.fetchone()
             response = (
                 "📊 الدرجة الوظيفية:\n"
                 f"• الدرجة: {grade}\n"
@@ -686,12 +661,11 @@ class EmployeeQueryBot:
             await self.show_main_menu(update)
             return MAIN_MENU
         try:
-            self.db.execute_query("""
+            balance, emg_balance = self.db.fetch_one("""
                 SELECT vacation_balance, emergency_vacation_balance
                 FROM employees
                 WHERE id = ?
             """, (context.user_data['employee']['id'],))
-            balance, emg_balance = self.db.cursor.fetchone()
             await update.message.reply_text(
                 f"✈️ رصيد الإجازات السنوية: {balance} يوم حتى تاريخ 31/12/2024\n"
                 f"🚨 رصيد الإجازة الطارئة: {emg_balance} يوم حتى تاريخ 31/12/2024",
@@ -730,13 +704,12 @@ class EmployeeQueryBot:
 
     def get_employee(self, national_id: str, serial_number: str) -> dict:
         try:
-            self.db.execute_query("""
+            if row := self.db.fetch_one("""
                 SELECT id, name, national_id, department,
                        job_grade, hiring_date, vacation_balance, emergency_vacation_balance
                 FROM employees
                 WHERE national_id=? AND serial_number=?
-            """, (national_id, serial_number))
-            if row := self.db.cursor.fetchone():
+            """, (national_id, serial_number)):
                 return {
                     'id': row[0],
                     'name': row[1],
@@ -752,4 +725,11 @@ class EmployeeQueryBot:
         return None
 
     def run(self):
-        self.application.run_polling()
\ No newline at end of file
+        # terminate() من main.py على Windows ينهي العملية فوراً دون تنفيذ finally،
+        # لذلك يُحفظ التقرير دورياً أيضاً
+        stop_flush = self.db.start_profile_flush(BOT_QUERY_REPORT_PATH)
+        try:
+            self.application.run_polling()
+        finally:
+            stop_flush.set()
+            self.db.dump_query_profile(BOT_QUERY_REPORT_PATH)
\ No newline at end of file
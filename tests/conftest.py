@@ -0,0 +1,42 @@
+"""إعداد الاختبارات: وحدات المشروع في المجلد الأعلى، وقاعدة بيانات مؤقتة لكل اختبار"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """DatabaseManager على ملف مؤقت بعد تطبيق كل الترحيلات"""
+    import database
+    import query_profiler
+    monkeypatch.setattr(database, "DB_PATH", str(tmp_path / "employees.db"))
+    monkeypatch.setattr(query_profiler, "SLOW_LOG_PATH", str(tmp_path / "slow_queries.log"))
+    return database.DatabaseManager()
+
+
+@pytest.fixture
+def add_employee(db):
+    """إضافة موظف بقيم افتراضية؛ يرجع رقمه"""
+    count = 0
+
+    def add(**values):
+        nonlocal count
+        count += 1
+        values = {
+            'serial_number': str(count),
+            'name': f"موظف {count}",
+            'national_id': str(100000000000 + count),
+            'department': "التمريض",
+            'hiring_date': "2015-01-01",
+            **values,
+        }
+        db.execute_query(
+            f"INSERT INTO employees ({', '.join(values)}) VALUES ({', '.join('?' * len(values))})",
+            tuple(values.values())
+        )
+        return db.fetch_scalar("SELECT id FROM employees WHERE serial_number = ?", (values['serial_number'],))
+
+    return add
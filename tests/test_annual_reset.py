@@ -0,0 +1,99 @@
+from datetime import date
+
+import pytest
+
+from annual_reset import (
+    ANNUAL_ENTITLEMENT, CARRY_OVER_CAP, EMERGENCY_BALANCE, SENIOR_ENTITLEMENT, SENIOR_SERVICE_YEARS,
+    pending_years, run_rollover
+)
+from balance_ledger import REASON_ANNUAL_RESET, REASON_CARRY_OVER_EXPIRY, REASON_ENTITLEMENT
+
+
+def _entitlement(hiring_date, year):
+    """الاستحقاق كما كان يُحسب لكل موظف على حدة"""
+    if hiring_date is None:
+        return ANNUAL_ENTITLEMENT
+    hired = date.fromisoformat(hiring_date)
+    years = year - hired.year - ((hired.month, hired.day) != (1, 1))
+    if years < 0:
+        return 0
+    return SENIOR_ENTITLEMENT if years >= SENIOR_SERVICE_YEARS else ANNUAL_ENTITLEMENT
+
+
+def _expected_entries(employees, years):
+    """(الرصيد النهائي، القيود) لكل موظف: {id: (balance, [(year, reason, delta)])}"""
+    expected = {}
+    for employee_id, balance, emergency, hiring_date in employees:
+        balance, entries = balance or 0, []
+        for year in years:
+            carried = min(balance, CARRY_OVER_CAP)
+            entitlement = _entitlement(hiring_date, year)
+            if carried != balance:
+                entries.append((year, REASON_CARRY_OVER_EXPIRY, carried - balance))
+            if entitlement:
+                entries.append((year, REASON_ENTITLEMENT, entitlement))
+            if emergency != EMERGENCY_BALANCE:
+                entries.append((year, REASON_ANNUAL_RESET, EMERGENCY_BALANCE - emergency))
+                emergency = EMERGENCY_BALANCE
+            balance = carried + entitlement
+        expected[employee_id] = (balance, sorted(entries))
+    return expected
+
+
+@pytest.fixture
+def employees(add_employee):
+    rows = [
+        (20, 5, '2015-01-01'),
+        (80, 12, '2000-06-15'),
+        (None, 12, None),
+        (10, 12, '2024-03-01'),
+        (70, 0, '2004-01-01'),
+    ]
+    return [
+        (add_employee(vacation_balance=balance, emergency_vacation_balance=emergency, hiring_date=hiring_date),
+         balance, emergency, hiring_date)
+        for balance, emergency, hiring_date in rows
+    ]
+
+
+def _rollover_entries(db):
+    entries = {}
+    for employee_id, year, reason, delta in db.fetch_all("""
+        SELECT employee_id, CAST(substr(entry_date, 1, 4) AS INTEGER), reason, delta
+        FROM balance_ledger WHERE reason IN (?, ?, ?)
+    """, (REASON_CARRY_OVER_EXPIRY, REASON_ENTITLEMENT, REASON_ANNUAL_RESET)):
+        entries.setdefault(employee_id, []).append((year, reason, delta))
+    return {employee_id: sorted(rows) for employee_id, rows in entries.items()}
+
+
+def test_first_run_records_the_year(db, employees):
+    assert run_rollover(db, today=date(2024, 5, 1)) == []
+    assert db.fetch_all("SELECT year, employees FROM balance_rollovers") == [(2024, 5)]
+    assert _rollover_entries(db) == {}
+    assert pending_years(db, today=date(2026, 1, 1)) == [2025, 2026]
+
+
+def test_rollover_matches_per_employee_rules(db, employees):
+    db.execute_query("INSERT INTO balance_rollovers (year, employees) VALUES (2022, 5)")
+    assert run_rollover(db, today=date(2025, 1, 1)) == [2023, 2024, 2025]
+
+    expected = _expected_entries(employees, [2023, 2024, 2025])
+    assert _rollover_entries(db) == {
+        employee_id: entries for employee_id, (_, entries) in expected.items() if entries
+    }
+    assert db.fetch_all("SELECT id, vacation_balance, emergency_vacation_balance FROM employees ORDER BY id") == [
+        (employee_id, balance, EMERGENCY_BALANCE) for employee_id, (balance, _) in sorted(expected.items())
+    ]
+
+
+def test_rerun_does_nothing(db, employees):
+    db.execute_query("INSERT INTO balance_rollovers (year, employees) VALUES (2023, 5)")
+    assert run_rollover(db, today=date(2024, 1, 1)) == [2024]
+    balances = db.fetch_all("SELECT * FROM employees ORDER BY id")
+    entries = db.fetch_scalar("SELECT COUNT(*) FROM balance_ledger")
+
+    assert run_rollover(db, today=date(2024, 12, 31)) == []
+    assert pending_years(db, today=date(2024, 12, 31)) == []
+    assert db.fetch_all("SELECT * FROM employees ORDER BY id") == balances
+    assert db.fetch_scalar("SELECT COUNT(*) FROM balance_ledger") == entries
+    assert db.fetch_all("SELECT year FROM balance_rollovers ORDER BY year") == [(2023,), (2024,)]
@@ -0,0 +1,75 @@
+import threading
+
+import background_jobs
+from background_jobs import BackgroundJob
+
+
+def _run(task, *args):
+    """تشغيل العملية وجمع إشاراتها [(الإشارة، القيم)]"""
+    job = BackgroundJob(task, *args)
+    events = []
+    for name in ('progress', 'status', 'finished', 'failed', 'cancelled'):
+        getattr(job.signals, name).connect(lambda *values, name=name: events.append((name, values)))
+    job.run()
+    return job, events
+
+
+def test_finished():
+    def task(job, a, b):
+        job.set_status("جارٍ الحساب")
+        return a + b
+
+    _, events = _run(task, 2, 3)
+    assert events == [('status', ("جارٍ الحساب",)), ('finished', (5,))]
+
+
+def test_failed():
+    def task(job):
+        raise ValueError("خطأ في الملف")
+
+    _, events = _run(task)
+    assert events == [('failed', ("خطأ في الملف",))]
+
+
+def test_cancel_stops_at_next_report():
+    done = []
+
+    def task(job):
+        for step in range(5):
+            job.report(step, 5)
+            done.append(step)
+            if step == 1:
+                job.cancel()
+
+    job, events = _run(task)
+    assert job.is_cancelled
+    assert done == [0, 1]
+    assert events[-1] == ('cancelled', ())
+
+
+def test_progress_is_throttled(monkeypatch):
+    monkeypatch.setattr(background_jobs, "PROGRESS_INTERVAL", 3600)
+
+    def task(job):
+        for step in range(1, 11):
+            job.report(step, 10)
+
+    _, events = _run(task)
+    assert [values for name, values in events if name == 'progress'] == [(1, 10), (10, 10)]
+
+
+def test_jobs_share_the_manager_without_blocking_reads(db):
+    """قراءة العملية لا تنتظر معاملة مفتوحة في خيط الواجهة ولا ترى ما لم يُثبَّت"""
+    seen = []
+
+    def task(job):
+        seen.append(db.fetch_scalar("SELECT COUNT(*) FROM departments WHERE name = 'أ'"))
+
+    with db.transaction():
+        db.execute_query("INSERT INTO departments (name) VALUES ('أ')")
+        thread = threading.Thread(target=BackgroundJob(task).run)
+        thread.start()
+        thread.join(5)
+        assert not thread.is_alive()
+    assert seen == [0]
+    assert db.fetch_scalar("SELECT COUNT(*) FROM departments WHERE name = 'أ'") == 1
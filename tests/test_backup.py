@@ -0,0 +1,50 @@
+import os
+import sqlite3
+
+from backup import BackupJob, backup_to_file
+
+
+def _count(path, name):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM departments WHERE name = ?", (name,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_backup_to_file(db, tmp_path):
+    db.execute_query("INSERT INTO departments (name) VALUES ('أ')")
+    target = str(tmp_path / "backup.db")
+    calls = []
+    assert backup_to_file(db.db_path, target, pages=1, progress=lambda done, total: calls.append((done, total))) \
+        == target
+    assert _count(target, "أ") == 1
+    assert len(calls) > 1 and calls[-1][0] == calls[-1][1]
+    assert not os.path.exists(target + '.part')
+
+
+def test_backup_during_write_transaction(db, tmp_path):
+    db.execute_query("INSERT INTO departments (name) VALUES ('أ')")
+    with db.transaction():
+        db.execute_query("INSERT INTO departments (name) VALUES ('ب')")
+        target = backup_to_file(db.db_path, str(tmp_path / "backup.db"))
+    # النسخة تحتوي آخر حالة مثبتة فقط
+    assert (_count(target, "أ"), _count(target, "ب")) == (1, 0)
+
+
+def test_backup_job(db, tmp_path):
+    finished = []
+    job = BackupJob(db.db_path, str(tmp_path / "backup.db"), on_finished=finished.append)
+    job.start()
+    job.join()
+    assert job.error is None
+    assert job.path == str(tmp_path / "backup.db")
+    assert finished == [job]
+
+
+def test_failed_backup_job(tmp_path):
+    job = BackupJob(str(tmp_path / "missing.db"), str(tmp_path / "backup.db"))
+    job.run()
+    assert job.error is not None
+    assert job.path is None
+    assert not os.path.exists(tmp_path / "backup.db")
@@ -0,0 +1,91 @@
+import os
+import sqlite3
+
+import pytest
+
+import backup_store
+from backup_store import BackupStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return BackupStore(str(tmp_path / "store"))
+
+
+def _manifest(snapshot_id, created_at):
+    return {'id': snapshot_id, 'created_at': created_at}
+
+
+def _add_departments(db, count):
+    with db.transaction():
+        for number in range(count):
+            db.execute_query("INSERT INTO departments (name) VALUES (?)", (f"قسم {number}",))
+
+
+def test_unchanged_pages_are_not_stored_again(db, store):
+    # قاعدة تمتد على عدة أجزاء حتى لا يغيّر الإدخال التالي كل الأجزاء
+    _add_departments(db, 5000)
+    first = store.create_snapshot(db.db_path)
+    assert first['new_chunks'] == len(first['chunks']) > 0
+    second = store.create_snapshot(db.db_path)
+    assert second['new_chunks'] == 0
+    assert second['sha256'] == first['sha256']
+
+    db.execute_query("INSERT INTO departments (name) VALUES ('أ')")
+    third = store.create_snapshot(db.db_path)
+    assert 0 < third['new_chunks'] < len(third['chunks'])
+    assert [manifest['id'] for manifest in store.list_snapshots()] == [first['id'], second['id'], third['id']]
+
+
+def test_restore(db, store, tmp_path):
+    db.execute_query("INSERT INTO departments (name) VALUES ('أ')")
+    snapshot = store.create_snapshot(db.db_path)
+    db.execute_query("DELETE FROM departments WHERE name = 'أ'")
+    assert store.verify(snapshot['id']) == []
+
+    target = store.restore(snapshot['id'], str(tmp_path / "restored.db"))
+    conn = sqlite3.connect(target)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM departments WHERE name = 'أ'").fetchone()[0] == 1
+    finally:
+        conn.close()
+
+
+def test_damaged_chunk(db, store, tmp_path):
+    snapshot = store.create_snapshot(db.db_path)
+    with open(store._chunk_path(snapshot['chunks'][0]), 'wb') as f:
+        f.write(b"damaged")
+    assert len(store.verify(snapshot['id'])) == 1
+    with pytest.raises(Exception):
+        store.restore(snapshot['id'], str(tmp_path / "restored.db"))
+    assert not os.path.exists(tmp_path / "restored.db")
+
+
+def test_retained_ids():
+    manifests = [
+        _manifest('20240101_1', '2024-01-01T09:00:00'),
+        _manifest('20240101_2', '2024-01-01T18:00:00'),
+        _manifest('20240102_1', '2024-01-02T09:00:00'),
+        _manifest('20240110_1', '2024-01-10T09:00:00'),
+        _manifest('20240215_1', '2024-02-15T09:00:00'),
+    ]
+    # أحدث نسخة في كل يوم، ثم كل أسبوع، ثم كل شهر
+    assert BackupStore._retained_ids(manifests, daily=2, weekly=0, monthly=0) == {'20240215_1', '20240110_1'}
+    assert BackupStore._retained_ids(manifests, daily=0, weekly=3, monthly=0) == {
+        '20240215_1', '20240110_1', '20240102_1'
+    }
+    assert BackupStore._retained_ids(manifests, daily=0, weekly=0, monthly=5) == {'20240215_1', '20240110_1'}
+
+
+def test_retention_removes_unreferenced_chunks(db, store, monkeypatch):
+    monkeypatch.setattr(backup_store, "GC_GRACE_SECONDS", -1)
+    old = store.create_snapshot(db.db_path)
+    _add_departments(db, 2000)
+    new = store.create_snapshot(db.db_path)
+
+    assert store.apply_retention(daily=1, weekly=0, monthly=0) == [old['id']]
+    assert [manifest['id'] for manifest in store.list_snapshots()] == [new['id']]
+    assert store.verify(new['id']) == []
+    unreferenced = set(old['chunks']) - set(new['chunks'])
+    assert unreferenced
+    assert not any(os.path.exists(store._chunk_path(digest)) for digest in unreferenced)
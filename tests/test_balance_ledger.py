@@ -0,0 +1,55 @@
+import pytest
+
+from balance_ledger import BalanceLedger, REASON_ADJUSTMENT, REASON_APPROVAL
+
+DAYS = ['2023-12-31', '2024-01-01', '2024-02-09', '2024-02-10', '2024-02-29', '2024-03-01', '2024-03-15', '2024-04-30']
+
+
+@pytest.fixture
+def ledger(db, add_employee):
+    ledger = BalanceLedger(db)
+    ledger.employee_id = add_employee(created_at="2024-01-01 08:00:00")
+    ledger.post(ledger.employee_id, "سنوية", -5, REASON_APPROVAL, entry_date='2024-02-10')
+    ledger.post(ledger.employee_id, "سنوية", -3, REASON_APPROVAL, entry_date='2024-03-15')
+    return ledger
+
+
+def _balances(ledger):
+    return [ledger.balance_as_of(ledger.employee_id, "سنوية", day) for day in DAYS]
+
+
+def _without_snapshots(db, ledger):
+    with db.transaction():
+        snapshots = db.fetch_all("SELECT * FROM balance_snapshots")
+        db.execute_query("DELETE FROM balance_snapshots")
+        balances = _balances(ledger)
+        db.execute_many("INSERT INTO balance_snapshots VALUES (?, ?, ?, ?)", snapshots)
+    return balances
+
+
+def test_balance_as_of_from_entries(ledger):
+    assert _balances(ledger) == [0, 30, 30, 25, 25, 25, 22, 22]
+    assert ledger.balance(ledger.employee_id, "سنوية") == 22
+
+
+def test_snapshots_do_not_change_balances(db, ledger):
+    before = _balances(ledger)
+    assert ledger.take_snapshots('2024-02-29') == 2
+    assert ledger.take_snapshots('2024-03-31') == 2
+    assert _balances(ledger) == before
+    assert db.fetch_all(
+        "SELECT balance FROM balance_snapshots WHERE balance_type = 'سنوية' ORDER BY snapshot_day"
+    ) == [(25,), (22,)]
+
+
+def test_entry_before_snapshot_updates_it(db, ledger):
+    ledger.take_snapshots('2024-02-29')
+    ledger.take_snapshots('2024-03-31')
+    ledger.post(ledger.employee_id, "سنوية", 2, REASON_ADJUSTMENT, entry_date='2024-02-01')
+    assert _balances(ledger) == [0, 30, 32, 27, 27, 27, 24, 24]
+    assert _balances(ledger) == _without_snapshots(db, ledger)
+
+
+def test_snapshot_taken_once(ledger):
+    assert ledger.ensure_snapshots('2024-02-29') == 2
+    assert ledger.ensure_snapshots('2024-02-29') == 0
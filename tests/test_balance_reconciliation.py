@@ -0,0 +1,63 @@
+from balance_ledger import BalanceLedger, REASON_RECONCILIATION
+from balance_reconciliation import apply_fixes, reconcile
+
+
+def _add_vacation(db, employee_id, duration, status="موافق", created_at=None):
+    db.execute_query(
+        "INSERT INTO vacations (employee_id, type, start_date, end_date, duration, status, created_at) "
+        "VALUES (?, 'سنوية', '2024-03-01', '2024-03-10', ?, ?, COALESCE(?, CURRENT_TIMESTAMP))",
+        (employee_id, duration, status, created_at)
+    )
+    return db.fetch_scalar("SELECT MAX(id) FROM vacations")
+
+
+def test_consistent_balances(db, add_employee):
+    employee_id = add_employee()
+    BalanceLedger(db).post(employee_id, "سنوية", -3, "تعديل يدوي")
+    report, corrections = reconcile(db)
+    assert report.empty
+    assert corrections.empty
+
+
+def test_approved_vacation_without_entry(db, add_employee):
+    employee_id = add_employee()
+    vacation_id = _add_vacation(db, employee_id, 5)
+    _add_vacation(db, employee_id, 4, status="تحت الإجراء")
+
+    report, corrections = reconcile(db)
+    assert report[['employee_id', 'balance_type', 'recorded', 'ledger', 'expected', 'difference']] \
+        .values.tolist() == [[employee_id, "سنوية", 30, 30, 25, -5]]
+    assert corrections[['vacation_id', 'delta']].values.tolist() == [[vacation_id, -5]]
+
+    assert apply_fixes(db, report, corrections) == 1
+    assert db.fetch_scalar("SELECT vacation_balance FROM employees WHERE id = ?", (employee_id,)) == 25
+    assert db.fetch_all(
+        "SELECT delta, vacation_id FROM balance_ledger WHERE reason = ?", (REASON_RECONCILIATION,)
+    ) == [(-5, vacation_id)]
+    report, corrections = reconcile(db)
+    assert report.empty
+    assert corrections.empty
+
+
+def test_vacation_before_opening_entry_is_not_tracked(db, add_employee):
+    employee_id = add_employee()
+    _add_vacation(db, employee_id, 5, created_at="2000-01-01 00:00:00")
+    report, _ = reconcile(db)
+    assert report.empty
+
+
+def test_column_edited_outside_ledger(db, add_employee):
+    employee_id = add_employee()
+    db.execute_query("UPDATE employees SET emergency_vacation_balance = 20 WHERE id = ?", (employee_id,))
+
+    report, corrections = reconcile(db)
+    assert report[['balance_type', 'recorded', 'expected', 'difference']].values.tolist() == [
+        ["طارئة", 20, 12, -8]
+    ]
+    assert corrections.empty
+
+    apply_fixes(db, report, corrections)
+    assert db.fetch_scalar(
+        "SELECT emergency_vacation_balance FROM employees WHERE id = ?", (employee_id,)
+    ) == 12
+    assert reconcile(db)[0].empty
@@ -0,0 +1,128 @@
+import gc
+import threading
+
+import pytest
+
+from database import row_type
+
+
+def _in_thread(function):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(function()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+def test_wal_mode(db):
+    assert db.execute_query("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_each_thread_reads_on_its_own_connection(db):
+    db.execute_query("SELECT 1")
+    main = db.cursor.connection
+    other = _in_thread(lambda: db.execute_query("SELECT 1").connection)
+    assert main is not other
+    assert main is not db.conn
+    # اتصال القراءة للقراءة فقط
+    with pytest.raises(Exception, match="readonly"):
+        main.execute("INSERT INTO departments (name) VALUES ('أ')")
+
+
+def test_reader_sees_committed_state_during_a_write(db):
+    db.conn.execute("BEGIN IMMEDIATE")
+    db.conn.execute("INSERT INTO departments (name) VALUES ('أ')")
+    # القارئ لا ينتظر قفل الكتابة ولا يرى ما لم يُثبَّت
+    count = _in_thread(lambda: db.execute_query("SELECT COUNT(*) FROM departments WHERE name = 'أ'").fetchone()[0])
+    db.conn.commit()
+    assert count == 0
+    assert db.execute_query("SELECT COUNT(*) FROM departments WHERE name = 'أ'").fetchone()[0] == 1
+
+
+def test_read_connection_closed_when_thread_exits(db):
+    db.execute_query("SELECT 1")
+    before = len(db._read_connections)
+    connection = _in_thread(lambda: db.execute_query("SELECT 1").connection)
+    gc.collect()
+    assert len(db._read_connections) == before
+    with pytest.raises(Exception, match="closed"):
+        connection.execute("SELECT 1")
+
+
+def test_write_errors_are_reported(db):
+    with pytest.raises(Exception, match="خطأ في قاعدة البيانات"):
+        db.execute_query("INSERT INTO missing_table VALUES (1)")
+
+
+@pytest.fixture
+def departments(db):
+    db.execute_query("DELETE FROM departments")
+    for name in ["أ", "ب", "ج"]:
+        db.execute_query("INSERT INTO departments (name) VALUES (?)", (name,))
+    return db
+
+
+def test_fetch_helpers(departments):
+    db = departments
+    assert [name for name, in db.fetch_all("SELECT name FROM departments ORDER BY id")] == ["أ", "ب", "ج"]
+    assert db.fetch_one("SELECT name FROM departments WHERE name = ?", ("ب",))[0] == "ب"
+    assert db.fetch_one("SELECT name FROM departments WHERE name = 'د'") is None
+    assert db.fetch_scalar("SELECT COUNT(*) FROM departments") == 3
+    assert db.fetch_scalar("SELECT head_id FROM departments WHERE name = 'أ'", default=0) == 0
+
+
+def test_row_type(departments):
+    Department = row_type('id', 'name')
+    assert Department is row_type('id', 'name')
+    row = departments.fetch_one("SELECT id, name FROM departments WHERE name = 'ب'", row_type=Department)
+    department_id, name = row
+    assert (row.name, row['name'], row[1], name) == ("ب", "ب", "ب", "ب")
+    assert row == (department_id, "ب")
+
+
+def test_iter_rows_in_batches(departments):
+    rows = departments.iter_rows("SELECT name FROM departments ORDER BY id", batch_size=2)
+    assert [row[0] for row in rows] == ["أ", "ب", "ج"]
+    Department = row_type('name')
+    assert [row.name for row in departments.iter_rows(
+        "SELECT name FROM departments ORDER BY id DESC", row_type=Department, batch_size=1
+    )] == ["ج", "ب", "أ"]
+
+
+def test_read_errors_are_reported(db):
+    with pytest.raises(Exception, match="خطأ في قاعدة البيانات"):
+        db.fetch_all("SELECT * FROM missing_table")
+
+
+def _names(db):
+    return [name for name, in db.fetch_all("SELECT name FROM departments WHERE name IN ('أ', 'ب', 'ج') ORDER BY name")]
+
+
+def test_transaction_commits_once(db):
+    with db.transaction():
+        db.execute_query("INSERT INTO departments (name) VALUES ('أ')")
+        # القراءة داخل المعاملة ترى ما لم يُثبَّت بعد
+        assert _names(db) == ["أ"]
+        db.execute_query("INSERT INTO departments (name) VALUES ('ب')")
+        assert db.conn.in_transaction
+    assert not db.conn.in_transaction
+    assert _names(db) == ["أ", "ب"]
+
+
+def test_transaction_rolls_back_on_error(db):
+    with pytest.raises(ValueError):
+        with db.transaction():
+            db.execute_query("INSERT INTO departments (name) VALUES ('أ')")
+            raise ValueError()
+    assert _names(db) == []
+
+
+def test_failed_savepoint_rolls_back_alone(db):
+    with db.transaction():
+        db.execute_query("INSERT INTO departments (name) VALUES ('أ')")
+        with pytest.raises(Exception, match="UNIQUE"):
+            with db.transaction():
+                db.execute_query("INSERT INTO departments (name) VALUES ('ب')")
+                db.execute_query("INSERT INTO departments (name) VALUES ('أ')")
+        db.execute_query("INSERT INTO departments (name) VALUES ('ج')")
+    assert _names(db) == ["أ", "ج"]
@@ -0,0 +1,51 @@
+import sqlite3
+from datetime import date, datetime
+
+import pytest
+
+from day_numbers import DAY_SQL, from_day, month_range, parse_month, to_date, to_day
+
+
+@pytest.mark.parametrize("value", ['1970-01-01', '1969-12-31', '2000-02-29', '2024-12-31', '2024-03-01 23:59:59'])
+def test_to_day_matches_sql(value):
+    conn = sqlite3.connect(":memory:")
+    assert to_day(value) == conn.execute(f"SELECT {DAY_SQL.format(column='?')}", (value,)).fetchone()[0]
+
+
+def test_conversions():
+    assert to_day('1970-01-02') == 1
+    assert to_day(date(2024, 3, 1)) == to_day(datetime(2024, 3, 1, 12)) == to_day('2024-03-01')
+    assert to_day(None) is None
+    assert from_day(to_day('2024-02-29')) == '2024-02-29'
+    assert to_date(to_day('2024-02-29')) == date(2024, 2, 29)
+
+
+def test_month_range():
+    assert month_range(2024, 2) == (to_day('2024-02-01'), to_day('2024-03-01'))
+    assert month_range(2024, 12) == (to_day('2024-12-01'), to_day('2025-01-01'))
+    assert parse_month('2024-12') == month_range(2024, 12)
+
+
+def _plan(db, query, params):
+    return " ".join(row[-1] for row in db.fetch_all("EXPLAIN QUERY PLAN " + query, params))
+
+
+def test_month_filters_use_indexes(db):
+    first, end = month_range(2024, 3)
+    assert "USING INDEX idx_absences_day" in _plan(
+        db, "SELECT id FROM absences WHERE day >= ? AND day < ?", (first, end)
+    )
+    assert "idx_vacations_employee_days" in _plan(
+        db, "SELECT id FROM vacations WHERE employee_id = ? AND start_day < ? AND end_day >= ?", (1, end, first)
+    )
+
+
+def test_day_filter_matches_date_text(db, add_employee):
+    employee_id = add_employee()
+    for day in ['2024-02-29', '2024-03-01', '2024-03-31', '2024-04-01']:
+        db.execute_query(
+            "INSERT INTO absences (employee_id, date, type) VALUES (?, ?, 'غياب')", (employee_id, day)
+        )
+    assert db.fetch_all(
+        "SELECT date FROM absences WHERE day >= ? AND day < ? ORDER BY day", parse_month('2024-03')
+    ) == [('2024-03-01',), ('2024-03-31',)]
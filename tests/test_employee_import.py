@@ -0,0 +1,178 @@
+import pandas as pd
+import pytest
+
+import employee_import
+from employee_import import (
+    ImportPlanner, apply_plan, import_employees, plan_rows, prepare_employees, supplied_columns, write_errors
+)
+from work_schedule import encode
+
+
+def _plan(db, records):
+    df = pd.DataFrame(records)
+    rows, errors = prepare_employees(df)
+    return plan_rows(db, rows, errors, supplied_columns(df.columns))
+
+
+def _employee(serial_number, **values):
+    return {
+        'serial_number': serial_number,
+        'name': f"موظف {serial_number}",
+        'national_id': str(200000000000 + serial_number),
+        **values,
+    }
+
+
+def test_prepare_converts_columns():
+    rows, errors = prepare_employees(pd.DataFrame({
+        'serial_number': [1001.0, 1002.0],
+        'name': [" أ ", "ب"],
+        'national_id': [100000000001, 100000000002],
+        'hiring_date': ["2015-03-01", None],
+        'vacation_balance': [-5, None],
+        'work_days': ["0:M,2:E", None],
+    }))
+    assert errors == []
+    assert rows[['serial_number', 'name', 'national_id', 'department', 'hiring_date', 'vacation_balance']] \
+        .values.tolist() == [
+            ['1001', "أ", '100000000001', "غير محدد", '2015-03-01', 0],
+            ['1002', "ب", '100000000002', "غير محدد", None, 30],
+        ]
+    assert rows[['work_days_mask', 'work_status']].values.tolist()[0] == list(encode("0:M,2:E"))
+
+
+def test_prepare_reports_rows_by_line():
+    rows, errors = prepare_employees(pd.DataFrame({
+        'serial_number': ['1', '2', '', '1', '3'],
+        'name': ["أ", "", "بلا رقم", "ج", "د"],
+        'national_id': ['100000000001', '100000000002', '', '100000000004', '123'],
+        'hiring_date': [None, None, None, "ليس تاريخاً", None],
+    }))
+    assert rows['serial_number'].tolist() == ['1']
+    assert errors == [
+        "سطر 3: حقل الاسم الكامل مطلوب",
+        "سطر 5: تاريخ غير صالح في hiring_date، الرقم الآلي مكرر في الملف",
+        "سطر 6: الرقم الوطني يجب أن يتكون من 12 رقمًا",
+    ]
+
+
+def test_prepare_requires_columns():
+    with pytest.raises(ValueError, match="national_id"):
+        prepare_employees(pd.DataFrame({'serial_number': ['1'], 'name': ["أ"]}))
+
+
+def test_import_in_chunks(db, monkeypatch, tmp_path):
+    monkeypatch.setattr(employee_import, "CHUNK_ROWS", 2)
+    calls = []
+    result = import_employees(
+        db, pd.DataFrame([_employee(number) for number in range(1, 6)] + [{**_employee(6), 'name': ""}]),
+        lambda done, total: calls.append((done, total))
+    )
+    assert result.imported == 5
+    assert result.errors == ["سطر 7: حقل الاسم الكامل مطلوب"]
+    assert calls[-1] == (5, 5)
+    assert db.fetch_scalar("SELECT COUNT(*) FROM employees") == 5
+    path = write_errors(result.errors, str(tmp_path / "errors.log"))
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == "سطر 7: حقل الاسم الكامل مطلوب"
+
+
+@pytest.fixture
+def existing(db, add_employee):
+    """موظفان حاليان برقميهما الآلي والوطني كما في _employee"""
+    return [
+        add_employee(serial_number=str(serial_number), name=f"موظف {serial_number}",
+                     national_id=str(200000000000 + serial_number), department="غير محدد")
+        for serial_number in (1, 2)
+    ]
+
+
+def test_new_employees(db):
+    plan = _plan(db, [_employee(1), _employee(2)])
+    assert plan.inserted['serial_number'].tolist() == ['1', '2']
+    assert plan.updated.empty
+    assert plan.unchanged == 0
+    assert plan.errors == []
+
+
+def test_changed_and_unchanged(db, existing):
+    plan = _plan(db, [_employee(1, name="اسم جديد"), _employee(2), _employee(3)])
+    assert plan.updated[['employee_id', 'name']].values.tolist() == [[existing[0], "اسم جديد"]]
+    assert plan.inserted['serial_number'].tolist() == ['3']
+    assert plan.unchanged == 1
+
+
+def test_match_by_national_id(db, existing):
+    plan = _plan(db, [{**_employee(1), 'serial_number': 10}])
+    assert plan.updated[['employee_id', 'serial_number']].values.tolist() == [[existing[0], '10']]
+    assert plan.inserted.empty
+
+
+def test_absent_columns_are_not_compared(db, existing):
+    db.execute_query("UPDATE employees SET department = 'التمريض'")
+    plan = _plan(db, [_employee(1)])
+    assert plan.unchanged == 1
+    assert 'department' not in plan.columns
+
+
+def test_balance_difference_is_an_adjustment(db, existing):
+    plan = _plan(db, [_employee(1, vacation_balance=25), _employee(2, vacation_balance=30)])
+    assert plan.updated.empty
+    assert [entry[:3] for entry in plan.adjustments] == [(existing[0], "سنوية", -5)]
+    assert plan.unchanged == 1
+
+
+def test_conflicting_keys(db, existing):
+    plan = _plan(db, [{**_employee(1), 'national_id': str(200000000002)}])
+    assert plan.inserted.empty and plan.updated.empty
+    assert plan.errors == ["سطر 2: الرقم الآلي والرقم الوطني مسجلان لموظفين مختلفين"]
+
+
+def test_rejected_rows_keep_their_errors(db):
+    plan = _plan(db, [_employee(1), {**_employee(2), 'national_id': '123'}])
+    assert plan.inserted['serial_number'].tolist() == ['1']
+    assert plan.errors == ["سطر 3: الرقم الوطني يجب أن يتكون من 12 رقمًا"]
+
+
+def test_planner_chunks_match_single_plan(db, existing):
+    records = [_employee(1, name="اسم جديد"), _employee(2, vacation_balance=40), _employee(3)]
+    df = pd.DataFrame(records)
+    planner = ImportPlanner(db, supplied_columns(df.columns))
+    for line in range(len(df)):
+        planner.add(*prepare_employees(df.iloc[[line]], first_line=line + 2))
+    chunked = planner.plan()
+    single = _plan(db, records)
+    assert chunked.summary() == single.summary()
+    assert chunked.updated.equals(single.updated)
+    assert chunked.inserted.equals(single.inserted)
+
+
+def test_apply_plan_posts_adjustments(db, existing):
+    plan = _plan(db, [_employee(1, vacation_balance=25, name="اسم جديد"), _employee(3, vacation_balance=10)])
+    result = apply_plan(db, plan)
+    assert result.imported == 2
+    assert db.fetch_all("SELECT name, vacation_balance FROM employees ORDER BY id") == [
+        ("اسم جديد", 25), ("موظف 2", 30), ("موظف 3", 10)
+    ]
+    assert db.fetch_scalar(
+        "SELECT delta FROM balance_ledger WHERE employee_id = ? AND reason != 'رصيد افتتاحي'", (existing[0],)
+    ) == -5
+    assert _plan(db, [_employee(1, vacation_balance=25, name="اسم جديد")]).unchanged == 1
+
+
+def test_plan_writes_nothing(db, existing):
+    _plan(db, [_employee(1, name="اسم جديد"), _employee(3)])
+    assert db.fetch_all("SELECT name FROM employees ORDER BY id") == [("موظف 1",), ("موظف 2",)]
+
+
+def test_reimport_keeps_employee_records(db, existing):
+    db.execute_query(
+        "INSERT INTO vacations (employee_id, type, start_date, end_date, duration) "
+        "VALUES (?, 'سنوية', '2024-03-01', '2024-03-02', 2)", (existing[0],)
+    )
+    apply_plan(db, _plan(db, [_employee(1, name="اسم جديد", department="التمريض")]))
+    # التعديل في نفس الصف وليس حذفاً وإعادة إدراج
+    assert db.fetch_all("SELECT id, name, department FROM employees ORDER BY id") == [
+        (existing[0], "اسم جديد", "التمريض"), (existing[1], "موظف 2", "غير محدد")
+    ]
+    assert db.fetch_scalar("SELECT COUNT(*) FROM vacations WHERE employee_id = ?", (existing[0],)) == 1
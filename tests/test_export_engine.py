@@ -0,0 +1,78 @@
+import csv
+
+import pytest
+
+from day_numbers import month_range
+from export_engine import EXPORT_TABLES, build_query, count_rows, export_table
+
+
+def test_all_columns_without_filters():
+    select, count, params, keys = build_query('employees')
+    assert keys == [key for key, _, _ in EXPORT_TABLES['employees'].columns]
+    assert select.startswith("SELECT e.serial_number, e.name, ")
+    assert select.endswith("FROM employees e ORDER BY e.name")
+    assert count == "SELECT COUNT(*) FROM employees e"
+    assert params == ()
+
+
+def test_selected_columns_keep_their_order():
+    select, _, _, keys = build_query('absences', ['date', 'name'])
+    assert keys == ['date', 'name']
+    assert select.startswith("SELECT a.date, e.name FROM absences a JOIN employees e")
+
+
+def test_filters_share_the_where_clause():
+    select, count, params, _ = build_query(
+        'vacations', ['name'], {'start_day': 100, 'end_day': 200, 'department': "التمريض", 'status': None}
+    )
+    where = "WHERE v.end_day >= ? AND v.start_day < ? AND e.department = ?"
+    assert where in select
+    assert count.endswith(where)
+    assert params == (100, 200, "التمريض")
+
+
+def test_audit_log_filters_by_date_text():
+    _, _, params, _ = build_query('audit_log', filters={'start_day': 0})
+    assert params == ("1970-01-01",)
+
+
+@pytest.mark.parametrize("name, columns, filters", [
+    ('salaries', None, None),
+    ('employees', ['name', 'password'], None),
+    ('absences', None, {'status': "موافق"}),
+])
+def test_unknown_names_are_rejected(name, columns, filters):
+    with pytest.raises(ValueError):
+        build_query(name, columns, filters)
+
+
+def test_export_csv(db, add_employee, tmp_path):
+    add_employee(name="ب")
+    add_employee(name="أ", department="الصيدلة")
+    path = str(tmp_path / "employees.csv")
+    assert export_table(db, 'employees', path, ['name', 'department']) == 2
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        assert list(csv.reader(f)) == [['name', 'department'], ["أ", "الصيدلة"], ["ب", "التمريض"]]
+
+
+def test_empty_export_creates_no_file(db, tmp_path):
+    path = tmp_path / "vacations.xlsx"
+    assert export_table(db, 'vacations', str(path)) == 0
+    assert not path.exists()
+
+
+def test_count_and_order_override(db, add_employee, tmp_path):
+    first, second = add_employee(name="أ"), add_employee(name="ب")
+    for employee_id, day in [(first, '2024-03-02'), (second, '2024-03-02'), (first, '2024-03-20'), (first, '2024-04-01')]:
+        db.execute_query(
+            "INSERT INTO absences (employee_id, date, type) VALUES (?, ?, 'غياب')", (employee_id, day)
+        )
+    start_day, end_day = month_range(2024, 3)
+    filters = {'start_day': start_day, 'end_day': end_day}
+    assert count_rows(db, 'absences', filters) == 3
+    assert count_rows(db, 'absences', {**filters, 'employee_id': second}) == 1
+
+    path = str(tmp_path / "absences.csv")
+    assert export_table(db, 'absences', path, ['date', 'name'], filters, order="a.day DESC, e.name ASC") == 3
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        assert list(csv.reader(f))[1:] == [['2024-03-20', "أ"], ['2024-03-02', "أ"], ['2024-03-02', "ب"]]
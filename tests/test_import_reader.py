@@ -0,0 +1,123 @@
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+import import_reader
+from import_reader import Sheet, common_columns, list_sheets, read_employees
+
+
+def _save(path, sheets):
+    workbook = Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        ws = workbook.create_sheet(name)
+        for row in rows:
+            ws.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def _employees(numbers, *extra):
+    return [[number, f"موظف {number}", 100000000000 + number, *extra] for number in numbers]
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    return _save(tmp_path / "employees.xlsx", {
+        "أ": [['serial_number', 'name', 'national_id', 'bonus'], *_employees(range(1, 301), 1)],
+        "ب": [['serial_number', 'name', 'national_id'], [5, "مكرر", 100000000999], *_employees([301])],
+        "ملاحظات": [['ملاحظة'], ['لا تُقرأ']],
+    })
+
+
+@pytest.fixture(params=["here", "pool"])
+def workers(request, monkeypatch):
+    """القراءة في العملية الحالية أو في مجموعة عمليات مهما كان حجم الملف"""
+    if request.param == "here":
+        return 1
+    monkeypatch.setattr(import_reader, "POOL_ROWS", 0)
+    return 2
+
+
+def _read(sheets, workers, progress=None):
+    chunks, errors = [], []
+    for rows, chunk_errors in read_employees(sheets, progress, workers):
+        if rows is not None:
+            chunks.append(rows)
+        errors += chunk_errors
+    rows = pd.concat(chunks, ignore_index=True) if chunks else None
+    return rows, errors
+
+
+def test_list_sheets(workbook_path):
+    sheets = list_sheets([workbook_path])
+    assert [(sheet.name, sheet.rows) for sheet in sheets] == [("أ", 301), ("ب", 3), ("ملاحظات", 2)]
+    assert common_columns(sheets) == ['serial_number', 'name', 'national_id']
+
+
+def test_sheets_read_in_order(workbook_path, workers):
+    rows, errors = _read(list_sheets([workbook_path]), workers)
+    assert rows['serial_number'].tolist() == [str(number) for number in range(1, 302)]
+    assert rows['line'].tolist() == [*range(2, 302), 3]
+    assert errors == [
+        "employees.xlsx / ب: سطر 2: الرقم الآلي أو الوطني مكرر في ملف أو ورقة سابقة",
+        "employees.xlsx / ملاحظات: الأعمدة المفقودة: serial_number, name, national_id",
+    ]
+
+
+def test_chunks_keep_line_numbers(workbook_path, workers, monkeypatch):
+    # CHUNK_ROWS يُقرأ في العمليات أيضاً، فلا يُختبر إلا في العملية الحالية
+    if workers == 1:
+        monkeypatch.setattr(import_reader, "CHUNK_ROWS", 70)
+    sheets = list_sheets([workbook_path])[:1]
+    chunks = [rows for rows, _ in read_employees(sheets, workers=workers)]
+    assert pd.concat(chunks)['line'].tolist() == list(range(2, 302))
+
+
+def test_single_sheet(tmp_path, workers):
+    path = _save(tmp_path / "one.xlsx", {"أ": [['serial_number', 'name', 'national_id'], *_employees([1, 2])]})
+    rows, errors = _read(list_sheets([path]), workers)
+    assert rows['serial_number'].tolist() == ['1', '2']
+    assert errors == []
+
+
+def test_header_only(tmp_path, workers):
+    path = _save(tmp_path / "empty.xlsx", {"أ": [['serial_number', 'name', 'national_id']]})
+    calls = []
+    rows, errors = _read(list_sheets([path]), workers, lambda done, total: calls.append((done, total)))
+    assert rows is None
+    assert errors == []
+    assert calls == []
+
+
+def test_failing_sheet_is_reported(workbook_path, workers):
+    sheets = list_sheets([workbook_path])
+    missing = Sheet(workbook_path.replace("employees", "missing"), "أ", 10, sheets[0].columns)
+    rows, errors = _read([missing, sheets[1]], workers)
+    assert rows['serial_number'].tolist() == ['5', '301']
+    assert len(errors) == 1
+    assert errors[0].startswith("missing.xlsx / أ: ")
+
+
+def test_progress_skips_sheets_without_columns(workbook_path, workers):
+    calls = []
+    _read(list_sheets([workbook_path]), workers, lambda done, total: calls.append((done, total)))
+    assert calls == [(300, 302), (302, 302)]
+
+
+def test_progress_can_stop_reading(workbook_path, workers):
+    class Stop(Exception):
+        pass
+
+    def progress(done, total):
+        raise Stop()
+
+    with pytest.raises(Stop):
+        _read(list_sheets([workbook_path]), workers, progress)
+
+
+def test_closing_early(workbook_path, workers):
+    chunks = read_employees(list_sheets([workbook_path]), workers=workers)
+    rows, _ = next(chunks)
+    chunks.close()
+    assert len(rows) == 300
@@ -0,0 +1,50 @@
+import pytest
+
+from day_numbers import to_day
+from leave_calendar import END_DAY, LeaveCalendar, weekday_index
+from work_schedule import encode
+
+
+@pytest.fixture
+def calendar(db):
+    return LeaveCalendar(db)
+
+
+def test_weekday_index_starts_on_saturday():
+    # 2024-03-02 كان سبتاً و 2024-03-08 جمعة
+    assert weekday_index(to_day("2024-03-02")) == 0
+    assert weekday_index(to_day("2024-03-08")) == 6
+
+
+def test_end_date_skips_friday(calendar):
+    # بدون جدول أيام عمل: الجمعة راحة أسبوعية
+    assert calendar.end_date_for(None, "سنوية", "2024-03-06", 3) == "2024-03-09"
+
+
+def test_end_date_skips_holidays(calendar):
+    calendar.add_holiday("2024-03-07", "عطلة")
+    assert calendar.end_date_for(None, "سنوية", "2024-03-06", 3) == "2024-03-10"
+
+
+def test_end_date_follows_work_schedule(calendar, db, add_employee):
+    # السبت والإثنين فقط
+    mask, status = encode("0:M,2:E")
+    employee_id = add_employee(work_days_mask=mask, work_status=status)
+    assert calendar.end_date_for(employee_id, "طارئة", "2024-03-02", 3) == "2024-03-09"
+    assert calendar.working_days(employee_id, "2024-03-02", "2024-03-09") == 3
+
+
+def test_end_date_calendar_days_for_other_types(calendar):
+    assert calendar.end_date_for(None, "مرضية", "2024-03-06", 3) == "2024-03-08"
+
+
+def test_end_date_matches_duration(calendar):
+    end = calendar.end_date_for(None, "سنوية", "2024-02-25", 10)
+    assert calendar.duration_for(None, "سنوية", "2024-02-25", end) == 10
+
+
+def test_end_date_out_of_range(calendar):
+    with pytest.raises(ValueError):
+        calendar.end_date_for(None, "سنوية", "1980-01-01", 1)
+    with pytest.raises(ValueError):
+        calendar.end_date_for(None, "سنوية", "2100-12-20", END_DAY)
@@ -0,0 +1,54 @@
+import pytest
+
+from leave_policy import LeavePolicyEngine
+
+
+@pytest.fixture
+def engine(db):
+    return LeavePolicyEngine(db)
+
+
+def test_rules_by_variant(engine):
+    assert engine.fixed_duration("حج") == 20
+    assert engine.fixed_duration("سنوية") is None
+    assert engine.fixed_duration("وضع", "وضع توأم") == 112
+    # الأصناف تُجرَّب بالترتيب
+    assert engine.fixed_duration("وفاة", "ابن", "وفاة من الدرجة الثانية") == 3
+    assert engine.fixed_duration("وفاة", "زوج", "وفاة من الدرجة الأولى") == 130
+    assert engine.rule("وضع", "غير معروف") is None
+    assert engine.rule("غير معروف") is None
+
+
+def test_validate(engine):
+    assert engine.validate("طارئة", 3) is None
+    assert engine.validate("طارئة", 4) == "مدة إجازة طارئة يجب أن تكون من 1 إلى 3 يوم"
+    assert engine.validate("زواج", 10) == "مدة إجازة زواج يجب أن تكون 14 يوم"
+    assert engine.validate("غير معروف", 1) == "نوع الإجازة غير معروف: غير معروف"
+
+
+def test_evaluate_many_matches_single_requests(engine):
+    requests = [
+        ("سنوية", 10, ""), ("سنوية", 91, ""), ("طارئة", 0, ""), ("حج", 20, ""),
+        ("وضع", 98, "وضع عادي"), ("وضع", 10, "وضع توأم"), ("غير معروف", 5, ""),
+    ]
+    leave_types, durations, variants = zip(*requests)
+    valid, effective = engine.evaluate_many(leave_types, durations, variants)
+    assert valid.tolist() == [
+        engine.validate(leave_type, duration, variant) is None for leave_type, duration, variant in requests
+    ]
+    assert effective.tolist() == [10, 91, 0, 20, 98, 112, 5]
+
+
+def test_rules_reload_after_table_changes(db, engine):
+    assert engine.validate("طارئة", 5) is not None
+    db.execute_query("UPDATE leave_policies SET max_days = 5 WHERE leave_type = 'طارئة'")
+    assert engine.validate("طارئة", 5) is None
+    db.execute_query("INSERT INTO leave_policies (leave_type, min_days, max_days) VALUES ('دراسية', 1, 60)")
+    assert engine.evaluate_many(["دراسية"], [30])[0].tolist() == [True]
+
+
+def test_no_rules(db, engine):
+    db.execute_query("DELETE FROM leave_policies")
+    valid, effective = engine.evaluate_many(["سنوية"], [5])
+    assert valid.tolist() == [False]
+    assert effective.tolist() == [5]
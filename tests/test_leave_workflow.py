@@ -0,0 +1,115 @@
+import pytest
+
+from database import ConcurrentUpdateError
+from leave_workflow import (
+    APPROVED, CANCELLED, PENDING, REJECTED, ROLE_DEPARTMENT_HEAD, ROLE_MANAGER,
+    LeaveWorkflowError, LeaveWorkflowService
+)
+
+
+@pytest.fixture
+def workflow(db):
+    return LeaveWorkflowService(db)
+
+
+@pytest.fixture
+def employee_id(add_employee):
+    return add_employee()
+
+
+@pytest.fixture
+def vacation_id(db, employee_id):
+    db.execute_query(
+        "INSERT INTO vacations (employee_id, type, start_date, end_date, duration) "
+        "VALUES (?, 'سنوية', '2024-03-02', '2024-03-06', 5)",
+        (employee_id,)
+    )
+    return db.fetch_scalar("SELECT MAX(id) FROM vacations")
+
+
+def _state(db, vacation_id):
+    return db.fetch_one("SELECT status, dept_approval FROM vacations WHERE id = ?", (vacation_id,))
+
+
+def _balance(db, employee_id):
+    return db.fetch_scalar("SELECT vacation_balance FROM employees WHERE id = ?", (employee_id,))
+
+
+def _version(db, vacation_id):
+    return db.fetch_scalar("SELECT version FROM vacations WHERE id = ?", (vacation_id,))
+
+
+def test_approval_deducts_once(db, workflow, employee_id, vacation_id):
+    workflow.approve(vacation_id, ROLE_DEPARTMENT_HEAD, actor=7)
+    assert tuple(_state(db, vacation_id)) == (PENDING, APPROVED)
+    assert _balance(db, employee_id) == 30
+
+    workflow.approve(vacation_id, ROLE_MANAGER, actor="المدير")
+    assert tuple(_state(db, vacation_id)) == (APPROVED, APPROVED)
+    assert _balance(db, employee_id) == 25
+
+    with pytest.raises(LeaveWorkflowError):
+        workflow.approve(vacation_id, ROLE_MANAGER)
+    assert _balance(db, employee_id) == 25
+
+
+def test_manager_needs_department_approval(db, workflow, employee_id, vacation_id):
+    with pytest.raises(LeaveWorkflowError):
+        workflow.approve(vacation_id, ROLE_MANAGER)
+    assert tuple(_state(db, vacation_id)) == (PENDING, PENDING)
+    assert _balance(db, employee_id) == 30
+
+
+def test_department_rejection_is_final(db, workflow, vacation_id):
+    workflow.reject(vacation_id, ROLE_DEPARTMENT_HEAD)
+    assert tuple(_state(db, vacation_id)) == (PENDING, REJECTED)
+    with pytest.raises(LeaveWorkflowError):
+        workflow.approve(vacation_id, ROLE_DEPARTMENT_HEAD)
+    with pytest.raises(LeaveWorkflowError):
+        workflow.cancel(vacation_id)
+
+
+def test_manager_rejection_keeps_balance(db, workflow, employee_id, vacation_id):
+    workflow.approve(vacation_id, ROLE_DEPARTMENT_HEAD)
+    workflow.reject(vacation_id, ROLE_MANAGER)
+    assert tuple(_state(db, vacation_id)) == (REJECTED, APPROVED)
+    assert _balance(db, employee_id) == 30
+
+
+def test_cancel_pending_has_no_entry(db, workflow, vacation_id):
+    workflow.cancel(vacation_id)
+    assert tuple(_state(db, vacation_id)) == (CANCELLED, CANCELLED)
+    assert db.fetch_scalar("SELECT COUNT(*) FROM balance_ledger WHERE vacation_id = ?", (vacation_id,)) == 0
+    with pytest.raises(LeaveWorkflowError):
+        workflow.cancel(vacation_id)
+
+
+def test_cancel_approved_restores_balance(db, workflow, employee_id, vacation_id):
+    workflow.approve(vacation_id, ROLE_DEPARTMENT_HEAD)
+    workflow.approve(vacation_id, ROLE_MANAGER)
+    workflow.cancel(vacation_id, employee_id=employee_id)
+    assert _balance(db, employee_id) == 30
+    assert db.fetch_all(
+        "SELECT delta FROM balance_ledger WHERE vacation_id = ? ORDER BY id", (vacation_id,)
+    ) == [(-5,), (5,)]
+
+
+def test_cancel_by_another_employee(db, workflow, add_employee, vacation_id):
+    other_id = add_employee()
+    with pytest.raises(LeaveWorkflowError, match="تعذر العثور"):
+        workflow.cancel(vacation_id, employee_id=other_id)
+    assert tuple(_state(db, vacation_id)) == (PENDING, PENDING)
+
+
+def test_stale_version(db, workflow, vacation_id):
+    version = _version(db, vacation_id)
+    workflow.approve(vacation_id, ROLE_DEPARTMENT_HEAD, version=version)
+    with pytest.raises(ConcurrentUpdateError):
+        workflow.approve(vacation_id, ROLE_MANAGER, version=version)
+    workflow.approve(vacation_id, ROLE_MANAGER, version=_version(db, vacation_id))
+    assert tuple(_state(db, vacation_id)) == (APPROVED, APPROVED)
+
+
+def test_missing_vacation(workflow):
+    with pytest.raises(LeaveWorkflowError, match="تعذر العثور"):
+        workflow.approve(999, ROLE_DEPARTMENT_HEAD)
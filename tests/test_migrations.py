@@ -0,0 +1,221 @@
+import sqlite3
+
+import pytest
+
+import database
+import query_profiler
+from database import DatabaseManager
+from day_numbers import to_day
+from migrations import LATEST_VERSION, migrate, schema_version
+from work_schedule import encode
+
+
+# المخطط كما أنشأه الإصدار الأساسي قبل الترحيلات (user_version = 0)
+BASELINE_SCHEMA = """
+    CREATE TABLE employees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        serial_number TEXT UNIQUE NOT NULL,
+        name TEXT NOT NULL,
+        national_id TEXT UNIQUE NOT NULL,
+        department TEXT,
+        job_grade TEXT,
+        hiring_date TEXT,
+        grade_date TEXT,
+        bonus INTEGER DEFAULT 0,
+        vacation_balance INTEGER DEFAULT 30,
+        emergency_vacation_balance INTEGER DEFAULT 12,
+        work_days TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE departments (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE NOT NULL,
+        head_id INTEGER,
+        head_password TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE vacations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        type TEXT NOT NULL,
+        subtype TEXT,
+        relation TEXT,
+        start_date TEXT NOT NULL,
+        end_date TEXT NOT NULL,
+        duration INTEGER NOT NULL,
+        notes TEXT,
+        status TEXT DEFAULT 'تحت الإجراء',
+        dept_approval TEXT DEFAULT 'تحت الإجراء',
+        dept_approver TEXT,
+        approved_by TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE
+    );
+    CREATE TABLE absences (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        employee_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        type TEXT NOT NULL,
+        duration INTEGER DEFAULT 1,
+        notes TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (employee_id) REFERENCES employees(id) ON DELETE CASCADE,
+        UNIQUE(employee_id, date)
+    );
+    CREATE TABLE audit_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        action TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        record_id INTEGER,
+        changes TEXT,
+        user TEXT,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP
+    );
+    INSERT INTO departments (name) VALUES ('الإدارة'), ('التمريض');
+    CREATE INDEX idx_emp_national_id ON employees(national_id);
+    CREATE INDEX idx_emp_department ON employees(department);
+    CREATE INDEX idx_vacations_employee ON vacations(employee_id);
+    CREATE INDEX idx_vacations_date ON vacations(start_date, end_date);
+    CREATE INDEX idx_absences_employee_date ON absences(employee_id, date);
+"""
+
+
+@pytest.fixture
+def baseline_path(tmp_path, monkeypatch):
+    """ملف قاعدة بيانات بالمخطط الأساسي وفيه بيانات؛ DatabaseManager() يرحّله"""
+    path = str(tmp_path / "employees.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.executemany(
+        "INSERT INTO employees (serial_number, name, national_id, department, vacation_balance, work_days) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            ('1', "أ", '100000000001', "التمريض", 25, "0:M,2:E"),
+            ('2', "ب", '100000000002', "الإدارة", None, "الندب"),
+        ]
+    )
+    conn.executemany(
+        "INSERT INTO vacations (employee_id, type, start_date, end_date, duration, status, dept_approval) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (1, "سنوية", '2024-03-01', '2024-03-05', 5, "موافق", "موافق"),
+            (1, "سنوية", '2024-04-01', '2024-04-02', 2, "مرفوض", "موافق"),
+            (2, "طارئة", '2024-05-10', '2024-05-10', 1, "تحت الإجراء", "تحت الإجراء"),
+        ]
+    )
+    conn.execute("INSERT INTO absences (employee_id, date, type) VALUES (1, '2024-02-01', 'غياب')")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(database, "DB_PATH", path)
+    monkeypatch.setattr(query_profiler, "SLOW_LOG_PATH", str(tmp_path / "slow_queries.log"))
+    return path
+
+
+def _schema(path):
+    conn = sqlite3.connect(path)
+    try:
+        schema = conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+        counts = {
+            name: conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+            for kind, name, _ in schema if kind == 'table'
+        }
+        return schema, counts
+    finally:
+        conn.close()
+
+
+def _indexes(path):
+    return {name for kind, name, _ in _schema(path)[0] if kind == 'index'}
+
+
+def test_upgrade_keeps_rows(baseline_path):
+    db = DatabaseManager()
+    assert db.fetch_scalar("PRAGMA user_version") == LATEST_VERSION
+    assert db.fetch_all("SELECT serial_number, name, vacation_balance FROM employees ORDER BY id") == [
+        ('1', "أ", 25), ('2', "ب", None)
+    ]
+    assert db.fetch_scalar("SELECT COUNT(*) FROM vacations") == 3
+    assert db.fetch_scalar("SELECT COUNT(*) FROM absences") == 1
+    # الأقسام الافتراضية الناقصة فقط
+    assert db.fetch_scalar("SELECT COUNT(*) FROM departments") == 5
+
+
+def test_migrating_twice_changes_nothing(baseline_path):
+    DatabaseManager()
+    before = _schema(baseline_path)
+    conn = sqlite3.connect(baseline_path)
+    assert migrate(conn) == LATEST_VERSION
+    conn.close()
+    DatabaseManager()
+    assert _schema(baseline_path) == before
+
+
+def test_upgrade_in_steps(baseline_path):
+    conn = sqlite3.connect(baseline_path)
+    assert migrate(conn, target=1) == 1
+    assert schema_version(conn) == 1
+    assert migrate(conn) == LATEST_VERSION
+    conn.close()
+
+
+def test_workload_indexes_replace_the_employee_index(baseline_path):
+    DatabaseManager()
+    indexes = _indexes(baseline_path)
+    assert 'idx_vacations_employee' not in indexes
+    assert {
+        'idx_vacations_employee_start', 'idx_vacations_pending', 'idx_vacations_status', 'idx_audit_log_record'
+    } <= indexes
+
+
+def test_day_columns_are_generated(baseline_path):
+    db = DatabaseManager()
+    assert tuple(db.fetch_one("SELECT start_day, end_day FROM vacations WHERE id = 1")) == (
+        to_day('2024-03-01'), to_day('2024-03-05')
+    )
+    assert db.fetch_scalar("SELECT day FROM absences") == to_day('2024-02-01')
+    db.execute_query("UPDATE vacations SET end_date = '2024-03-09' WHERE id = 1")
+    assert db.fetch_scalar("SELECT end_day FROM vacations WHERE id = 1") == to_day('2024-03-09')
+    assert {'idx_absences_day', 'idx_vacations_employee_days'} <= _indexes(baseline_path)
+
+
+def test_interval_index_backfill(baseline_path):
+    db = DatabaseManager()
+    # الإجازة المرفوضة ليست في الفهرس
+    assert db.fetch_all("SELECT id, min_employee, start_day, end_day FROM vacation_intervals ORDER BY id") == [
+        (1, 1, to_day('2024-03-01'), to_day('2024-03-05')),
+        (3, 2, to_day('2024-05-10'), to_day('2024-05-10')),
+    ]
+    db.execute_query("UPDATE vacations SET status = 'ملغاة' WHERE id = 3")
+    assert db.fetch_all("SELECT id FROM vacation_intervals") == [(1,)]
+
+
+def test_work_days_mask_backfill(baseline_path):
+    db = DatabaseManager()
+    assert db.fetch_all("SELECT work_days_mask, work_status FROM employees ORDER BY id") == [
+        encode("0:M,2:E"), encode("الندب")
+    ]
+
+
+def test_opening_balances_backfill(baseline_path):
+    db = DatabaseManager()
+    assert db.fetch_all(
+        "SELECT employee_id, balance_type, delta, reason FROM balance_ledger ORDER BY employee_id, balance_type"
+    ) == [
+        (1, "سنوية", 25, "رصيد افتتاحي"), (1, "طارئة", 12, "رصيد افتتاحي"),
+        (2, "سنوية", 0, "رصيد افتتاحي"), (2, "طارئة", 12, "رصيد افتتاحي"),
+    ]
+    # القيد الافتتاحي لا يُطبَّق على العمود
+    assert db.fetch_all("SELECT vacation_balance, emergency_vacation_balance FROM employees ORDER BY id") == [
+        (25, 12), (None, 12)
+    ]
+
+
+def test_row_versions(baseline_path):
+    db = DatabaseManager()
+    assert db.fetch_all("SELECT DISTINCT version FROM vacations") == [(0,)]
+    # تعديل لا يزيد الإصدار بنفسه يزيده المشغّل
+    db.execute_query("UPDATE employees SET name = 'ج' WHERE id = 1")
+    assert db.fetch_scalar("SELECT version FROM employees WHERE id = 1") == 1
+    assert db.compare_and_swap("employees", 1, 1, {'name': "د"}) is True
+    assert db.fetch_scalar("SELECT version FROM employees WHERE id = 1") == 2
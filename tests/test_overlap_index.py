@@ -0,0 +1,66 @@
+import pytest
+
+from overlap_index import VacationOverlapIndex
+
+
+@pytest.fixture
+def index(db):
+    return VacationOverlapIndex(db)
+
+
+def _add_vacation(db, employee_id, start, end, status="موافق", dept_approval="موافق"):
+    db.execute_query(
+        "INSERT INTO vacations (employee_id, type, start_date, end_date, duration, status, dept_approval) "
+        "VALUES (?, 'سنوية', ?, ?, 1, ?, ?)",
+        (employee_id, start, end, status, dept_approval)
+    )
+    return db.fetch_scalar("SELECT MAX(id) FROM vacations")
+
+
+def test_has_overlap(db, add_employee, index):
+    employee_id, other_id = add_employee(), add_employee()
+    vacation_id = _add_vacation(db, employee_id, '2024-03-10', '2024-03-15')
+    # الحدود داخلة في الفترة
+    assert index.has_overlap(employee_id, '2024-03-15', '2024-03-20')
+    assert index.has_overlap(employee_id, '2024-03-01', '2024-03-10')
+    assert index.has_overlap(employee_id, '2024-03-11', '2024-03-12')
+    assert not index.has_overlap(employee_id, '2024-03-16', '2024-03-20')
+    assert not index.has_overlap(other_id, '2024-03-10', '2024-03-15')
+    # تعديل الإجازة نفسها لا يتداخل معها
+    assert not index.has_overlap(employee_id, '2024-03-10', '2024-03-16', exclude_id=vacation_id)
+
+
+def test_inactive_vacations_are_ignored(db, add_employee, index):
+    employee_id = add_employee()
+    _add_vacation(db, employee_id, '2024-03-10', '2024-03-15', status="مرفوض")
+    _add_vacation(db, employee_id, '2024-04-10', '2024-04-15', dept_approval="مرفوض")
+    assert not index.has_overlap(employee_id, '2024-01-01', '2024-12-31')
+
+
+def test_index_follows_changes(db, add_employee, index):
+    employee_id = add_employee()
+    vacation_id = _add_vacation(db, employee_id, '2024-03-10', '2024-03-15', status="تحت الإجراء")
+    db.execute_query("UPDATE vacations SET end_date = '2024-03-20' WHERE id = ?", (vacation_id,))
+    assert index.has_overlap(employee_id, '2024-03-18', '2024-03-18')
+    db.execute_query("UPDATE vacations SET status = 'ملغاة' WHERE id = ?", (vacation_id,))
+    assert not index.has_overlap(employee_id, '2024-03-18', '2024-03-18')
+    db.execute_query("UPDATE vacations SET status = 'موافق' WHERE id = ?", (vacation_id,))
+    assert index.has_overlap(employee_id, '2024-03-18', '2024-03-18')
+    db.execute_query("DELETE FROM vacations WHERE id = ?", (vacation_id,))
+    assert db.fetch_scalar("SELECT COUNT(*) FROM vacation_intervals") == 0
+
+
+def test_overlaps_for_employees(db, add_employee, index):
+    first, second, third = add_employee(), add_employee(), add_employee()
+    _add_vacation(db, first, '2024-03-12', '2024-03-14')
+    _add_vacation(db, second, '2024-03-01', '2024-03-31')
+    _add_vacation(db, third, '2024-03-10', '2024-03-10')
+    _add_vacation(db, first, '2024-05-01', '2024-05-02')
+
+    assert [row.employee_id for row in index.overlaps('2024-03-10', '2024-03-20')] == [second, third, first]
+    # الموظف بين أصغر وأكبر رقم مطلوب لا يظهر إذا لم يُطلب
+    assert [row.employee_id for row in index.overlaps('2024-03-10', '2024-03-20', [first, third])] == [third, first]
+    assert [row.start_date for row in index.employee_overlaps(first, '2024-01-01', '2024-12-31')] == [
+        '2024-03-12', '2024-05-01'
+    ]
+    assert index.overlaps('2024-03-10', '2024-03-20', []) == []
@@ -0,0 +1,106 @@
+import json
+import logging
+
+from query_profiler import QueryProfiler, redact_params, statement_shape
+
+
+def test_statement_shape():
+    assert statement_shape(
+        "SELECT *  FROM employees\n WHERE name = 'أ' AND id IN (1, 2, 3) AND bonus > 2.5"
+    ) == statement_shape("SELECT * FROM employees WHERE name = 'ب' AND id IN (?, ?) AND bonus > 7")
+
+
+def test_redact_params():
+    assert redact_params("SELECT id FROM employees WHERE name = ?", ["أ"]) == ["أ"]
+    assert redact_params("SELECT id FROM employees WHERE National_ID = ?", ["1"]) == [None]
+    assert redact_params("UPDATE departments SET head_password = ? WHERE id = ?", ["x", 1]) == [None, None]
+
+
+def test_statistics_and_report():
+    profiler = QueryProfiler()
+    profiler.record("SELECT * FROM employees WHERE id = ?", [1], 2.0)
+    profiler.record("SELECT * FROM employees WHERE id = 5", [], 700.0)
+    profiler.record("SELECT 1", [], 0.5)
+    (shape, stats), _ = profiler.snapshot()
+    assert shape == "SELECT * FROM employees WHERE id = ?"
+    assert (stats.count, stats.total_ms, stats.max_ms, stats.slow_count) == (2, 702.0, 700.0, 1)
+    assert stats.buckets == [0, 1, 0, 0, 0, 0, 1, 0]
+    assert "<=5ms:1  <=1000ms:1" in profiler.report()
+
+
+def test_slow_log_has_plan_but_no_values(caplog):
+    profiler = QueryProfiler(slow_ms=10)
+    with caplog.at_level(logging.WARNING, logger="slow_queries"):
+        profiler.record("SELECT id FROM employees WHERE name = ?", ["سري"], 1.0)
+        profiler.record(
+            "SELECT id FROM employees WHERE name = ?", ["سري"], 50.0,
+            explain=lambda: [(2, 0, 0, "SCAN employees")]
+        )
+    assert len(caplog.records) == 1
+    message = caplog.records[0].getMessage()
+    assert "SCAN employees" in message
+    assert "str" in message
+    assert "سري" not in message
+
+
+def test_failed_explain_is_logged(caplog):
+    def explain():
+        raise ValueError("no plan")
+
+    with caplog.at_level(logging.WARNING, logger="slow_queries"):
+        QueryProfiler(slow_ms=0).record("SELECT 1", [], 1.0, explain=explain)
+    assert "no plan" in caplog.records[0].getMessage()
+
+
+def _load(path):
+    with open(path, encoding='utf-8') as f:
+        return {entry['shape']: entry for entry in json.load(f)}
+
+
+def test_workload_keeps_only_types(tmp_path):
+    path = str(tmp_path / "workload.json")
+    profiler = QueryProfiler()
+    profiler.record("SELECT id FROM employees WHERE name = ?", ["أ"], 1.0)
+    profiler.save_workload(path)
+    entry = _load(path)["SELECT id FROM employees WHERE name = ?"]
+    assert entry['param_types'] == ["str"]
+    assert 'params' not in entry
+
+
+def test_workload_with_captured_params(tmp_path):
+    path = str(tmp_path / "workload.json")
+    profiler = QueryProfiler(capture_params=True)
+    profiler.record("SELECT id FROM employees WHERE name = ?", ["أ"], 1.0)
+    profiler.record("SELECT id FROM employees WHERE national_id = ?", ["100000000001"], 1.0)
+    profiler.save_workload(path)
+    workload = _load(path)
+    assert workload["SELECT id FROM employees WHERE name = ?"]['params'] == ["أ"]
+    assert workload["SELECT id FROM employees WHERE national_id = ?"]['params'] == [None]
+
+
+def test_workload_saves_only_new_executions(tmp_path):
+    path = str(tmp_path / "workload.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        # ملف قديم بقيم غير ممحوة
+        json.dump([{
+            'shape': "SELECT name FROM departments WHERE ? = ?", 'query': "SELECT name FROM departments WHERE ? = ?",
+            'params': ["x", 1], 'count': 4, 'total_ms': 4.0,
+        }], f)
+    profiler = QueryProfiler()
+    profiler.record("SELECT name FROM departments WHERE ? = ?", ["x", 1], 1.0)
+    profiler.save_workload(path)
+    profiler.record("SELECT name FROM departments WHERE ? = ?", ["x", 1], 1.0)
+    profiler.save_workload(path)
+    profiler.save_workload(path)
+    entry = _load(path)["SELECT name FROM departments WHERE ? = ?"]
+    assert (entry['count'], entry['total_ms']) == (6, 6.0)
+    assert entry['param_types'] == ["str", "int"]
+    assert 'params' not in entry
+
+
+def test_database_queries_are_recorded(db):
+    db.execute_query("INSERT INTO departments (name) VALUES (?)", ("أ",))
+    db.fetch_all("SELECT name FROM departments WHERE name = ?", ("أ",))
+    shapes = {shape: stats.count for shape, stats in db.profiler.snapshot()}
+    assert shapes["INSERT INTO departments (name) VALUES (?)"] == 1
+    assert shapes["SELECT name FROM departments WHERE name = ?"] == 1
@@ -0,0 +1,48 @@
+import numpy as np
+
+from staffing_coverage import daily_counts, merge_intervals
+
+
+def _merge(employee_ids, starts, ends):
+    starts, ends = merge_intervals(
+        np.array(employee_ids, dtype=np.int64),
+        np.array(starts, dtype=np.int64),
+        np.array(ends, dtype=np.int64),
+    )
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def test_merge_overlapping_and_adjacent():
+    assert _merge([1, 1, 1, 1], [20, 10, 12, 16], [25, 13, 15, 18]) == [(10, 18), (20, 25)]
+
+
+def test_merge_contained_interval():
+    assert _merge([1, 1], [10, 12], [30, 14]) == [(10, 30)]
+
+
+def test_merge_keeps_employees_apart():
+    # نفس الأيام لموظفين مختلفين غياب شخصين
+    assert _merge([2, 1, 2], [10, 10, 13], [12, 12, 20]) == [(10, 12), (10, 20)]
+
+
+def test_merge_empty():
+    assert _merge([], [], []) == []
+
+
+def test_daily_counts_clips_to_range():
+    counts = daily_counts(np.array([5, 9]), np.array([10, 20]), 8, 12)
+    assert counts.tolist() == [1, 2, 2, 1]
+
+
+def test_absence_spanning_range_start(db, add_employee):
+    from day_numbers import to_day
+    from staffing_coverage import StaffingCoverage
+
+    employee_id = add_employee()
+    db.execute_query(
+        "INSERT INTO absences (employee_id, date, type, duration) VALUES (?, ?, ?, ?)",
+        (employee_id, "2024-03-01", "غياب", 5)
+    )
+    first_day = to_day("2024-03-03")
+    off = StaffingCoverage(db).off_per_day("التمريض", first_day, first_day + 5)
+    assert off.tolist() == [1, 1, 1, 0, 0]
@@ -0,0 +1,39 @@
+import pytest
+
+from work_schedule import (
+    STATUS_DEDICATION, STATUS_REGULAR, STATUS_SECONDMENT, bit, day_periods, decode, encode, period_mask
+)
+
+
+def test_encode_days_and_periods():
+    assert encode("0:M,2:E,5:F") == (bit(0, 0) | bit(2, 1) | bit(5, 2), STATUS_REGULAR)
+
+
+@pytest.mark.parametrize("text, status", [("الندب", STATUS_SECONDMENT), (" تفرغ ", STATUS_DEDICATION)])
+def test_encode_status(text, status):
+    assert encode(text) == (0, status)
+
+
+@pytest.mark.parametrize("text", ["", None, "7:M", "1:X", "a:M", "1:ME", "1"])
+def test_encode_ignores_invalid_items(text):
+    assert encode(text) == (0, STATUS_REGULAR)
+
+
+def test_encode_skips_invalid_items_only():
+    assert encode("1:M, 9:E ,3:F") == (bit(1, 0) | bit(3, 2), STATUS_REGULAR)
+
+
+@pytest.mark.parametrize("text", ["0:M,2:E,5:F", "0:M,1:M,2:M,3:M,4:M,5:M,6:M", "الندب", "تفرغ", ""])
+def test_decode_round_trip(text):
+    assert decode(*encode(text)) == text
+
+
+def test_day_periods_takes_first_period_of_each_day():
+    assert day_periods(bit(3, 1) | bit(3, 2) | bit(0, 0)) == {0: 0, 3: 1}
+
+
+def test_period_mask_matches_full_day():
+    mask, _ = encode("2:F")
+    assert mask & period_mask(2, 0)
+    assert mask & period_mask(2, 1)
+    assert not mask & period_mask(1, 0)
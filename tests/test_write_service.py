@@ -0,0 +1,155 @@
+import multiprocessing
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import write_service
+from database import ConcurrentUpdateError, DatabaseManager
+from write_service import GroupCommitWriter
+
+
+class RecordingWriter(GroupCommitWriter):
+    """يسجل حجم كل دفعة"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    def _commit_batch(self, conn, batch):
+        self.batches.append(len(batch))
+        super()._commit_batch(conn, batch)
+
+
+@pytest.fixture
+def writer(db):
+    writer = RecordingWriter(db.db_path, max_delay=0.2, busy_timeout=0.05)
+    yield writer
+    if writer.is_alive():
+        writer.stop()
+
+
+def _insert(name):
+    return ("INSERT INTO departments (name) VALUES (?)", (name,), False)
+
+
+def _submit_all(client, units):
+    """إرسال كل وحدة من خيط مستقل؛ يرجع {الترتيب: النتيجة أو الاستثناء}"""
+    results = {}
+
+    def submit(index, statements):
+        try:
+            results[index] = client.submit(statements, timeout=10)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=submit, args=item) for item in enumerate(units)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+
+def _wait_queued(writer, count):
+    deadline = time.monotonic() + 5
+    while writer.requests.qsize() < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_requests_are_batched(db, writer):
+    client = writer.register_client()
+    threads, results = _submit_all(client, [[_insert(f"قسم {index}")] for index in range(6)])
+    _wait_queued(writer, 6)
+    writer.start()
+    for thread in threads:
+        thread.join()
+    assert writer.batches == [6]
+    # كل Future تستلم نتيجة طلبها
+    for index, result in results.items():
+        assert db.fetch_scalar("SELECT name FROM departments WHERE id = ?", (result.lastrowid,)) == f"قسم {index}"
+
+
+def test_failed_unit_rolls_back_alone(db, writer):
+    client = writer.register_client()
+    threads, results = _submit_all(client, [
+        [_insert("أ")],
+        [_insert("ب"), _insert("أ")],
+        [_insert("ج")],
+    ])
+    _wait_queued(writer, 3)
+    writer.start()
+    for thread in threads:
+        thread.join()
+    assert writer.batches == [3]
+    assert isinstance(results[1], Exception) and "UNIQUE" in str(results[1])
+    assert [row[0] for row in db.fetch_all(
+        "SELECT name FROM departments WHERE name IN ('أ', 'ب', 'ج') ORDER BY name"
+    )] == ["أ", "ج"]
+
+
+def test_version_conflict(db, writer):
+    db.execute_query("INSERT INTO employees (serial_number, name, national_id) VALUES ('1', 'أ', '1')")
+    writer.start()
+    shared = DatabaseManager(write_client=writer.register_client())
+    version = shared.fetch_scalar("SELECT version FROM employees WHERE id = 1")
+    assert shared.compare_and_swap("employees", 1, version, {'name': "ب"}) is True
+    with pytest.raises(ConcurrentUpdateError):
+        shared.compare_and_swap("employees", 1, version, {'name': "ج"})
+    assert db.fetch_scalar("SELECT name FROM employees WHERE id = 1") == "ب"
+
+
+def _hold_lock(path, seconds):
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+    conn.execute("BEGIN IMMEDIATE")
+    timer = threading.Timer(seconds, lambda: conn.execute("ROLLBACK"))
+    timer.start()
+    return timer
+
+
+def test_busy_batch_is_retried(db, writer, monkeypatch):
+    monkeypatch.setattr(write_service, "RETRY_DELAY", 0.05)
+    client = writer.register_client()
+    writer.start()
+    timer = _hold_lock(db.db_path, 0.2)
+    assert client.submit([_insert("أ")], timeout=10).rowcount == 1
+    timer.join()
+    assert len(writer.batches) == 1
+
+
+def test_busy_batch_fails_after_retries(db, writer, monkeypatch):
+    monkeypatch.setattr(write_service, "RETRY_DELAY", 0.05)
+    client = writer.register_client()
+    writer.start()
+    timer = _hold_lock(db.db_path, 3)
+    with pytest.raises(Exception, match="locked"):
+        client.submit([_insert("أ")], timeout=10)
+    timer.join()
+    assert client.submit([_insert("أ")], timeout=10).rowcount == 1
+
+
+def test_stopped_writer(writer):
+    client = writer.register_client()
+    writer.start()
+    writer.stop()
+    with pytest.raises(Exception, match="متوقفة"):
+        client.submit([_insert("أ")], timeout=10)
+
+
+def test_submit_timeout(writer):
+    client = writer.register_client()
+    with pytest.raises(Exception, match="خلال"):
+        client.submit([_insert("أ")], timeout=0.2)
+
+
+def _insert_from_process(client, name):
+    client.submit([_insert(name)], timeout=10)
+
+
+def test_client_in_another_process(db, writer):
+    client = writer.register_client()
+    writer.start()
+    process = multiprocessing.Process(target=_insert_from_process, args=(client, "من البوت"))
+    process.start()
+    process.join(20)
+    assert process.exitcode == 0
+    assert db.fetch_scalar("SELECT COUNT(*) FROM departments WHERE name = 'من البوت'") == 1
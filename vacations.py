@@ -6,6 +6,12 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import QDate, Qt
 from PyQt6.QtGui import QFont, QColor, QBrush
+from overlap_index import VacationOverlapIndex
+from staffing_coverage import StaffingCoverage
+from leave_calendar import LeaveCalendar, WORKING_DAY_TYPES
+from leave_workflow import LeaveWorkflowService, LeaveWorkflowError
+from database import ConcurrentUpdateError
+from leave_policy import LeavePolicyEngine
 
 class VacationsTab(QWidget):
     def __init__(self, db_manager, user_role="manager", department_name=None):
@@ -13,6 +19,11 @@ class VacationsTab(QWidget):
         self.db = db_manager
         self.user_role = user_role
         self.department_name = department_name  # اسم القسم لرئيس القسم فقط
+        self.overlap_index = VacationOverlapIndex(self.db)
+        self.coverage = StaffingCoverage(self.db)
+        self.calendar = LeaveCalendar(self.db)
+        self.workflow = LeaveWorkflowService(self.db)
+        self.policies = LeavePolicyEngine(self.db)
         self.setup_ui()
         self.load_employees()
         self.load_vacations()
@@ -43,6 +54,8 @@ class VacationsTab(QWidget):
 
         self.employee_combo = QComboBox()
         self.employee_combo.setStyleSheet("QComboBox { font-size: 13px; }")
+        # المدة المحتسبة تعتمد على أيام عمل الموظف
+        self.employee_combo.currentIndexChanged.connect(self.update_duration)
         input_form.addRow("الموظف:", self.employee_combo)
 
         self.vacation_type = QComboBox()
@@ -57,14 +70,14 @@ class VacationsTab(QWidget):
         self.death_type_combo.addItems(["وفاة من الدرجة الأولى", "وفاة من الدرجة الثانية"])
         self.death_type_combo.setVisible(False)
         self.death_type_combo.setStyleSheet("QComboBox { font-size: 13px; }")
-        self.death_type_combo.currentTextChanged.connect(self.update_death_vacation_duration)
+        self.death_type_combo.currentTextChanged.connect(self.apply_leave_policy)
         input_form.addRow("نوع الوفاة:", self.death_type_combo)
 
         self.birth_type_combo = QComboBox()
         self.birth_type_combo.addItems(["وضع عادي", "وضع توأم"])
         self.birth_type_combo.setVisible(False)
         self.birth_type_combo.setStyleSheet("QComboBox { font-size: 13px; }")
-        self.birth_type_combo.currentTextChanged.connect(self.update_birth_vacation_duration)
+        self.birth_type_combo.currentTextChanged.connect(self.apply_leave_policy)
         input_form.addRow("نوع الوضع:", self.birth_type_combo)
 
         dates_group = QGroupBox("فترة الإجازة")
@@ -170,67 +183,43 @@ class VacationsTab(QWidget):
         today = QDate.currentDate()
         self.start_date.setDate(today)
         self.end_date.setDate(today)
-        if vac_type == "طارئة":
-            self.days_count.setRange(1, 3)
-            self.days_count.setValue(1)
+        self.apply_leave_policy()
+
+    def leave_variants(self, vac_type):
+        """أصناف القاعدة المختارة في النموذج (درجة الوفاة أو نوع الوضع)"""
+        if vac_type == "وفاة":
+            return (self.death_type_combo.currentText(),)
+        if vac_type == "وضع":
+            return (self.birth_type_combo.currentText(),)
+        return ()
+
+    def apply_leave_policy(self):
+        """ضبط حقل المدة حسب قاعدة النوع في leave_policies"""
+        vac_type = self.vacation_type.currentText()
+        rule = self.policies.rule(vac_type, *self.leave_variants(vac_type))
+        if rule is None:
             self.days_count.setReadOnly(False)
-        elif vac_type == "سنوية":
-            self.days_count.setRange(1, 90)
-            self.days_count.setValue(1)
-            self.days_count.setReadOnly(False)
-        elif vac_type == "حج":
-            self.days_count.setRange(20, 20)
-            self.days_count.setValue(20)
-            self.days_count.setReadOnly(True)
-        elif vac_type == "زواج":
-            self.days_count.setRange(14, 14)
-            self.days_count.setValue(14)
-            self.days_count.setReadOnly(True)
-        elif vac_type == "وضع":
-            self.update_birth_vacation_duration()
-        elif vac_type == "مرضية":
-            self.days_count.setRange(1, 30)
-            self.days_count.setValue(1)
-            self.days_count.setReadOnly(False)
-        elif vac_type == "وفاة":
-            self.update_death_vacation_duration()
-        else:
-            self.days_count.setReadOnly(False)
-
-    def update_death_vacation_duration(self):
-        if self.death_type_combo.currentText() == "وفاة من الدرجة الأولى":
-            self.days_count.setRange(7, 7)
-            self.days_count.setValue(7)
-            self.days_count.setReadOnly(True)
+            return
+        self.days_count.setRange(rule.min_days, rule.max_days)
+        if rule.fixed_days is not None:
+            self.days_count.setValue(rule.fixed_days)
         else:
-            self.days_count.setRange(3, 3)
-            self.days_count.setValue(3)
-            self.days_count.setReadOnly(True)
-
-    def update_birth_vacation_duration(self):
-        if self.birth_type_combo.currentText() == "وضع توأم":
-            self.days_count.setRange(112, 112)
-            self.days_count.setValue(112)
-            self.days_count.setReadOnly(True)
-        else:
-            self.days_count.setRange(98, 98)
-            self.days_count.setValue(98)
-            self.days_count.setReadOnly(True)
+            self.days_count.setValue(rule.min_days)
+        self.days_count.setReadOnly(rule.fixed_days is not None)
 
     def load_employees(self):
         try:
             if self.user_role == "department_head" and self.department_name:
                 # تحميل فقط موظفي القسم
-                self.db.execute_query(
+                employees = self.db.fetch_all(
                     "SELECT id, name FROM employees WHERE department=? ORDER BY name",
                     (self.department_name,)
                 )
             else:
                 # تحميل جميع الموظفين
-                self.db.execute_query(
+                employees = self.db.fetch_all(
                     "SELECT id, name FROM employees ORDER BY name"
                 )
-            employees = self.db.cursor.fetchall()
             self.employee_combo.clear()
             for emp_id, name in employees:
                 self.employee_combo.addItem(name, emp_id)
@@ -243,7 +232,15 @@ class VacationsTab(QWidget):
         if start > end:
             self.end_date.setDate(start)
             end = start
+        emp_id = self.employee_combo.currentData()
+        vac_type = self.vacation_type.currentText()
         days = start.daysTo(end) + 1
+        if emp_id and vac_type in WORKING_DAY_TYPES:
+            # أيام العمل فقط (دون أيام الراحة والعطلات الرسمية)
+            try:
+                days = self.calendar.duration_for(emp_id, vac_type, start, end)
+            except Exception as e:
+                print(f"Error calculating working days: {e}")
         self.days_count.setValue(days)
 
     def validate_vacation_data(self):
@@ -282,33 +279,40 @@ class VacationsTab(QWidget):
                     )
                     if not ok:
                         return
-                    if relation == "زوج":
-                        duration = 130
-                        self.days_count.setValue(130)
                 else:
                     relation = "أقارب آخرون"
-                self.update_death_vacation_duration()
+                duration = self.policies.fixed_duration(vac_type, relation, death_type)
+                self.days_count.setValue(duration)
 
             birth_type = None
             if vac_type == "وضع":
                 birth_type = self.birth_type_combo.currentText()
-                if birth_type == "وضع توأم":
-                    duration = 112
-                else:
-                    duration = 98
+                duration = self.policies.fixed_duration(vac_type, birth_type)
                 self.days_count.setValue(duration)
                 notes = (notes + "\n" if notes else "") + f"نوع الوضع: {birth_type}"
 
+            if vac_type in WORKING_DAY_TYPES:
+                duration = self.calendar.duration_for(emp_id, vac_type, start_date, end_date)
+                if duration < 1:
+                    QMessageBox.warning(self, "تحذير", "الفترة المختارة لا تحتوي على أيام عمل للموظف")
+                    return
+                self.days_count.setValue(duration)
+
+            policy_error = self.policies.validate(
+                vac_type, duration, relation, *self.leave_variants(vac_type)
+            )
+            if policy_error:
+                QMessageBox.warning(self, "تحذير", policy_error)
+                return
+
             # تحقق من الرصيد للإجازة الطارئة والسنوية
             if vac_type == "طارئة":
-                self.db.execute_query("SELECT emergency_vacation_balance FROM employees WHERE id=?", (emp_id,))
-                balance = self.db.cursor.fetchone()[0]
+                balance = self.db.fetch_scalar("SELECT emergency_vacation_balance FROM employees WHERE id=?", (emp_id,), default=0)
                 if duration > balance:
                     QMessageBox.warning(self, "رصيد غير كافٍ", "رصيد الإجازة الطارئة غير كافٍ!")
                     return
             if vac_type == "سنوية":
-                self.db.execute_query("SELECT vacation_balance FROM employees WHERE id=?", (emp_id,))
-                balance = self.db.cursor.fetchone()[0]
+                balance = self.db.fetch_scalar("SELECT vacation_balance FROM employees WHERE id=?", (emp_id,), default=0)
                 if duration > balance:
                     QMessageBox.warning(self, "رصيد غير كافٍ", "رصيد الإجازة السنوية غير كافٍ!")
                     return
@@ -352,20 +356,7 @@ class VacationsTab(QWidget):
 
     def check_vacation_conflict(self, emp_id, start_date, end_date):
         try:
-            self.db.execute_query("""
-                SELECT COUNT(*) FROM vacations
-                WHERE employee_id = ?
-                AND status != 'مرفوض'
-                AND (
-                    (? BETWEEN start_date AND end_date)
-                    OR (? BETWEEN start_date AND end_date)
-                    OR (start_date BETWEEN ? AND ?)
-                    OR (end_date BETWEEN ? AND ?)
-                )
-            """, (emp_id, start_date, end_date, start_date, end_date, start_date, end_date),
-            commit=False)
-            count = self.db.cursor.fetchone()[0]
-            return count > 0
+            return self.overlap_index.has_overlap(emp_id, start_date, end_date)
         except Exception as e:
             print(f"Error checking vacation conflict: {e}")
             return False
@@ -378,23 +369,22 @@ class VacationsTab(QWidget):
         try:
             # تحميل جميع أو فقط إجازات القسم
             if self.user_role == "department_head" and self.department_name:
-                self.db.execute_query("""
+                vacations = self.db.fetch_all("""
                     SELECT v.id, e.name, v.type, v.start_date, v.end_date, v.duration,
-                           v.status, v.dept_approval
+                           v.status, v.dept_approval, v.version
                     FROM vacations v
                     JOIN employees e ON v.employee_id = e.id
                     WHERE e.department=?
                     ORDER BY v.start_date DESC
                 """, (self.department_name,))
             else:
-                self.db.execute_query("""
+                vacations = self.db.fetch_all("""
                     SELECT v.id, e.name, v.type, v.start_date, v.end_date, v.duration,
-                           v.status, v.dept_approval
+                           v.status, v.dept_approval, v.version
                     FROM vacations v
                     JOIN employees e ON v.employee_id = e.id
                     ORDER BY v.start_date DESC
                 """)
-            vacations = self.db.cursor.fetchall()
             self.vacations_table.setRowCount(len(vacations) if vacations else 1)
             if not vacations:
                 self.vacations_table.setItem(0, 0, QTableWidgetItem("لا يوجد طلبات"))
@@ -403,7 +393,7 @@ class VacationsTab(QWidget):
                 return
 
             for row_idx, row in enumerate(vacations):
-                vac_id, emp_name, vac_type, start, end, days, status, dept_approval = row
+                vac_id, emp_name, vac_type, start, end, days, status, dept_approval, version = row
                 # رقم متسلسل وليس رقم الجدول الفعلي
                 serial_item = QTableWidgetItem(str(row_idx + 1))
                 serial_item.setTextAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -448,9 +438,9 @@ class VacationsTab(QWidget):
                     approve_btn.setStyleSheet("background-color:#22c55e; color:white; font-weight:bold; border-radius:7px")
                     reject_btn.setStyleSheet("background-color:#ef4444; color:white; font-weight:bold; border-radius:7px")
                     cancel_btn.setStyleSheet("background-color:#64748b; color:white; font-weight:bold; border-radius:7px")
-                    approve_btn.clicked.connect(lambda _, v_id=vac_id: self.approve_vacation(v_id))
-                    reject_btn.clicked.connect(lambda _, v_id=vac_id: self.reject_vacation(v_id))
-                    cancel_btn.clicked.connect(lambda _, v_id=vac_id: self.cancel_vacation(v_id))
+                    approve_btn.clicked.connect(lambda _, v_id=vac_id, ver=version: self.approve_vacation(v_id, ver))
+                    reject_btn.clicked.connect(lambda _, v_id=vac_id, ver=version: self.reject_vacation(v_id, ver))
+                    cancel_btn.clicked.connect(lambda _, v_id=vac_id, ver=version: self.cancel_vacation(v_id, ver))
                     self.vacations_table.setCellWidget(row_idx, 8, approve_btn)
                     self.vacations_table.setCellWidget(row_idx, 9, reject_btn)
                     self.vacations_table.setCellWidget(row_idx, 10, cancel_btn)
@@ -461,71 +451,35 @@ class VacationsTab(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "خطأ", f"خطأ أثناء تحميل الإجازات:\n{e}")
 
-    def approve_vacation(self, vac_id):
-        try:
-            if self.user_role == "department_head":
-                self.db.execute_query(
-                    "UPDATE vacations SET dept_approval='موافق' WHERE id=?",
-                    (vac_id,), commit=True
-                )
-            else:
-                self.db.execute_query("SELECT employee_id, type, duration FROM vacations WHERE id=?", (vac_id,), commit=False)
-                emp_id, vac_type, duration = self.db.cursor.fetchone()
-                if vac_type == "سنوية":
-                    self.db.execute_query(
-                        "UPDATE employees SET vacation_balance = vacation_balance - ? WHERE id = ?",
-                        (duration, emp_id), commit=True
-                    )
-                if vac_type == "طارئة":
-                    self.db.execute_query(
-                        "UPDATE employees SET emergency_vacation_balance = emergency_vacation_balance - ? WHERE id = ?",
-                        (duration, emp_id), commit=True
-                    )
-                self.db.execute_query(
-                    "UPDATE vacations SET status='موافق' WHERE id=?",
-                    (vac_id,), commit=True
-                )
-            QMessageBox.information(self, "تمت الموافقة", "تمت الموافقة على الإجازة.")
-            self.load_vacations()
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"خطأ أثناء الموافقة: {e}")
-
-    def reject_vacation(self, vac_id):
+    def approve_vacation(self, vac_id, version=None):
+        def approve():
+            if self.user_role == "department_head" and not self.coverage.confirm_approval(self, vac_id):
+                return False
+            return self.workflow.approve(vac_id, self.user_role, version=version)
+        self.run_transition(
+            approve, "تمت الموافقة", "تمت الموافقة على الإجازة.", "خطأ أثناء الموافقة"
+        )
+
+    def reject_vacation(self, vac_id, version=None):
+        self.run_transition(
+            lambda: self.workflow.reject(vac_id, self.user_role, version=version),
+            "تم الرفض", "تم رفض الإجازة.", "خطأ أثناء الرفض"
+        )
+
+    def cancel_vacation(self, vac_id, version=None):
+        self.run_transition(
+            lambda: self.workflow.cancel(vac_id, version=version),
+            "تم الإلغاء", "تم إلغاء الإجازة.", "خطأ أثناء الإلغاء"
+        )
+
+    def run_transition(self, transition, title, message, error_prefix):
+        """تنفيذ انتقال حالة عبر LeaveWorkflowService وعرض النتيجة"""
         try:
-            if self.user_role == "department_head":
-                self.db.execute_query(
-                    "UPDATE vacations SET dept_approval='مرفوض' WHERE id=?",
-                    (vac_id,), commit=True
-                )
-            else:
-                self.db.execute_query(
-                    "UPDATE vacations SET status='مرفوض' WHERE id=?",
-                    (vac_id,), commit=True
-                )
-            QMessageBox.information(self, "تم الرفض", "تم رفض الإجازة.")
-            self.load_vacations()
-        except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"خطأ أثناء الرفض: {e}")
-
-    def cancel_vacation(self, vac_id):
-        try:
-            self.db.execute_query(
-                "UPDATE vacations SET status='ملغاة', dept_approval='ملغاة' WHERE id=?",
-                (vac_id,), commit=True
-            )
-            self.db.execute_query("SELECT employee_id, type, duration FROM vacations WHERE id=?", (vac_id,), commit=False)
-            emp_id, vac_type, duration = self.db.cursor.fetchone()
-            if vac_type == "سنوية":
-                self.db.execute_query(
-                    "UPDATE employees SET vacation_balance = vacation_balance + ? WHERE id = ?",
-                    (duration, emp_id), commit=True
-                )
-            if vac_type == "طارئة":
-                self.db.execute_query(
-                    "UPDATE employees SET emergency_vacation_balance = emergency_vacation_balance + ? WHERE id = ?",
-                    (duration, emp_id), commit=True
-                )
-            QMessageBox.information(self, "تم الإلغاء", "تم إلغاء الإجازة.")
-            self.load_vacations()
+            if not transition():
+                return
+            QMessageBox.information(self, title, message)
+        except (LeaveWorkflowError, ConcurrentUpdateError) as e:
+            QMessageBox.warning(self, "تحذير", str(e))
         except Exception as e:
-            QMessageBox.critical(self, "خطأ", f"خطأ أثناء الإلغاء: {e}")
\ No newline at end of file
+            QMessageBox.critical(self, "خطأ", f"{error_prefix}: {e}")
+        self.load_vacations()
\ No newline at end of file
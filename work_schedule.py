@@ -0,0 +1,87 @@
+"""تمثيل أيام العمل كقناع بتات (bitmask)
+
+النص القديم في employees.work_days مثل "0:M,2:E,5:F" أو "الندب" / "تفرغ"
+يُحوَّل إلى عمودين (الترحيل 6):
+    work_days_mask: 21 بتاً، البت رقم day * 3 + period
+        day: 0 = السبت ... 6 = الجمعة
+        period: 0 = صباحية (M)، 1 = مسائية (E)، 2 = كامل اليوم (F)
+    work_status: 0 = دوام عادي، 1 = الندب، 2 = تفرغ
+
+فيصبح سؤال "من يعمل مساء الثلاثاء في التمريض" اختبار بت على عمود مفهرس:
+    WHERE department = ? AND work_status = 0 AND work_days_mask & ? != 0
+"""
+
+DAY_NAMES = ["السبت", "الأحد", "الإثنين", "الثلاثاء", "الأربعاء", "الخميس", "الجمعة"]
+PERIOD_NAMES = ["صباحية", "مسائية", "كامل اليوم"]
+PERIOD_CODES = "MEF"
+
+STATUS_REGULAR = 0
+STATUS_SECONDMENT = 1
+STATUS_DEDICATION = 2
+STATUS_NAMES = {STATUS_SECONDMENT: "الندب", STATUS_DEDICATION: "تفرغ"}
+
+PERIOD_FULL_DAY = 2
+
+# جميع الأيام صباحاً: القيمة الافتراضية عند الاستيراد
+DEFAULT_WORK_DAYS = "0:M,1:M,2:M,3:M,4:M,5:M,6:M"
+
+
+def bit(day, period):
+    return 1 << (day * 3 + period)
+
+
+def encode(work_days):
+    """تحويل نص أيام العمل إلى (mask, status)"""
+    work_days = work_days.strip() if isinstance(work_days, str) else ""
+    for status, name in STATUS_NAMES.items():
+        if work_days == name:
+            return 0, status
+    mask = 0
+    for item in work_days.split(","):
+        day, _, period = item.strip().partition(":")
+        if day.isdigit() and int(day) < len(DAY_NAMES) and len(period) == 1 and period in PERIOD_CODES:
+            mask |= bit(int(day), PERIOD_CODES.index(period))
+    return mask, STATUS_REGULAR
+
+
+def decode(mask, status=STATUS_REGULAR):
+    """النص المقابل لـ (mask, status) بنفس صيغة work_days"""
+    if status in STATUS_NAMES:
+        return STATUS_NAMES[status]
+    return ",".join(f"{day}:{PERIOD_CODES[period]}" for day, period in day_periods(mask).items())
+
+
+def day_periods(mask):
+    """{رقم اليوم: رقم الفترة} للأيام المحددة في القناع"""
+    periods = {}
+    for day in range(len(DAY_NAMES)):
+        for period in range(len(PERIOD_CODES)):
+            if mask & bit(day, period):
+                periods[day] = period
+                break
+    return periods
+
+
+def describe(mask, status=STATUS_REGULAR):
+    """وصف مقروء لأيام العمل"""
+    if status in STATUS_NAMES:
+        return f"حالة الموظف: {STATUS_NAMES[status]}"
+    periods = day_periods(mask)
+    if not periods:
+        return None
+    lines = [f"- {DAY_NAMES[day]}: {PERIOD_NAMES[period]}" for day, period in periods.items()]
+    return "أيام العمل:\n" + "\n".join(lines)
+
+
+def period_mask(day, period):
+    """القناع الذي يطابق من يعمل في اليوم والفترة (كامل اليوم يشمل الفترتين)"""
+    return bit(day, period) | bit(day, PERIOD_FULL_DAY)
+
+
+def employees_working(db, department, day, period):
+    """موظفو القسم الذين يعملون في اليوم والفترة المحددين"""
+    return db.fetch_all("""
+        SELECT id, name FROM employees
+        WHERE department = ? AND work_status = ? AND work_days_mask & ? != 0
+        ORDER BY name
+    """, (department, STATUS_REGULAR, period_mask(day, period)))
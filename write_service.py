@@ -0,0 +1,264 @@
+"""خدمة الكتابة الموحدة (Group Commit)
+
+الواجهة الرسومية والبوت يعملان في عمليتين منفصلتين على نفس ملف
+employees.db، وكل كتابة كانت تُثبَّت وحدها فتتنافس العمليتان على قفل
+الكتابة في SQLite. هنا يملك خيط واحد اتصال الكتابة، ويستقبل طلبات
+الكتابة من جميع العمليات عبر طابور، ويجمعها في دفعات تُثبَّت بتثبيت
+واحد (commit واحد = مزامنة قرص واحدة لعدة طلبات).
+
+كل طلب (وحدة) قائمة من الاستعلامات تُنفَّذ داخل SAVEPOINT خاص بها،
+فإذا فشلت وحدة أُلغيت وحدها دون التأثير على بقية الدفعة.
+
+العميل الواحد يرسل طلبات من عدة خيوط في نفس الوقت دون انتظار بعضها
+(خيط الواجهة وعمليات الخلفية)، وخيط توزيع في كل عملية يسلّم كل رد إلى
+Future الطلب الخاص به حسب رقمه، فتصل إلى خيط الكتابة طلبات كافية لتجميعها.
+"""
+import itertools
+import multiprocessing
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from database import BUSY_TIMEOUT
+
+# أقصى عدد من الطلبات في التثبيت الواحد
+MAX_BATCH = 64
+
+# مدة انتظار إضافية لتجميع طلبات أكثر قبل التثبيت (بالثواني). القيمة 0
+# تعني تثبيت ما وصل فوراً؛ الطلبات التي تصل أثناء التثبيت تذهب للدفعة التالية
+MAX_DELAY = 0.0
+
+# أقصى مدة ينتظرها العميل رد طلبه افتراضياً (بالثواني)
+SUBMIT_TIMEOUT = BUSY_TIMEOUT * 2
+
+# كل كم ثانية يتحقق العميل المنتظر من أن خيط الكتابة ما زال يعمل
+LIVENESS_INTERVAL = 0.5
+
+# إعادة محاولة الدفعة كاملة إذا بقيت قاعدة البيانات مقفلة (SQLITE_BUSY)
+# بعد انتظار busy_timeout، مع انتظار يزيد بعد كل محاولة (بالثواني)
+BATCH_RETRIES = 3
+RETRY_DELAY = 0.2
+
+
+def _is_busy(error):
+    return getattr(error, 'sqlite_errorcode', None) == sqlite3.SQLITE_BUSY or "locked" in str(error)
+
+
+class WriteResult:
+    """نتيجة وحدة كتابة: رقم آخر صف مُدرج وعدد الصفوف المتأثرة بآخر استعلام"""
+    __slots__ = ('lastrowid', 'rowcount')
+
+    def __init__(self, lastrowid=None, rowcount=0):
+        self.lastrowid = lastrowid
+        self.rowcount = rowcount
+
+
+class WriteClient:
+    """طرف العميل: يرسل وحدات الكتابة إلى GroupCommitWriter وينتظر نتيجتها
+
+    يمكن تمريره إلى عملية أخرى (multiprocessing.Process) كمعامل.
+    """
+
+    def __init__(self, client_id, requests, responses, stopped):
+        self.client_id = client_id
+        self._requests = requests
+        self._responses = responses
+        # يُضبط عند توقف خيط الكتابة (طبيعياً أو بخطأ)
+        self._stopped = stopped
+        self._init_local_state()
+
+    def _init_local_state(self):
+        self._lock = threading.Lock()
+        self._request_ids = itertools.count(1)
+        # {رقم الطلب: Future} للطلبات التي تنتظر ردها
+        self._pending = {}
+        self._dispatcher = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('_lock', '_request_ids', '_pending', '_dispatcher'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_local_state()
+
+    def _dispatch(self):
+        """تسليم كل رد إلى Future طلبه (خيط واحد لكل عميل في كل عملية)"""
+        while True:
+            try:
+                response_id, ok, payload = self._responses.get()
+            except (EOFError, OSError):
+                # أُغلق الطابور عند خروج العملية
+                return
+            with self._lock:
+                future = self._pending.pop(response_id, None)
+            # ردود طلبات انتهت مهلتها لا ينتظرها أحد
+            if future is not None:
+                future.set_result((ok, payload))
+
+    def _wait(self, future, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            interval = LIVENESS_INTERVAL
+            if deadline is not None:
+                interval = min(interval, max(deadline - time.monotonic(), 0))
+            try:
+                return future.result(timeout=interval)
+            except FutureTimeout:
+                pass
+            if self._stopped.is_set():
+                # الرد قد يكون في الطريق إذا توقف الخيط بعد تثبيت الطلب مباشرة
+                try:
+                    return future.result(timeout=LIVENESS_INTERVAL)
+                except FutureTimeout:
+                    raise Exception("خطأ في قاعدة البيانات: خدمة الكتابة متوقفة")
+            if deadline is not None and time.monotonic() >= deadline:
+                raise Exception(f"خطأ في قاعدة البيانات: لم يصل رد الكتابة خلال {timeout} ثانية")
+
+    def submit(self, statements, timeout=SUBMIT_TIMEOUT):
+        """إرسال وحدة كتابة [(query, params, many), ...] وانتظار تثبيتها
+
+        يمكن استدعاؤها من عدة خيوط معاً. ترفع استثناء إذا توقف خيط الكتابة
+        أو لم يصل الرد خلال timeout ثانية (None = بلا مهلة).
+        """
+        future = Future()
+        with self._lock:
+            request_id = next(self._request_ids)
+            self._pending[request_id] = future
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(
+                    target=self._dispatch, name=f"WriteClient-{self.client_id}", daemon=True
+                )
+                self._dispatcher.start()
+        try:
+            self._requests.put((self.client_id, request_id, statements))
+            ok, payload = self._wait(future, timeout)
+        finally:
+            with self._lock:
+                self._pending.pop(request_id, None)
+        if not ok:
+            raise Exception(f"خطأ في قاعدة البيانات: {payload}")
+        return WriteResult(*payload)
+
+
+class GroupCommitWriter(threading.Thread):
+    """خيط الكتابة الوحيد الذي يجمع الطلبات في تثبيتات جماعية"""
+
+    def __init__(self, db_path, max_batch=MAX_BATCH, max_delay=MAX_DELAY, busy_timeout=BUSY_TIMEOUT):
+        super().__init__(name="GroupCommitWriter", daemon=True)
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.busy_timeout = busy_timeout
+        self.requests = multiprocessing.Queue()
+        self.stopped = multiprocessing.Event()
+        self._responses = {}
+        self._client_ids = itertools.count(1)
+
+    def register_client(self):
+        """إنشاء عميل جديد (يجب استدعاؤه قبل تشغيل العمليات التي ستستخدمه)"""
+        client_id = next(self._client_ids)
+        responses = multiprocessing.Queue()
+        self._responses[client_id] = responses
+        return WriteClient(client_id, self.requests, responses, self.stopped)
+
+    def stop(self):
+        """إنهاء الخيط بعد تثبيت الطلبات الموجودة في الطابور"""
+        self.requests.put(None)
+        self.join()
+
+    def run(self):
+        try:
+            self._serve()
+        finally:
+            # العملاء المنتظرون يرفعون خطأ بدل الانتظار إلى الأبد
+            self.stopped.set()
+
+    def _serve(self):
+        # isolation_level=None: نتحكم في BEGIN/COMMIT يدوياً
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        try:
+            stopping = False
+            while not stopping:
+                request = self.requests.get()
+                if request is None:
+                    break
+                batch = [request]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        if remaining > 0:
+                            request = self.requests.get(timeout=remaining)
+                        else:
+                            request = self.requests.get_nowait()
+                    except queue.Empty:
+                        break
+                    if request is None:
+                        stopping = True
+                        break
+                    batch.append(request)
+                self._commit_batch(conn, batch)
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        """تنفيذ الدفعة في معاملة واحدة وإرسال نتيجة كل طلب لصاحبه
+
+        إذا كانت قاعدة البيانات مقفلة (عملية أخرى تكتب خارج الخدمة) تُعاد
+        الدفعة كاملة حتى BATCH_RETRIES مرة قبل إرجاع الخطأ لكل طلباتها.
+        """
+        for attempt in range(BATCH_RETRIES + 1):
+            try:
+                results = self._run_batch(conn, batch)
+                break
+            except sqlite3.Error as e:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                if _is_busy(e) and attempt < BATCH_RETRIES:
+                    time.sleep(RETRY_DELAY * (attempt + 1))
+                    continue
+                results = [
+                    (client_id, (request_id, False, str(e)))
+                    for client_id, request_id, _ in batch
+                ]
+                break
+        for client_id, response in results:
+            self._responses[client_id].put(response)
+
+    def _run_batch(self, conn, batch):
+        """[(client_id, الرد)] لطلبات الدفعة؛ خطأ BEGIN أو COMMIT يُرفع للدفعة كلها"""
+        results = []
+        conn.execute("BEGIN IMMEDIATE")
+        for client_id, request_id, statements in batch:
+            conn.execute("SAVEPOINT unit")
+            try:
+                payload = self._apply(conn, statements)
+                conn.execute("RELEASE unit")
+                results.append((client_id, (request_id, True, payload)))
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK TO unit")
+                conn.execute("RELEASE unit")
+                results.append((client_id, (request_id, False, str(e))))
+        conn.execute("COMMIT")
+        return results
+
+    @staticmethod
+    def _apply(conn, statements):
+        """تنفيذ استعلامات وحدة واحدة وإرجاع (lastrowid, rowcount) لآخرها"""
+        lastrowid, rowcount = None, 0
+        cursor = conn.cursor()
+        for query, params, many in statements:
+            if many:
+                cursor.executemany(query, params)
+            else:
+                cursor.execute(query, params)
+            lastrowid, rowcount = cursor.lastrowid, cursor.rowcount
+        return lastrowid, rowcount